@@ -17,6 +17,12 @@ import io
 import json
 import psycopg2
 from psycopg2.extras import RealDictCursor
+import sys
+from pathlib import Path
+
+# Motor de variações compartilhado com o dashboard principal (raiz do projeto)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from motor_variacoes_tempo import calcular_variacoes_matriz
 
 # Configuração da página
 st.set_page_config(
@@ -173,6 +179,24 @@ def processar_status_faturas(df):
         'valor_sem_baixa': valor_sem_baixa
     }
 
+# Pares de datas analisados (nomes das colunas convertidas em processar_variacoes_tempo)
+PARES_VARIACOES_TEMPO = [
+    {'codigo': 'cte_vs_inclusao_fatura', 'campo_inicio': 'data_emissao_cte',
+     'campo_fim': 'data_inclusao_fatura', 'titulo': 'CTE → Inclusão Fatura'},
+    {'codigo': 'cte_vs_envio_processo', 'campo_inicio': 'data_emissao_cte',
+     'campo_fim': 'data_envio_processo', 'titulo': 'CTE → Envio Processo'},
+    {'codigo': 'inclusao_vs_envio_processo', 'campo_inicio': 'data_inclusao_fatura',
+     'campo_fim': 'data_envio_processo', 'titulo': 'Inclusão Fatura → Envio Processo'},
+    {'codigo': 'inclusao_vs_primeiro_envio', 'campo_inicio': 'data_inclusao_fatura',
+     'campo_fim': 'primeiro_envio', 'titulo': 'Inclusão Fatura → 1º Envio'},
+    {'codigo': 'rq_tmc_vs_primeiro_envio', 'campo_inicio': 'data_rq_tmc',
+     'campo_fim': 'primeiro_envio', 'titulo': 'RQ/TMC → 1º Envio'},
+    {'codigo': 'primeiro_envio_vs_atesto', 'campo_inicio': 'primeiro_envio',
+     'campo_fim': 'data_atesto', 'titulo': '1º Envio → Atesto'},
+    {'codigo': 'atesto_vs_envio_final', 'campo_inicio': 'data_atesto',
+     'campo_fim': 'envio_final', 'titulo': 'Atesto → Envio Final'}
+]
+
 def processar_variacoes_tempo(df):
     """Calcula TODAS as variações de tempo para análise de produtividade"""
     variacoes = {}
@@ -189,114 +213,27 @@ def processar_variacoes_tempo(df):
     }
     
     # Processar datas
-    df_temp = df.copy()
+    df_temp = pd.DataFrame(index=df.index)
     for col_original, col_nova in colunas_data.items():
-        if col_original in df_temp.columns:
-            df_temp[col_nova] = pd.to_datetime(df_temp[col_original], format='%d/%b/%y', errors='coerce')
-    
-    # 1. CTE vs Inclusão Fatura
-    if 'data_emissao_cte' in df_temp.columns and 'data_inclusao_fatura' in df_temp.columns:
-        mask = df_temp['data_emissao_cte'].notna() & df_temp['data_inclusao_fatura'].notna()
-        if mask.any():
-            dias = (df_temp.loc[mask, 'data_inclusao_fatura'] - df_temp.loc[mask, 'data_emissao_cte']).dt.days
-            variacoes['cte_vs_inclusao_fatura'] = {
-                'dados': dias,
-                'media': dias.mean(),
-                'mediana': dias.median(),
-                'min': dias.min(),
-                'max': dias.max(),
-                'qtd_registros': len(dias),
-                'titulo': 'CTE → Inclusão Fatura'
-            }
-    
-    # 2. CTE vs Envio Processo
-    if 'data_emissao_cte' in df_temp.columns and 'data_envio_processo' in df_temp.columns:
-        mask = df_temp['data_emissao_cte'].notna() & df_temp['data_envio_processo'].notna()
-        if mask.any():
-            dias = (df_temp.loc[mask, 'data_envio_processo'] - df_temp.loc[mask, 'data_emissao_cte']).dt.days
-            variacoes['cte_vs_envio_processo'] = {
-                'dados': dias,
-                'media': dias.mean(),
-                'mediana': dias.median(),
-                'min': dias.min(),
-                'max': dias.max(),
-                'qtd_registros': len(dias),
-                'titulo': 'CTE → Envio Processo'
-            }
-    
-    # 3. Inclusão Fatura vs Envio Processo
-    if 'data_inclusao_fatura' in df_temp.columns and 'data_envio_processo' in df_temp.columns:
-        mask = df_temp['data_inclusao_fatura'].notna() & df_temp['data_envio_processo'].notna()
-        if mask.any():
-            dias = (df_temp.loc[mask, 'data_envio_processo'] - df_temp.loc[mask, 'data_inclusao_fatura']).dt.days
-            variacoes['inclusao_vs_envio_processo'] = {
-                'dados': dias,
-                'media': dias.mean(),
-                'mediana': dias.median(),
-                'min': dias.min(),
-                'max': dias.max(),
-                'qtd_registros': len(dias),
-                'titulo': 'Inclusão Fatura → Envio Processo'
-            }
-    
-    # 4. Inclusão Fatura vs 1º Envio
-    if 'data_inclusao_fatura' in df_temp.columns and 'primeiro_envio' in df_temp.columns:
-        mask = df_temp['data_inclusao_fatura'].notna() & df_temp['primeiro_envio'].notna()
-        if mask.any():
-            dias = (df_temp.loc[mask, 'primeiro_envio'] - df_temp.loc[mask, 'data_inclusao_fatura']).dt.days
-            variacoes['inclusao_vs_primeiro_envio'] = {
-                'dados': dias,
-                'media': dias.mean(),
-                'mediana': dias.median(),
-                'min': dias.min(),
-                'max': dias.max(),
-                'qtd_registros': len(dias),
-                'titulo': 'Inclusão Fatura → 1º Envio'
-            }
+        if col_original in df.columns:
+            df_temp[col_nova] = pd.to_datetime(df[col_original], format='%d/%b/%y', errors='coerce')
     
-    # 5. RQ/TMC vs 1º Envio
-    if 'data_rq_tmc' in df_temp.columns and 'primeiro_envio' in df_temp.columns:
-        mask = df_temp['data_rq_tmc'].notna() & df_temp['primeiro_envio'].notna()
-        if mask.any():
-            dias = (df_temp.loc[mask, 'primeiro_envio'] - df_temp.loc[mask, 'data_rq_tmc']).dt.days
-            variacoes['rq_tmc_vs_primeiro_envio'] = {
-                'dados': dias,
-                'media': dias.mean(),
-                'mediana': dias.median(),
-                'min': dias.min(),
-                'max': dias.max(),
-                'qtd_registros': len(dias),
-                'titulo': 'RQ/TMC → 1º Envio'
-            }
-    
-    # 6. 1º Envio vs Atesto
-    if 'primeiro_envio' in df_temp.columns and 'data_atesto' in df_temp.columns:
-        mask = df_temp['primeiro_envio'].notna() & df_temp['data_atesto'].notna()
-        if mask.any():
-            dias = (df_temp.loc[mask, 'data_atesto'] - df_temp.loc[mask, 'primeiro_envio']).dt.days
-            variacoes['primeiro_envio_vs_atesto'] = {
-                'dados': dias,
-                'media': dias.mean(),
-                'mediana': dias.median(),
-                'min': dias.min(),
-                'max': dias.max(),
-                'qtd_registros': len(dias),
-                'titulo': '1º Envio → Atesto'
-            }
+    # Todos os pares em uma passada sobre a matriz de dias (negativos incluídos)
+    calculadas = calcular_variacoes_matriz(
+        df_temp, PARES_VARIACOES_TEMPO, filtrar_negativos=False, incluir_dias=True
+    )
     
-    # 7. Atesto vs Envio Final
-    if 'data_atesto' in df_temp.columns and 'envio_final' in df_temp.columns:
-        mask = df_temp['data_atesto'].notna() & df_temp['envio_final'].notna()
-        if mask.any():
-            dias = (df_temp.loc[mask, 'envio_final'] - df_temp.loc[mask, 'data_atesto']).dt.days
-            variacoes['atesto_vs_envio_final'] = {
-                'dados': dias,
-                'media': dias.mean(),
-                'mediana': dias.median(),
-                'min': dias.min(),
-                'max': dias.max(),
-                'qtd_registros': len(dias),
-                'titulo': 'Atesto → Envio Final'
+    for par in PARES_VARIACOES_TEMPO:
+        if par['codigo'] in calculadas:
+            estatisticas = calculadas[par['codigo']]
+            variacoes[par['codigo']] = {
+                'dados': pd.Series(estatisticas['dias'], index=df_temp.index[estatisticas['linhas']]),
+                'media': estatisticas['media'],
+                'mediana': estatisticas['mediana'],
+                'min': estatisticas['min'],
+                'max': estatisticas['max'],
+                'qtd_registros': estatisticas['qtd'],
+                'titulo': par['titulo']
             }
     
     return variacoes
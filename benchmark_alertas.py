@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark das Listas de Alertas - Dashboard Baker
+Compara a montagem da lista com iterrows (implementação anterior)
+com a montagem por colunas (_montar_lista_alerta)
+
+Uso:
+    python benchmark_alertas.py
+    python benchmark_alertas.py --tamanhos 10000 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from dashboard_baker_web_corrigido import _montar_lista_alerta, calcular_alertas_inteligentes
+
+def _lista_iterrows(ctes_problema, campo_data):
+    """Implementação anterior (uma iteração Python por linha via iterrows)"""
+    lista_segura = []
+    for _, row in ctes_problema.iterrows():
+        item = {
+            'numero_cte': row['numero_cte'],
+            'destinatario_nome': row['destinatario_nome'],
+            'valor_total': float(row['valor_total']),
+            campo_data: row[campo_data] if pd.notna(row[campo_data]) else None
+        }
+        lista_segura.append(item)
+    return lista_segura
+
+def gerar_ctes_pendentes(total):
+    """CTEs sintéticos todos sinalizados (emitidos há 30+ dias, sem atesto/envio)"""
+    rng = np.random.default_rng(42)
+    hoje = pd.Timestamp.now().normalize()
+    return pd.DataFrame({
+        'numero_cte': np.arange(total, 0, -1),
+        'destinatario_nome': [f'CLIENTE {i % 40}' for i in range(total)],
+        'veiculo_placa': [f'ABC{i % 900:04d}' for i in range(total)],
+        'valor_total': rng.uniform(100, 5000, total).round(2),
+        'data_emissao': hoje - pd.to_timedelta(rng.integers(30, 400, total), unit='D'),
+        'numero_fatura': None,
+        'data_baixa': pd.NaT,
+        'data_atesto': pd.NaT,
+        'primeiro_envio': pd.NaT,
+        'envio_final': pd.NaT
+    })
+
+def medir(funcao, repeticoes=3):
+    """Retorna o melhor tempo (s) entre as repetições e o último resultado"""
+    melhor, resultado = None, None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+def executar_benchmark(tamanhos):
+    print("🏁 BENCHMARK - LISTAS DE ALERTAS (iterrows vs colunas)")
+    print("=" * 72)
+    print(f"{'CTEs':>10} | {'iterrows (s)':>12} | {'colunas (s)':>11} | {'Ganho':>7} | {'alertas (s)':>11}")
+    print("-" * 72)
+
+    for tamanho in sorted(tamanhos):
+        df = gerar_ctes_pendentes(tamanho)
+
+        t_iterrows, lista_antiga = medir(lambda: _lista_iterrows(df, 'data_emissao'))
+        t_colunas, lista_nova = medir(lambda: _montar_lista_alerta(df, 'data_emissao'))
+        t_alertas, _ = medir(lambda: calcular_alertas_inteligentes(df), repeticoes=1)
+
+        assert lista_antiga == lista_nova
+
+        print(f"{tamanho:>10,} | {t_iterrows:>12.3f} | {t_colunas:>11.3f} | "
+              f"{t_iterrows / t_colunas:>6.1f}x | {t_alertas:>11.3f}")
+
+    print("=" * 72)
+    print("alertas (s): calcular_alertas_inteligentes completo (5 regras)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das listas de alertas do Dashboard Baker")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    executar_benchmark(args.tamanhos)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de Exportação Excel - Dashboard Baker
+Compara a aba de dados antiga (iterrows + pd.isna por célula, 8 colunas, workbook
+in_memory) com o motor_exportacao (colunas convertidas uma vez, constant_memory,
+todas as colunas do esquema)
+
+Uso:
+    python benchmark_exportacao_excel.py
+    python benchmark_exportacao_excel.py --tamanhos 100000 1000000 --memoria
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import xlsxwriter
+
+from benchmark_memoria import gerar_ctes
+from dashboard_baker_web_corrigido import compactar_dataframe_cte
+from motor_exportacao import exportar_excel
+
+COLUNAS_ANTIGAS = ['numero_cte', 'destinatario_nome', 'valor_total', 'data_emissao',
+                   'primeiro_envio', 'data_atesto', 'envio_final', 'data_baixa']
+
+def exportar_antigo(df, destino):
+    """Referência: laço da aba 'Dados Completos' antes do motor de exportação"""
+    workbook = xlsxwriter.Workbook(destino, {'in_memory': True})
+    moeda = workbook.add_format({'num_format': 'R$ #,##0.00'})
+    data = workbook.add_format({'num_format': 'dd/mm/yyyy'})
+    aba = workbook.add_worksheet('Dados Completos')
+    for col, coluna in enumerate(COLUNAS_ANTIGAS):
+        aba.write(0, col, coluna.replace('_', ' ').title())
+    for idx, linha in df.iterrows():
+        for col, coluna in enumerate(COLUNAS_ANTIGAS):
+            valor = linha[coluna]
+            if pd.isna(valor):
+                aba.write(idx + 1, col, "")
+            elif coluna == 'valor_total':
+                aba.write(idx + 1, col, float(valor), moeda)
+            elif 'data_' in coluna or hasattr(valor, 'date'):
+                aba.write(idx + 1, col, valor, data)
+            else:
+                aba.write(idx + 1, col, valor if isinstance(valor, (int, float)) else str(valor))
+    workbook.close()
+
+def medir(funcao, df, pasta, memoria):
+    destino = os.path.join(pasta, f'{funcao.__name__}.xlsx')
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    funcao(df, destino)
+    decorrido = time.perf_counter() - inicio
+    pico = None
+    if memoria:
+        pico = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+    tamanho = os.path.getsize(destino) / 1024**2
+    os.remove(destino)
+    return decorrido, pico, tamanho
+
+def executar_benchmark(tamanhos, limite_antigo, memoria):
+    print("📊 BENCHMARK - EXPORTAÇÃO EXCEL (antigo vs constant_memory)")
+
+    def exportar_motor(df, destino):
+        exportar_excel([df], destino, 'Dados Completos', tmpdir=pasta)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        for tamanho in sorted(tamanhos):
+            df = compactar_dataframe_cte(gerar_ctes(tamanho))
+
+            print("=" * 84)
+            print(f"{tamanho:,} CTEs")
+            print("-" * 84)
+            casos = [('motor (%d colunas)' % len(df.columns), exportar_motor)]
+            if tamanho <= limite_antigo:
+                casos.insert(0, ('antigo (%d colunas)' % len(COLUNAS_ANTIGAS), exportar_antigo))
+
+            for nome, funcao in casos:
+                decorrido, pico, tamanho_mb = medir(funcao, df, pasta, memoria)
+                linha = (f"{nome:<22} {decorrido:>8.2f}s  {tamanho / decorrido:>10,.0f} linhas/s  "
+                         f"arquivo {tamanho_mb:>7.1f} MB")
+                print(linha + (f"  pico Python {pico:>8.1f} MB" if pico is not None else ""))
+
+    print("=" * 84)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da exportação Excel do Dashboard Baker")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100000])
+    parser.add_argument('--limite-antigo', type=int, default=100000,
+                        help="maior tamanho em que o caminho antigo também é medido")
+    parser.add_argument('--memoria', action='store_true', help="mede o pico de alocação com tracemalloc (mais lento)")
+    args = parser.parse_args()
+
+    executar_benchmark(args.tamanhos, args.limite_antigo, args.memoria)
+
+if __name__ == "__main__":
+    main()
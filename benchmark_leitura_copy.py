@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de Leitura - Dashboard Baker
+Compara read_sql_query + pd.to_datetime (caminho tradicional)
+com COPY (SELECT ...) TO STDOUT tipado (caminho rápido)
+
+Uso:
+    python benchmark_leitura_copy.py
+    python benchmark_leitura_copy.py --tamanhos 5000 100000 1000000 --host localhost --password senha123
+"""
+
+import argparse
+import time
+
+import psycopg2
+
+from dashboard_baker_web_corrigido import (
+    _resolver_configuracao_banco,
+    _config_local,
+    _tipar_dataframe_cte,
+    consultar_dataframe,
+    ler_dados_via_copy,
+)
+
+TABELA_BENCHMARK = 'dashboard_baker_benchmark'
+
+QUERY_BENCHMARK = f"""
+SELECT
+    numero_cte, destinatario_nome, veiculo_placa, valor_total,
+    data_emissao, numero_fatura, data_baixa, observacao,
+    data_inclusao_fatura, data_envio_processo, primeiro_envio,
+    data_rq_tmc, data_atesto, envio_final, origem_dados,
+    created_at, updated_at
+FROM {TABELA_BENCHMARK}
+ORDER BY numero_cte DESC
+"""
+
+def preparar_tabela(config, total_linhas):
+    """Cria (ou completa) a tabela de benchmark com dados sintéticos"""
+    conn = psycopg2.connect(**config)
+    cursor = conn.cursor()
+
+    cursor.execute(f"""
+    CREATE UNLOGGED TABLE IF NOT EXISTS {TABELA_BENCHMARK} (
+        id SERIAL PRIMARY KEY,
+        numero_cte INTEGER UNIQUE NOT NULL,
+        destinatario_nome VARCHAR(255),
+        veiculo_placa VARCHAR(20),
+        valor_total DECIMAL(15,2),
+        data_emissao DATE,
+        numero_fatura VARCHAR(100),
+        data_baixa DATE,
+        observacao TEXT,
+        data_inclusao_fatura DATE,
+        data_envio_processo DATE,
+        primeiro_envio DATE,
+        data_rq_tmc DATE,
+        data_atesto DATE,
+        envio_final DATE,
+        origem_dados VARCHAR(50) DEFAULT 'Benchmark',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    cursor.execute(f"SELECT COALESCE(MAX(numero_cte), 0) FROM {TABELA_BENCHMARK}")
+    atual = cursor.fetchone()[0]
+
+    if atual < total_linhas:
+        cursor.execute(f"""
+        INSERT INTO {TABELA_BENCHMARK} (
+            numero_cte, destinatario_nome, veiculo_placa, valor_total, data_emissao,
+            numero_fatura, data_baixa, observacao, data_inclusao_fatura, data_envio_processo,
+            primeiro_envio, data_rq_tmc, data_atesto, envio_final
+        )
+        SELECT
+            g,
+            'CLIENTE ' || mod(g, 40),
+            'ABC' || lpad(mod(g, 900)::text, 4, '0'),
+            round((random() * 5000)::numeric, 2),
+            d,
+            CASE WHEN random() > 0.2 THEN 'FAT' || g END,
+            CASE WHEN random() > 0.5 THEN d + (random() * 60)::int END,
+            CASE WHEN random() > 0.5 THEN 'Observação ' || g END,
+            CASE WHEN random() > 0.3 THEN d + (random() * 5)::int END,
+            CASE WHEN random() > 0.4 THEN d + (random() * 8)::int END,
+            CASE WHEN random() > 0.3 THEN d + (random() * 10)::int END,
+            CASE WHEN random() > 0.5 THEN d + (random() * 6)::int END,
+            CASE WHEN random() > 0.4 THEN d + (random() * 20)::int END,
+            CASE WHEN random() > 0.6 THEN d + (random() * 30)::int END
+        FROM (
+            SELECT g, DATE '2023-01-01' + (random() * 900)::int AS d
+            FROM generate_series(%s, %s) AS g
+        ) s
+        """, (atual + 1, total_linhas))
+
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+def medir(funcao, repeticoes):
+    """Retorna o melhor tempo (s) entre as repetições e o último resultado"""
+    melhor = None
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+def executar_benchmark(config, tamanhos, manter_tabela=False):
+    """Executa o benchmark para cada tamanho de tabela"""
+    print("🏁 BENCHMARK DE LEITURA - read_sql_query vs COPY")
+    print("=" * 72)
+    print(f"{'Linhas':>10} | {'read_sql (s)':>12} | {'COPY (s)':>10} | {'Ganho':>7} | {'Memória (MB)':>12}")
+    print("-" * 72)
+
+    try:
+        for tamanho in sorted(tamanhos):
+            preparar_tabela(config, tamanho)
+            query = f"{QUERY_BENCHMARK} LIMIT {tamanho}"
+            repeticoes = 3 if tamanho <= 100000 else 1
+
+            t_pandas, df_pandas = medir(
+                lambda: _tipar_dataframe_cte(consultar_dataframe(query, config=config)), repeticoes
+            )
+            t_copy, df_copy = medir(
+                lambda: _tipar_dataframe_cte(ler_dados_via_copy(query, config)), repeticoes
+            )
+
+            assert len(df_pandas) == len(df_copy) == tamanho
+            memoria = df_copy.memory_usage(deep=True).sum() / 1024 / 1024
+
+            print(f"{tamanho:>10,} | {t_pandas:>12.3f} | {t_copy:>10.3f} | {t_pandas / t_copy:>6.1f}x | {memoria:>12.1f}")
+    finally:
+        if not manter_tabela:
+            conn = psycopg2.connect(**config)
+            conn.cursor().execute(f"DROP TABLE IF EXISTS {TABELA_BENCHMARK}")
+            conn.commit()
+            conn.close()
+
+    print("=" * 72)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de leitura do Dashboard Baker")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[5000, 100000, 1000000])
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int, default=5432)
+    parser.add_argument('--database', default='postgres')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password')
+    parser.add_argument('--manter-tabela', action='store_true', help="Não remove a tabela de benchmark ao final")
+    args = parser.parse_args()
+
+    if args.host:
+        config = {
+            'host': args.host,
+            'port': args.port,
+            'database': args.database,
+            'user': args.user,
+            'password': args.password or '',
+            'connect_timeout': 10
+        }
+    else:
+        config = _resolver_configuracao_banco()[0] or _config_local()
+
+    executar_benchmark(config, args.tamanhos, args.manter_tabela)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Relatório de Memória - Dashboard Baker
+Compara o DataFrame de CTEs como sai da leitura (texto object, numero_cte int64)
+com a representação compacta mantida em cache (compactar_dataframe_cte)
+
+Uso:
+    python benchmark_memoria.py
+    python benchmark_memoria.py --tamanhos 100000 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from dashboard_baker_web_corrigido import compactar_dataframe_cte, relatorio_memoria_dataframe
+
+def gerar_ctes(total):
+    """CTEs sintéticos com a cardinalidade típica da base (poucos clientes/placas)"""
+    rng = np.random.default_rng(42)
+    hoje = pd.Timestamp.now().normalize()
+    emissao = hoje - pd.to_timedelta(rng.integers(0, 1000, total), unit='D')
+
+    def talvez(serie, fracao):
+        return serie.where(rng.random(total) < fracao)
+
+    def depois(dias_max, fracao):
+        return talvez(pd.Series(emissao + pd.to_timedelta(rng.integers(0, dias_max, total), unit='D')), fracao)
+
+    return pd.DataFrame({
+        'numero_cte': np.arange(total, 0, -1, dtype=np.int64),
+        'destinatario_nome': pd.Series([f'CLIENTE {i % 120} TRANSPORTES LTDA' for i in rng.integers(0, 120, total)]),
+        'veiculo_placa': talvez(pd.Series([f'ABC{i:04d}' for i in rng.integers(0, 900, total)]), 0.9),
+        'valor_total': rng.uniform(100, 5000, total).round(2),
+        'data_emissao': emissao,
+        'numero_fatura': talvez(pd.Series([f'FAT-{i // 8}' for i in range(total)]), 0.8),
+        'data_baixa': depois(60, 0.6),
+        'observacao': talvez(pd.Series([f'Observação {i}' for i in range(total)]), 0.3),
+        'data_inclusao_fatura': depois(5, 0.7),
+        'data_envio_processo': depois(10, 0.6),
+        'primeiro_envio': depois(7, 0.7),
+        'data_rq_tmc': depois(15, 0.5),
+        'data_atesto': depois(20, 0.6),
+        'envio_final': depois(25, 0.4),
+        'origem_dados': pd.Series(rng.choice(['Sistema', 'CSV', 'Manual', 'API'], total)),
+        'created_at': pd.Timestamp.now(),
+        'updated_at': pd.Timestamp.now()
+    })
+
+def executar_relatorio(tamanhos):
+    print("🧠 RELATÓRIO DE MEMÓRIA - DATAFRAME DE CTEs (leitura vs compacto)")
+
+    for tamanho in sorted(tamanhos):
+        df = gerar_ctes(tamanho)
+
+        inicio = time.perf_counter()
+        df_compacto = compactar_dataframe_cte(df)
+        decorrido = time.perf_counter() - inicio
+
+        relatorio = relatorio_memoria_dataframe(df, df_compacto)
+        relatorio[['bytes_antes', 'bytes_depois']] = relatorio[['bytes_antes', 'bytes_depois']] / 1024**2
+
+        print("=" * 84)
+        print(f"{tamanho:,} CTEs | compactação em {decorrido:.3f}s")
+        print("-" * 84)
+        print(relatorio.rename(columns={'bytes_antes': 'MB_antes', 'bytes_depois': 'MB_depois'})
+              .to_string(float_format=lambda valor: f"{valor:.2f}"))
+
+    print("=" * 84)
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório de memória do DataFrame de CTEs do Dashboard Baker")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100000])
+    args = parser.parse_args()
+
+    executar_relatorio(args.tamanhos)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Fixtures compartilhadas dos testes de banco
+
+Rodam contra o PostgreSQL de BAKER_TEST_DSN (sem ele os testes são pulados), cada
+teste em schemas descartáveis com a sua própria dashboard_baker:
+    BAKER_TEST_DSN="host=127.0.0.1 dbname=postgres user=postgres" python -m pytest -q
+"""
+
+import os
+
+import pytest
+
+import dashboard_baker_web_corrigido as dashboard
+
+DSN = os.environ.get('BAKER_TEST_DSN')
+
+@pytest.fixture
+def cursor_admin():
+    """Cursor em autocommit no banco de BAKER_TEST_DSN"""
+    if not DSN:
+        pytest.skip("defina BAKER_TEST_DSN para rodar contra o PostgreSQL")
+    admin = dashboard.psycopg2.connect(DSN)
+    admin.autocommit = True
+    try:
+        yield admin.cursor()
+    finally:
+        admin.close()
+
+@pytest.fixture
+def schema_baker(cursor_admin, monkeypatch):
+    """
+    schema_baker(nome, *sqls): recria o schema com a dashboard_baker, executa os SQLs
+    extras nele e devolve a configuração de conexão com search_path no schema.
+    O cursor_admin fica apontado para o último schema criado.
+    obter_pool_conexoes devolve o pool de cada schema; tudo é descartado no fim do teste
+    """
+    pools, schemas = {}, []
+    monkeypatch.setattr(dashboard, 'obter_pool_conexoes', lambda config: pools[config['options']])
+
+    def criar(nome: str, *sqls: str) -> dict:
+        schemas.append(nome)
+        cursor_admin.execute(f"DROP SCHEMA IF EXISTS {nome} CASCADE")
+        cursor_admin.execute(f"CREATE SCHEMA {nome}")
+        cursor_admin.execute(f"SET search_path TO {nome}")
+        cursor_admin.execute(dashboard.SQL_CRIAR_TABELA_DASHBOARD)
+        for sql in sqls:
+            cursor_admin.execute(sql)
+
+        config = dict(dashboard.psycopg2.extensions.parse_dsn(DSN), options=f"-c search_path={nome}")
+        pools[config['options']] = dashboard.PoolConexoesBaker(config)
+        return config
+
+    try:
+        yield criar
+    finally:
+        for pool in pools.values():
+            pool.fechar_todas()
+        for nome in schemas:
+            cursor_admin.execute(f"DROP SCHEMA IF EXISTS {nome} CASCADE")
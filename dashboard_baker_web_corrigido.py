@@ -34,19 +34,29 @@ import numpy as np
 import os
 import json
 import hashlib
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 import base64
-from io import BytesIO
+from io import BytesIO, StringIO
 import xlsxwriter
 from decimal import Decimal
 import uuid
 import os
+import threading
+import time
+import select
+from contextlib import contextmanager
+from collections.abc import Sequence
+
+from motor_variacoes_tempo import SketchVariacoes, calcular_variacoes_matriz
+from motor_exportacao import escrever_aba_dados, exportar_csv_gzip, exportar_parquet, formatos_exportacao
 
 os.environ['STREAMLIT_BROWSER_GATHER_USAGE_STATS'] = 'false'
 
 # Verificar disponibilidade do psycopg2
 try:
     import psycopg2
+    import psycopg2.pool
+    import psycopg2.extensions
     from psycopg2.extras import RealDictCursor
     PSYCOPG2_AVAILABLE = True
 except ImportError:
@@ -341,6 +351,16 @@ st.markdown("""
 # FUNÇÕES DE CORREÇÃO PARA PROBLEMA None → Nenhum
 # ================================================================
 
+# Valores que devem ser convertidos para None
+VALORES_NULOS_TRADUZIDOS = [
+    'Nenhum', 'Nenhuma', 'nenhum', 'nenhuma',
+    'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN',
+    '', 'None', 'none'
+]
+
+# Mesmas sentinelas como literais SQL (índices parciais, projeção e trigger de limpeza)
+_NULOS_SQL = ', '.join("'" + valor.replace("'", "''") + "'" for valor in VALORES_NULOS_TRADUZIDOS)
+
 def corrigir_valor_traduzido(valor):
     """
     Corrige valores que foram traduzidos pelo sistema
@@ -349,16 +369,9 @@ def corrigir_valor_traduzido(valor):
     if valor is None:
         return None
 
-    # Lista de valores que devem ser convertidos para None
-    valores_nulos = [
-        'Nenhum', 'Nenhuma', 'nenhum', 'nenhuma',
-        'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN',
-        '', 'None', 'none'
-    ]
-
     if isinstance(valor, str):
         valor_limpo = valor.strip()
-        if valor_limpo in valores_nulos:
+        if valor_limpo in VALORES_NULOS_TRADUZIDOS:
             return None
 
     return valor
@@ -374,19 +387,46 @@ def corrigir_dict_traduzido(dicionario):
 
     return dict_corrigido
 
-def corrigir_dataframe_traduzido(df):
-    """Corrige DataFrame removendo traduções"""
+_CONJUNTO_NULOS_TRADUZIDOS = frozenset(VALORES_NULOS_TRADUZIDOS)
+
+def _sentinelas_nulas(valores) -> List[str]:
+    """Valores distintos que, sem espaços nas pontas, são sentinelas de nulo"""
+    return [valor for valor in valores
+            if isinstance(valor, str) and valor.strip() in _CONJUNTO_NULOS_TRADUZIDOS]
+
+def normalizar_nulos_traduzidos(df: pd.DataFrame, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Troca por None, no próprio DataFrame, as sentinelas de nulo ('Nenhum', 'null', 'nan'...).
+    Cada valor distinto é testado uma vez e as células são marcadas com isin,
+    em vez de passar cada célula por corrigir_valor_traduzido
+    """
     if df is None or df.empty:
         return df
 
-    df_corrigido = df.copy()
+    for coluna in colunas or df.columns:
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            sentinelas = _sentinelas_nulas(serie.cat.categories)
+            if sentinelas:
+                df[coluna] = serie.cat.remove_categories(sentinelas)
+        elif serie.dtype == 'object':
+            try:
+                sentinelas = _sentinelas_nulas(serie.dropna().unique())
+            except TypeError:
+                # Valores não hasheáveis: caminho célula a célula
+                df[coluna] = serie.apply(corrigir_valor_traduzido)
+                continue
+            if sentinelas:
+                df.loc[serie.isin(sentinelas), coluna] = None
+
+    return df
 
-    # Aplicar correção em colunas de texto
-    for coluna in df_corrigido.columns:
-        if df_corrigido[coluna].dtype == 'object':
-            df_corrigido[coluna] = df_corrigido[coluna].apply(corrigir_valor_traduzido)
+def corrigir_dataframe_traduzido(df):
+    """Corrige DataFrame removendo traduções (em uma cópia; ver normalizar_nulos_traduzidos)"""
+    if df is None or df.empty:
+        return df
 
-    return df_corrigido
+    return normalizar_nulos_traduzidos(df.copy())
 
 def safe_get_value(dicionario, chave, default=''):
     """Obtém valor de forma segura, corrigindo traduções"""
@@ -394,13 +434,66 @@ def safe_get_value(dicionario, chave, default=''):
     valor_corrigido = corrigir_valor_traduzido(valor)
     return valor_corrigido if valor_corrigido is not None else default
 
+@st.cache_resource(show_spinner=False)
+def _cache_configuracao_banco() -> Dict:
+    """Configuração resolvida do banco, compartilhada pelo processo"""
+    return {
+        'config': None,
+        'mensagens': [],
+        'resolvido_em': None,
+        'versao': 0,
+        'lock': threading.Lock()
+    }
+
+def invalidar_configuracao_banco():
+    """Descarta a configuração resolvida; a próxima chamada refaz a detecção e o teste de conexão"""
+    cache = _cache_configuracao_banco()
+    with cache['lock']:
+        cache['resolvido_em'] = None
+
 def carregar_configuracao_banco():
-    """Carrega configuração do banco com sistema de fallback inteligente - CORRIGIDO PARA STREAMLIT"""
+    """
+    Retorna a configuração do banco resolvida e testada no máximo uma vez
+    a cada DB_HEALTHCHECK_TTL segundos por processo
+    """
 
     if not PSYCOPG2_AVAILABLE:
         st.error("❌ psycopg2-binary não encontrado. Execute: pip install psycopg2-binary")
         st.stop()
 
+    cache = _cache_configuracao_banco()
+    ttl = _ler_parametro_banco('DB_HEALTHCHECK_TTL', 300.0)
+
+    with cache['lock']:
+        expirado = (
+            cache['resolvido_em'] is None or
+            time.monotonic() - cache['resolvido_em'] > ttl
+        )
+        if expirado:
+            config, mensagens = _resolver_configuracao_banco()
+            cache['config'] = config
+            cache['mensagens'] = mensagens
+            cache['resolvido_em'] = time.monotonic()
+            cache['versao'] += 1
+        config = cache['config']
+        mensagens = cache['mensagens']
+        versao = cache['versao']
+
+    # Mensagens de status apenas uma vez por sessão para cada resolução
+    try:
+        if st.session_state.get('_versao_config_exibida') != versao:
+            st.session_state['_versao_config_exibida'] = versao
+            for nivel, texto in mensagens:
+                getattr(st, nivel)(texto)
+    except Exception:
+        pass
+
+    return dict(config) if config else None
+
+def _resolver_configuracao_banco() -> Tuple[Optional[Dict], List[Tuple[str, str]]]:
+    """Resolve configuração do banco com sistema de fallback inteligente - CORRIGIDO PARA STREAMLIT"""
+    mensagens = []
+
     # 1. PRIMEIRO: Verificar se está no Streamlit Cloud/produção
     # No Streamlit Cloud, as secrets ficam em st.secrets
     try:
@@ -417,51 +510,51 @@ def carregar_configuracao_banco():
                     'sslmode': 'require',
                     'connect_timeout': 10
                 }
-                st.success("🔗 Conectando com Supabase via Streamlit Secrets")
+                mensagens.append(('success', "🔗 Conectando com Supabase via Streamlit Secrets"))
                 if _testar_conexao(config):
-                    st.success("✅ Conectado ao Supabase PostgreSQL")
-                    return config
+                    mensagens.append(('success', "✅ Conectado ao Supabase PostgreSQL"))
+                    return config, mensagens
                 else:
-                    st.error("❌ Falha na conexão com Supabase via secrets")
+                    mensagens.append(('error', "❌ Falha na conexão com Supabase via secrets"))
     except Exception as e:
-        st.warning(f"⚠️ Erro ao carregar Streamlit secrets: {str(e)}")
+        mensagens.append(('warning', f"⚠️ Erro ao carregar Streamlit secrets: {str(e)}"))
 
     # 2. DETECÇÃO DE AMBIENTE CODESPACES
     if 'CODESPACE_NAME' in os.environ:
-        st.warning("⚠️ **Modo Desenvolvimento - GitHub Codespaces**")
-        st.info("🔧 Conexão com banco externo bloqueada. Usando dados simulados para desenvolvimento.")
-        st.info("🚀 **Para produção:** Deploy no Streamlit Cloud com as credenciais do Supabase")
-        return None  # Retorna None para usar dados simulados
+        mensagens.append(('warning', "⚠️ **Modo Desenvolvimento - GitHub Codespaces**"))
+        mensagens.append(('info', "🔧 Conexão com banco externo bloqueada. Usando dados simulados para desenvolvimento."))
+        mensagens.append(('info', "🚀 **Para produção:** Deploy no Streamlit Cloud com as credenciais do Supabase"))
+        return None, mensagens  # Retorna None para usar dados simulados
 
     # 3. Carregar variáveis de ambiente (.env)
     _carregar_dotenv()
 
     # 4. Detectar e usar configuração adequada
     ambiente = _detectar_ambiente()
-    st.info(f"🌍 Ambiente detectado: {ambiente}")
+    mensagens.append(('info', f"🌍 Ambiente detectado: {ambiente}"))
 
     if ambiente == 'supabase':
         config = _config_supabase()
         if _testar_conexao(config):
-            st.success("✅ Conectado ao Supabase PostgreSQL")
-            return config
+            mensagens.append(('success', "✅ Conectado ao Supabase PostgreSQL"))
+            return config, mensagens
         else:
-            st.error("❌ Erro de conexão com Supabase PostgreSQL")
-            st.info("💡 Verifique se as credenciais estão corretas no arquivo .env")
-            return None
+            mensagens.append(('error', "❌ Erro de conexão com Supabase PostgreSQL"))
+            mensagens.append(('info', "💡 Verifique se as credenciais estão corretas no arquivo .env"))
+            return None, mensagens
 
     elif ambiente == 'render':
         config = _config_render()
         if _testar_conexao(config):
-            st.success("✅ Conectado ao Render PostgreSQL")
-            return config
+            mensagens.append(('success', "✅ Conectado ao Render PostgreSQL"))
+            return config, mensagens
         else:
-            st.error("❌ Erro de conexão com Render PostgreSQL")
-            return None
+            mensagens.append(('error', "❌ Erro de conexão com Render PostgreSQL"))
+            return None, mensagens
 
     # 5. Fallback para dados simulados em caso de erro
-    st.warning("⚠️ Nenhuma configuração de banco válida encontrada - Usando dados simulados")
-    return None
+    mensagens.append(('warning', "⚠️ Nenhuma configuração de banco válida encontrada - Usando dados simulados"))
+    return None, mensagens
 
 def _carregar_dotenv():
     """Carrega variáveis de ambiente"""
@@ -548,6 +641,273 @@ def _testar_conexao(config):
     except:
         return False
 
+# ============================================================================
+# POOL DE CONEXÕES POSTGRESQL (COMPARTILHADO PELO PROCESSO)
+# ============================================================================
+
+def _ler_parametro_banco(chave, padrao):
+    """Lê parâmetro de ajuste do banco em st.secrets['database'] ou variável de ambiente"""
+    try:
+        # load_if_toml_exists não exibe st.error quando não há secrets.toml
+        if st.secrets.load_if_toml_exists() and 'database' in st.secrets:
+            valor = st.secrets['database'].get(chave)
+            if valor not in (None, ''):
+                return type(padrao)(valor)
+    except Exception:
+        pass
+
+    valor = os.getenv(chave)
+    if valor in (None, ''):
+        return padrao
+    try:
+        return type(padrao)(valor)
+    except (TypeError, ValueError):
+        return padrao
+
+class PoolConexoesBaker:
+    """
+    Pool limitado de conexões psycopg2 reutilizado por todas as funções CRUD
+    Evita um novo handshake TLS com o Supabase a cada clique
+    """
+
+    def __init__(self, config: Dict, max_conexoes: int = 5, max_ocioso_seg: float = 300.0,
+                 verificar_apos_seg: float = 30.0, timeout_espera_seg: float = 10.0):
+        self.config = dict(config)
+        self.max_conexoes = max(1, int(max_conexoes))
+        self.max_ocioso_seg = max_ocioso_seg
+        self.verificar_apos_seg = verificar_apos_seg
+        self.timeout_espera_seg = timeout_espera_seg
+
+        self._ociosas = []  # [(conexao, instante_devolucao)]
+        self._abertas = 0
+        self._condicao = threading.Condition()
+        self._estatisticas = {
+            'hits': 0,
+            'misses': 0,
+            'esperas': 0,
+            'tempo_espera_total': 0.0,
+            'descartadas': 0,
+            'expiradas': 0,
+            'timeouts': 0
+        }
+
+    def _fechar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expirar_ociosas(self):
+        """Fecha conexões ociosas há mais de max_ocioso_seg (chamar com o lock)"""
+        agora = time.monotonic()
+        mantidas = []
+        for conn, devolvida_em in self._ociosas:
+            if agora - devolvida_em > self.max_ocioso_seg:
+                self._fechar(conn)
+                self._abertas -= 1
+                self._estatisticas['expiradas'] += 1
+            else:
+                mantidas.append((conn, devolvida_em))
+        self._ociosas = mantidas
+
+    def _conexao_saudavel(self, conn, devolvida_em: float) -> bool:
+        """Health check: conexão aberta e, se ficou ociosa, responde a SELECT 1"""
+        if conn.closed:
+            return False
+        if time.monotonic() - devolvida_em < self.verificar_apos_seg:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _obter(self):
+        inicio_espera = None
+        while True:
+            with self._condicao:
+                self._expirar_ociosas()
+
+                if self._ociosas:
+                    conn, devolvida_em = self._ociosas.pop()
+                elif self._abertas < self.max_conexoes:
+                    # Reservar a vaga e abrir a conexão fora do lock
+                    self._abertas += 1
+                    conn, devolvida_em = None, None
+                else:
+                    if inicio_espera is None:
+                        inicio_espera = time.monotonic()
+                        self._estatisticas['esperas'] += 1
+                    restante = self.timeout_espera_seg - (time.monotonic() - inicio_espera)
+                    if restante <= 0 or not self._condicao.wait(timeout=restante):
+                        self._estatisticas['timeouts'] += 1
+                        self._estatisticas['tempo_espera_total'] += time.monotonic() - inicio_espera
+                        raise psycopg2.pool.PoolError("Pool de conexões esgotado - tente novamente")
+                    continue
+
+                if inicio_espera is not None:
+                    self._estatisticas['tempo_espera_total'] += time.monotonic() - inicio_espera
+
+            if conn is None:
+                try:
+                    conn = psycopg2.connect(**self.config)
+                except Exception:
+                    with self._condicao:
+                        self._abertas -= 1
+                        self._condicao.notify()
+                    raise
+                with self._condicao:
+                    self._estatisticas['misses'] += 1
+                return conn
+
+            if self._conexao_saudavel(conn, devolvida_em):
+                with self._condicao:
+                    self._estatisticas['hits'] += 1
+                return conn
+
+            # Conexão quebrada: descartar e tentar novamente
+            self._fechar(conn)
+            with self._condicao:
+                self._abertas -= 1
+                self._estatisticas['descartadas'] += 1
+
+    def _devolver(self, conn, com_erro: bool = False):
+        reutilizavel = not conn.closed
+        if reutilizavel:
+            try:
+                if com_erro or conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                reutilizavel = False
+
+        with self._condicao:
+            if reutilizavel:
+                self._ociosas.append((conn, time.monotonic()))
+            else:
+                self._fechar(conn)
+                self._abertas -= 1
+                self._estatisticas['descartadas'] += 1
+            self._condicao.notify()
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão do pool; transações não confirmadas sofrem rollback na devolução"""
+        conn = self._obter()
+        try:
+            yield conn
+        except Exception:
+            self._devolver(conn, com_erro=True)
+            raise
+        else:
+            self._devolver(conn)
+
+    def estatisticas(self) -> Dict:
+        """Contadores de uso do pool para exibição no sidebar"""
+        with self._condicao:
+            stats = dict(self._estatisticas)
+            stats['abertas'] = self._abertas
+            stats['ociosas'] = len(self._ociosas)
+            stats['em_uso'] = self._abertas - len(self._ociosas)
+            stats['max_conexoes'] = self.max_conexoes
+        total = stats['hits'] + stats['misses']
+        stats['taxa_reuso'] = (stats['hits'] / total * 100) if total > 0 else 0.0
+        return stats
+
+    def fechar_todas(self):
+        """Fecha todas as conexões ociosas (as emprestadas são fechadas na devolução)"""
+        with self._condicao:
+            for conn, _ in self._ociosas:
+                self._fechar(conn)
+            self._abertas -= len(self._ociosas)
+            self._ociosas = []
+
+@st.cache_resource(show_spinner=False)
+def _registro_pools() -> Dict:
+    """Registro dos pools criados no processo (usado pelo sidebar)"""
+    return {}
+
+@st.cache_resource(show_spinner=False)
+def obter_pool_conexoes(config: Dict) -> PoolConexoesBaker:
+    """Pool único por processo do servidor e por configuração de banco"""
+    pool = PoolConexoesBaker(
+        config,
+        max_conexoes=_ler_parametro_banco('DB_POOL_MAX', 5),
+        max_ocioso_seg=_ler_parametro_banco('DB_POOL_MAX_IDLE', 300.0),
+        verificar_apos_seg=_ler_parametro_banco('DB_POOL_CHECK_AFTER', 30.0),
+        timeout_espera_seg=_ler_parametro_banco('DB_POOL_TIMEOUT', 10.0)
+    )
+    _registro_pools()[f"{config.get('host')}:{config.get('port')}/{config.get('database')}"] = pool
+    return pool
+
+@st.cache_resource(show_spinner=False)
+def obter_engine_sqlalchemy(config: Dict):
+    """Engine SQLAlchemy de longa duração (um por processo) para leituras com pandas"""
+    from sqlalchemy import create_engine
+    from urllib.parse import quote_plus
+
+    user_enc = quote_plus(str(config.get('user','')))
+    pwd_enc = quote_plus(str(config.get('password','')))
+    host = config.get('host')
+    port = config.get('port', 5432)
+    db   = config.get('database', config.get('dbname', 'postgres'))
+    params = f"?sslmode={config.get('sslmode')}" if config.get('sslmode') else ""
+    uri = f"postgresql+psycopg2://{user_enc}:{pwd_enc}@{host}:{port}/{db}{params}"
+
+    connect_args = {'connect_timeout': config.get('connect_timeout', 10)}
+    if config.get('options'):
+        connect_args['options'] = config['options']
+
+    return create_engine(
+        uri,
+        pool_pre_ping=True,
+        pool_size=_ler_parametro_banco('DB_POOL_MAX', 5),
+        max_overflow=_ler_parametro_banco('DB_POOL_OVERFLOW', 2),
+        pool_recycle=_ler_parametro_banco('DB_POOL_MAX_IDLE', 300),
+        pool_timeout=_ler_parametro_banco('DB_POOL_TIMEOUT', 10.0),
+        connect_args=connect_args
+    )
+
+def consultar_dataframe(query: str, params: Optional[Dict] = None,
+                        config: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Executa consulta de leitura (parâmetros no formato %(nome)s) e retorna DataFrame
+    Prefere o engine persistente e faz fallback para o pool psycopg2.
+    Falhas da consulta sempre saem como psycopg2.Error
+    """
+    if config is None:
+        config = carregar_configuracao_banco()
+    if not config:
+        raise psycopg2.OperationalError("Configuração do banco indisponível")
+
+    try:
+        engine = obter_engine_sqlalchemy(config)
+        with engine.connect() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+    except Exception:
+        with conexao_banco(config) as conn:
+            try:
+                return pd.read_sql_query(query, conn, params=params)
+            except pd.errors.DatabaseError as e:
+                # Com conexão psycopg2 o pandas embrulha o erro em DatabaseError (OSError)
+                if isinstance(e.__cause__, psycopg2.Error):
+                    raise e.__cause__ from e
+                raise psycopg2.DatabaseError(str(e)) from e
+
+@contextmanager
+def conexao_banco(config: Optional[Dict] = None):
+    """Context manager para obter conexão do pool compartilhado"""
+    if config is None:
+        config = carregar_configuracao_banco()
+    if not config:
+        raise psycopg2.OperationalError("Configuração do banco indisponível")
+
+    with obter_pool_conexoes(config).conexao() as conn:
+        yield conn
+
 # Configurações de Alertas Inteligentes - REMOVIDO "envio_final_pendente"
 ALERTAS_CONFIG = {
     'ctes_sem_aprovacao': {
@@ -695,68 +1055,826 @@ def _gerar_dados_simulados():
     return df
 
 # ============================================================================
-# FUNÇÃO DE CACHE OTIMIZADA
+# LEITURA EM MASSA VIA COPY
+# ============================================================================
+
+# Esquema declarado da tabela dashboard_baker (tipos usados na leitura via COPY)
+COLUNAS_DASHBOARD_CTE = ['numero_cte', 'destinatario_nome', 'veiculo_placa', 'valor_total',
+                         'data_emissao', 'numero_fatura', 'data_baixa', 'observacao',
+                         'data_inclusao_fatura', 'data_envio_processo', 'primeiro_envio',
+                         'data_rq_tmc', 'data_atesto', 'envio_final', 'origem_dados',
+                         'created_at', 'updated_at']
+COLUNAS_TEXTO_CTE = ['destinatario_nome', 'veiculo_placa', 'numero_fatura', 'observacao', 'origem_dados']
+COLUNAS_DATA_CTE = ['data_emissao', 'data_baixa', 'data_inclusao_fatura',
+                    'data_envio_processo', 'primeiro_envio', 'data_rq_tmc',
+                    'data_atesto', 'envio_final']
+COLUNAS_TIMESTAMP_CTE = ['created_at', 'updated_at']
+
+# Projeção das visões comuns (dashboard, cards de alerta, pendências): sem o texto
+# livre e sem as colunas de auditoria
+COLUNAS_PAINEL_CTE = [col for col in COLUNAS_DASHBOARD_CTE
+                      if col not in ('observacao', 'created_at', 'updated_at')]
+
+# ============================================================================
+# LIMPEZA DAS SENTINELAS DE NULO (LEITURA, PROJEÇÃO SQL OU INGESTÃO)
 # ============================================================================
 
-@st.cache_data(ttl=300, show_spinner=False)
-def carregar_dados_postgresql():
-    """Carrega dados do PostgreSQL ou simula dados para desenvolvimento"""
+_ESPACOS_SQL = "E' \\t\\r\\n'"
+
+def _sql_texto_limpo(coluna: str) -> str:
+    """Coluna de texto com as sentinelas de nulo trocadas por NULL no próprio SELECT"""
+    return f"CASE WHEN btrim({coluna}, {_ESPACOS_SQL}) IN ({_NULOS_SQL}) THEN NULL ELSE {coluna} END"
+
+def _modo_limpeza_nulos() -> str:
+    """
+    Onde as sentinelas viram nulo (DB_LIMPEZA_NULOS):
+    leitura (pandas, padrão) | sql (projeção do SELECT) | ingestao (trigger; nada a fazer na leitura)
+    """
+    return _ler_parametro_banco('DB_LIMPEZA_NULOS', 'leitura').lower()
+
+def _projecao_cte(colunas: List[str]) -> str:
+    """Lista do SELECT das colunas de CTE, com a limpeza embutida no modo sql"""
+    limpar = _modo_limpeza_nulos() == 'sql'
+    return ', '.join(
+        f"{_sql_texto_limpo(coluna)} AS {coluna}" if limpar and coluna in COLUNAS_TEXTO_CTE else coluna
+        for coluna in colunas
+    )
+
+SQL_TRIGGER_NULOS_TRADUZIDOS = f"""
+CREATE OR REPLACE FUNCTION normalizar_nulos_dashboard_baker()
+RETURNS TRIGGER AS $$
+BEGIN
+{''.join(f"    NEW.{coluna} := {_sql_texto_limpo('NEW.' + coluna)};{chr(10)}" for coluna in COLUNAS_TEXTO_CTE)}    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS normalizar_nulos_dashboard_baker ON dashboard_baker;
+CREATE TRIGGER normalizar_nulos_dashboard_baker
+    BEFORE INSERT OR UPDATE ON dashboard_baker
+    FOR EACH ROW EXECUTE FUNCTION normalizar_nulos_dashboard_baker();
+"""
+
+# Limpeza única das linhas já gravadas (depois disso o trigger mantém a tabela limpa)
+SQL_LIMPAR_NULOS_TRADUZIDOS = f"""
+UPDATE dashboard_baker SET
+    {', '.join(f'{coluna} = {_sql_texto_limpo(coluna)}' for coluna in COLUNAS_TEXTO_CTE)}
+WHERE {' OR '.join(f'btrim({coluna}, {_ESPACOS_SQL}) IN ({_NULOS_SQL})' for coluna in COLUNAS_TEXTO_CTE)}
+"""
+
+def _tipos_arrow_cte() -> Dict:
+    """Tipos Arrow das colunas conhecidas da tabela dashboard_baker"""
+    import pyarrow as pa
+
+    tipos = {'numero_cte': pa.int64(), 'valor_total': pa.float64()}
+    tipos.update({col: pa.string() for col in COLUNAS_TEXTO_CTE})
+    tipos.update({col: pa.date32() for col in COLUNAS_DATA_CTE})
+    tipos.update({col: pa.timestamp('us') for col in COLUNAS_TIMESTAMP_CTE})
+    return tipos
+
+def _csv_para_dataframe(buffer) -> pd.DataFrame:
+    """Converte o CSV produzido pelo COPY em DataFrame com tipos declarados"""
     try:
-        config = carregar_configuracao_banco()
+        import pyarrow.csv as pa_csv
+
+        tabela = pa_csv.read_csv(
+            buffer,
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=_tipos_arrow_cte(),
+                null_values=[''],
+                strings_can_be_null=True
+            )
+        )
+        df = tabela.to_pandas(date_as_object=False)
+    except ImportError:
+        df = pd.read_csv(
+            buffer,
+            dtype={col: 'object' for col in COLUNAS_TEXTO_CTE},
+            keep_default_na=False,
+            na_values=['']
+        )
+        # Formatos explícitos: muito mais rápido que parse_dates com inferência
+        for col in COLUNAS_DATA_CTE:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], format='%Y-%m-%d')
+        for col in COLUNAS_TIMESTAMP_CTE:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], format='ISO8601')
+
+    # Mesma resolução temporal do caminho read_sql_query + pd.to_datetime
+    for col in COLUNAS_DATA_CTE + COLUNAS_TIMESTAMP_CTE:
+        if col in df.columns:
+            df[col] = df[col].astype('datetime64[ns]')
 
-        # Se config é None (Codespaces), usar dados simulados
-        if config is None:
-            return _gerar_dados_simulados()
+    return df
 
-        query = """
-        SELECT 
-            numero_cte, destinatario_nome, veiculo_placa, valor_total,
-            data_emissao, numero_fatura, data_baixa, observacao,
-            data_inclusao_fatura, data_envio_processo, primeiro_envio,
-            data_rq_tmc, data_atesto, envio_final, origem_dados,
-            created_at, updated_at
-        FROM dashboard_baker 
-        ORDER BY numero_cte DESC
-        LIMIT 5000;
-        """
+def ler_dados_via_copy(query: str, config: Optional[Dict] = None,
+                       params: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Lê o resultado de uma consulta com COPY (SELECT ...) TO STDOUT em CSV
+    Evita materializar cada linha como tupla Python no driver
+    """
+    buffer = BytesIO()
+
+    with conexao_banco(config) as conn:
+        cursor = conn.cursor()
+        # COPY não aceita parâmetros: interpolar com o escape do próprio driver
+        if params:
+            query = cursor.mogrify(query, params).decode('utf-8')
+        query_copy = query.strip().rstrip(';')
+        cursor.copy_expert(f"COPY ({query_copy}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+        cursor.close()
 
-        # Preferir SQLAlchemy (engine) e fazer fallback para psycopg2
+    buffer.seek(0)
+    return _csv_para_dataframe(buffer)
+
+def _tipar_dataframe_cte(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpa traduções e garante tipos de data/valor do DataFrame de CTEs"""
+    if df.empty:
+        return df
+
+    # CORREÇÃO: Limpar traduções do DataFrame (no lugar; dispensável se o banco/SELECT já limpou)
+    if _modo_limpeza_nulos() == 'leitura':
+        df = normalizar_nulos_traduzidos(df)
+
+    # Converter datas (no-op para colunas já tipadas pela leitura via COPY)
+    for col in COLUNAS_DATA_CTE + COLUNAS_TIMESTAMP_CTE:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    if 'valor_total' in df.columns:
+        df['valor_total'] = pd.to_numeric(df['valor_total'], errors='coerce').fillna(0)
+
+    return df
+
+def ler_dados_cte(query: str, config: Optional[Dict] = None,
+                  params: Optional[Dict] = None) -> pd.DataFrame:
+    """Leitura tipada da tabela de CTEs; modo definido por DB_MODO_LEITURA (copy | pandas)"""
+    modo = _ler_parametro_banco('DB_MODO_LEITURA', 'copy').lower()
+
+    if modo == 'copy':
         try:
-            from sqlalchemy import create_engine
-            from urllib.parse import quote_plus
-            user_enc = quote_plus(str(config.get('user','')))
-            pwd_enc = quote_plus(str(config.get('password','')))
-            host = config.get('host')
-            port = config.get('port', 5432)
-            db   = config.get('database','postgres')
-            params = f"?sslmode={config.get('sslmode')}" if config.get('sslmode') else ""
-            uri = f"postgresql+psycopg2://{user_enc}:{pwd_enc}@{host}:{port}/{db}{params}"
-            engine = create_engine(uri, pool_pre_ping=True)
-            df = pd.read_sql_query(query, engine)
-            engine.dispose()
+            return _tipar_dataframe_cte(ler_dados_via_copy(query, config, params))
+        except psycopg2.OperationalError:
+            raise
         except Exception:
-            conn = psycopg2.connect(**config)
-            df = pd.read_sql_query(query, conn)
-            conn.close()
+            # Fallback para o caminho tradicional
+            pass
 
-        # CORREÇÃO: Limpar traduções do DataFrame
-        if not df.empty:
-            df = corrigir_dataframe_traduzido(df)
-            # Converter datas
-            date_columns = ['data_emissao', 'data_baixa', 'data_inclusao_fatura',
-                          'data_envio_processo', 'primeiro_envio', 'data_rq_tmc',
-                          'data_atesto', 'envio_final', 'created_at', 'updated_at']
+    return _tipar_dataframe_cte(consultar_dataframe(query, params=params, config=config))
 
-            for col in date_columns:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
+def iterar_blocos_cte(colunas: Optional[List[str]] = None, condicao_sql: str = '',
+                      params: Optional[Dict] = None, tamanho_bloco: Optional[int] = None,
+                      config: Optional[Dict] = None):
+    """
+    Percorre dashboard_baker em blocos de tamanho fixo (paginação keyset em numero_cte DESC)
+    Cada bloco é lido e tipado separadamente, então o buffer de leitura fica limitado
+    """
+    colunas = list(colunas or COLUNAS_DASHBOARD_CTE)
+    if 'numero_cte' not in colunas:
+        colunas.insert(0, 'numero_cte')
+    tamanho_bloco = int(tamanho_bloco or _ler_parametro_banco('DB_TAMANHO_BLOCO', 20000))
+
+    ultimo_cte = None
+    while True:
+        filtros = [f"({condicao_sql})"] if condicao_sql else []
+        params_bloco = dict(params or {})
+        if ultimo_cte is not None:
+            filtros.append("numero_cte < %(_ultimo_cte)s")
+            params_bloco['_ultimo_cte'] = ultimo_cte
+
+        query = f"""
+        SELECT {_projecao_cte(colunas)}
+        FROM dashboard_baker
+        {'WHERE ' + ' AND '.join(filtros) if filtros else ''}
+        ORDER BY numero_cte DESC
+        LIMIT {tamanho_bloco}
+        """
 
-            if 'valor_total' in df.columns:
-                df['valor_total'] = pd.to_numeric(df['valor_total'], errors='coerce').fillna(0)
+        bloco = ler_dados_cte(query, config, params_bloco or None)
+        if bloco.empty:
+            break
 
+        yield bloco
+
+        if len(bloco) < tamanho_bloco:
+            break
+        ultimo_cte = int(bloco['numero_cte'].iloc[-1])
+
+# ============================================================================
+# REPRESENTAÇÃO COMPACTA EM MEMÓRIA
+# ============================================================================
+
+# Texto vira category quando há no máximo esta fração de valores distintos por valor preenchido
+LIMITE_CARDINALIDADE_CATEGORIA = 0.5
+
+def compactar_dataframe_cte(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipos compactos para o DataFrame de CTEs mantido em cache: category para texto
+    de baixa cardinalidade (clientes, placas, origem) e int32 para numero_cte
+    (a coluna é INTEGER no banco). Reaplicar sobre um DataFrame já compacto é barato
+    """
+    if df.empty:
         return df
 
+    colunas = {}
+    if pd.api.types.is_integer_dtype(df.get('numero_cte')) and df['numero_cte'].dtype != np.int32:
+        colunas['numero_cte'] = df['numero_cte'].astype(np.int32)
+
+    for coluna in COLUNAS_TEXTO_CTE:
+        if coluna in df.columns and df[coluna].dtype == object:
+            preenchidos = df[coluna].count()
+            if preenchidos and df[coluna].nunique() <= LIMITE_CARDINALIDADE_CATEGORIA * preenchidos:
+                colunas[coluna] = df[coluna].astype('category')
+
+    return df.assign(**colunas) if colunas else df
+
+def relatorio_memoria_dataframe(df_antes: pd.DataFrame, df_depois: pd.DataFrame) -> pd.DataFrame:
+    """Bytes por coluna (incluindo o conteúdo das strings) antes e depois da compactação"""
+    antes = df_antes.memory_usage(deep=True, index=False)
+    depois = df_depois.memory_usage(deep=True, index=False)
+
+    relatorio = pd.DataFrame({
+        'tipo_antes': df_antes.dtypes.astype(str),
+        'tipo_depois': df_depois.dtypes.astype(str),
+        'bytes_antes': antes,
+        'bytes_depois': depois
+    })
+    relatorio.loc['TOTAL'] = ['', '', antes.sum(), depois.sum()]
+    relatorio['reducao_pct'] = (1 - relatorio['bytes_depois'] / relatorio['bytes_antes'].where(relatorio['bytes_antes'] > 0)) * 100
+    return relatorio
+
+# ============================================================================
+# ATUALIZAÇÃO INCREMENTAL (DELTA POR updated_at)
+# ============================================================================
+
+def _carregar_tabela_completa(config: Dict, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+    """Tabela completa em blocos (sem o antigo LIMIT 5000), só com as colunas pedidas"""
+    colunas = list(colunas or COLUNAS_DASHBOARD_CTE)
+    blocos = list(iterar_blocos_cte(colunas, config=config))
+    if not blocos:
+        return pd.DataFrame(columns=colunas)
+
+    return pd.concat(blocos, ignore_index=True)
+
+def _mesclar_delta_cte(df_base: pd.DataFrame, df_delta: pd.DataFrame) -> pd.DataFrame:
+    """Substitui/inclui as linhas alteradas no DataFrame base, por numero_cte"""
+    if df_delta.empty:
+        return df_base
+
+    df_mantido = df_base[~df_base['numero_cte'].isin(df_delta['numero_cte'])]
+    df = pd.concat([df_mantido, df_delta[df_base.columns]], ignore_index=True)
+    return df.sort_values('numero_cte', ascending=False, ignore_index=True)
+
+def _colunas_armazem(colunas: Optional[List[str]] = None) -> Tuple[str, ...]:
+    """
+    Conjunto de colunas de um armazém: as pedidas mais numero_cte e updated_at
+    (chave da mescla e marca do delta), na ordem da tabela
+    """
+    if colunas is None:
+        return tuple(COLUNAS_DASHBOARD_CTE)
+
+    pedidas = set(colunas) | {'numero_cte', 'updated_at'}
+    desconhecidas = pedidas - set(COLUNAS_DASHBOARD_CTE)
+    if desconhecidas:
+        raise ValueError(f"Colunas inexistentes em dashboard_baker: {sorted(desconhecidas)}")
+    return tuple(col for col in COLUNAS_DASHBOARD_CTE if col in pedidas)
+
+@st.cache_resource(show_spinner=False)
+def _registro_armazens() -> Dict:
+    """Conjuntos de colunas já carregados no processo, por banco"""
+    return {}
+
+def _armazens_config(config: Dict) -> List[Dict]:
+    """Armazéns do banco (o da tabela completa sempre incluído), do maior para o menor"""
+    chave = _chave_config_banco(config)
+    projecoes = set(_registro_armazens().get(chave, ())) | {_colunas_armazem()}
+    return [_armazem_dados_cte(chave, colunas) for colunas in sorted(projecoes, key=len, reverse=True)]
+
+@st.cache_resource(show_spinner=False)
+def _armazem_dados_cte(chave_config: str, colunas: Tuple[str, ...] = tuple(COLUNAS_DASHBOARD_CTE)) -> Dict:
+    """DataFrame de CTEs (uma projeção de colunas) mantido no processo e atualizado por deltas"""
+    return {
+        'colunas': colunas,
+        # (versao, df) trocados juntos: leitores sem o lock nunca veem um par misturado
+        'dados': (None, None),
+        'marca_updated_at': None,
+        'carregado_em': None,
+        'sketch': None,
+        'sketch_salvo_em': 0.0,
+        'lock': threading.Lock(),
+        'estatisticas': {
+            'recargas_completas': 0,
+            'atualizacoes_delta': 0,
+            'linhas_ultimo_delta': 0,
+            'exclusoes_detectadas': 0,
+            'projecoes_reaproveitadas': 0,
+            'memoria_antes': 0,
+            'memoria_depois': 0
+        }
+    }
+
+def _chave_config_banco(config: Dict) -> str:
+    return f"{config.get('host')}:{config.get('port')}/{config.get('database')}"
+
+def _atualizar_sketch_armazem(armazem: Dict, df_antigo: Optional[pd.DataFrame], df_novo: pd.DataFrame,
+                              versao: Optional[str], ctes: Optional[List[int]] = None):
+    """
+    Mantém o sketch de variações (histogramas por par/cliente/mês) junto do DataFrame:
+    recarga completa (ctes=None) monta de novo ou reaproveita o arquivo salvo da mesma
+    versão; escritas retiram as linhas antigas dos CTEs tocados e somam as novas.
+    Projeções sem as colunas do ciclo de vida não mantêm sketch
+    """
+    colunas_sketch = {'destinatario_nome'} | {par[campo] for par in VARIACOES_CONFIG
+                                              for campo in ('campo_inicio', 'campo_fim')}
+    if not colunas_sketch <= set(armazem['colunas']):
+        return
+
+    arquivo = _ler_parametro_banco('DB_SKETCH_ARQUIVO', '')
+
+    try:
+        sketch = armazem['sketch']
+        if ctes is None or sketch is None or df_antigo is None:
+            sketch = None
+            if arquivo and versao is not None and os.path.exists(arquivo):
+                salvo = SketchVariacoes.carregar(arquivo)
+                if salvo.versao == versao and salvo.linhas == len(df_novo):
+                    sketch = salvo
+            if sketch is None:
+                sketch = SketchVariacoes.de_dataframe(df_novo, VARIACOES_CONFIG)
+                armazem['sketch_salvo_em'] = 0.0
+        else:
+            tocados = df_antigo['numero_cte'].isin(ctes) | ~df_antigo['numero_cte'].isin(df_novo['numero_cte'])
+            sketch.remover(df_antigo[tocados])
+            sketch.adicionar(df_novo[df_novo['numero_cte'].isin(ctes)])
+
+        sketch.versao = versao
+        armazem['sketch'] = sketch
+
+        intervalo_salvar = _ler_parametro_banco('DB_SKETCH_SALVAR_SEG', 60.0)
+        if arquivo and versao is not None and time.monotonic() - armazem['sketch_salvo_em'] > intervalo_salvar:
+            sketch.salvar(arquivo)
+            armazem['sketch_salvo_em'] = time.monotonic()
+    except Exception:
+        # Sem sketch as variações voltam ao cálculo pela matriz
+        armazem['sketch'] = None
+
+def _recortar_de_outro_armazem(config: Dict, colunas: Tuple[str, ...], versao: Optional[str]) -> Optional[pd.DataFrame]:
+    """
+    Recorta a projeção de um armazém com mais colunas já carregado na mesma versão
+    (sem ir ao banco). Só se pega o lock de armazéns maiores, então não há ciclo de espera
+    """
+    if versao is None:
+        return None
+
+    for outro in _armazens_config(config):
+        if len(outro['colunas']) <= len(colunas) or not set(colunas) <= set(outro['colunas']):
+            continue
+        with outro['lock']:
+            versao_outro, df_outro = outro['dados']
+            if df_outro is not None and versao_outro == versao:
+                return df_outro[list(colunas)]
+    return None
+
+def _completar_de_outro_armazem(config: Dict, colunas: Tuple[str, ...], versao: Optional[str]) -> Optional[pd.DataFrame]:
+    """
+    Monta a projeção a partir de um armazém menor da mesma versão, lendo do banco
+    só as colunas que faltam (as linhas precisam vir na mesma ordem de numero_cte)
+    """
+    if versao is None:
+        return None
+
+    for outro in _armazens_config(config):
+        if len(outro['colunas']) >= len(colunas) or not set(outro['colunas']) <= set(colunas):
+            continue
+        # Sem o lock do menor: quem o segura pode estar esperando o nosso em _recortar_de_outro_armazem.
+        # Uma única leitura do par publicado garante df e versão do mesmo momento
+        versao_base, df_base = outro['dados']
+        if df_base is None or versao_base != versao:
+            continue
+
+        faltantes = [col for col in colunas if col not in df_base.columns]
+        df_faltantes = _carregar_tabela_completa(config, ['numero_cte'] + faltantes)
+        if not np.array_equal(df_faltantes['numero_cte'].to_numpy(), df_base['numero_cte'].to_numpy()):
+            return None
+        return pd.concat([df_base.reset_index(drop=True), df_faltantes[faltantes]], axis=1)[list(colunas)]
+    return None
+
+def atualizar_dados_incremental(config: Dict, versao: Optional[str] = None,
+                                colunas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Retorna o DataFrame de CTEs (todas as colunas ou a projeção pedida) buscando
+    no banco só o que mudou: linhas com updated_at acima da última marca vista
+    (com margem de segurança) e exclusões detectadas por contagem
+    """
+    chave = _chave_config_banco(config)
+    colunas = _colunas_armazem(colunas)
+    _registro_armazens().setdefault(chave, set()).add(colunas)
+    armazem = _armazem_dados_cte(chave, colunas)
+    modo = _ler_parametro_banco('DB_MODO_ATUALIZACAO', 'incremental').lower()
+    intervalo_recarga = _ler_parametro_banco('DB_RECARGA_COMPLETA_SEG', 3600.0)
+    margem = timedelta(seconds=_ler_parametro_banco('DB_DELTA_MARGEM_SEG', 5.0))
+
+    with armazem['lock']:
+        versao_atual, df_atual = armazem['dados']
+        # Versão já aplicada (ex.: escrita do próprio dashboard via aplicar_alteracoes_cache)
+        if versao is not None and df_atual is not None and versao_atual == versao:
+            return df_atual
+
+        stats = armazem['estatisticas']
+        recarga_completa = (
+            modo != 'incremental' or
+            df_atual is None or
+            armazem['marca_updated_at'] is None or
+            time.monotonic() - armazem['carregado_em'] > intervalo_recarga
+        )
+
+        ctes_delta = None
+        if recarga_completa:
+            df = _recortar_de_outro_armazem(config, colunas, versao)
+            if df is None:
+                df = _completar_de_outro_armazem(config, colunas, versao)
+            if df is None:
+                df = _carregar_tabela_completa(config, list(colunas))
+                stats['recargas_completas'] += 1
+            else:
+                stats['projecoes_reaproveitadas'] += 1
+            armazem['carregado_em'] = time.monotonic()
+            stats['memoria_antes'] = int(df.memory_usage(deep=True).sum())
+        else:
+            # Delta: linhas criadas/alteradas desde a última marca
+            blocos = list(iterar_blocos_cte(
+                list(colunas),
+                condicao_sql="updated_at > %(desde)s",
+                params={'desde': (armazem['marca_updated_at'] - margem).to_pydatetime()},
+                config=config
+            ))
+            df_delta = pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame(columns=list(colunas))
+            df = _mesclar_delta_cte(df_atual, df_delta)
+            ctes_delta = df_delta['numero_cte'].tolist()
+            stats['atualizacoes_delta'] += 1
+            stats['linhas_ultimo_delta'] = len(df_delta)
+
+            # Exclusões: contagem divergente => remover CTEs que não existem mais
+            total_banco = int(consultar_dataframe(
+                "SELECT COUNT(*) AS total FROM dashboard_baker", config=config
+            )['total'].iloc[0])
+            if len(df) != total_banco:
+                ctes_banco = consultar_dataframe("SELECT numero_cte FROM dashboard_baker", config=config)
+                df = df[df['numero_cte'].isin(ctes_banco['numero_cte'])].reset_index(drop=True)
+                stats['exclusoes_detectadas'] += 1
+                if len(df) != total_banco:
+                    df = _carregar_tabela_completa(config, list(colunas))
+                    ctes_delta = None
+                    armazem['carregado_em'] = time.monotonic()
+                    stats['recargas_completas'] += 1
+                    stats['memoria_antes'] = int(df.memory_usage(deep=True).sum())
+
+        # Linhas do delta chegam como object/int64: recompacta o resultado da mescla
+        df = compactar_dataframe_cte(df)
+        if ctes_delta is None:
+            stats['memoria_depois'] = int(df.memory_usage(deep=True).sum())
+
+        _atualizar_sketch_armazem(armazem, df_atual, df, versao, ctes_delta)
+        armazem['dados'] = (versao, df)
+        marca = df['updated_at'].max() if 'updated_at' in df.columns and not df.empty else pd.NaT
+        armazem['marca_updated_at'] = None if pd.isna(marca) else marca
+
+        return df
+
+def aplicar_alteracoes_cache(alterados: List[int] = (), excluidos: List[int] = (),
+                             config: Optional[Dict] = None) -> bool:
+    """
+    Aplica nos DataFrames em cache (todas as projeções carregadas) as escritas feitas
+    pelo próprio dashboard (upsert/exclusão por numero_cte), sem limpar o cache de
+    todos os usuários. Retorna False quando não havia dados em cache para corrigir
+    """
+    config = config or carregar_configuracao_banco()
+    if config is None:
+        return False
+
+    alterados = [int(cte) for cte in alterados]
+    excluidos = [int(cte) for cte in excluidos]
+
+    aplicado = False
+    for armazem in _armazens_config(config):
+        aplicado = _aplicar_alteracoes_armazem(armazem, alterados, excluidos, config) or aplicado
+
+    if not aplicado:
+        invalidar_versao_dados()
+    return aplicado
+
+def _aplicar_alteracoes_armazem(armazem: Dict, alterados: List[int], excluidos: List[int],
+                                config: Dict) -> bool:
+    colunas = list(armazem['colunas'])
+
+    with armazem['lock']:
+        _, df_base = armazem['dados']
+        if df_base is None:
+            return False
+
+        # Linhas alteradas e versão lidas no mesmo snapshot
+        with conexao_banco(config) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            linhas = []
+            if alterados:
+                cursor.execute(f"""
+                SELECT {_projecao_cte(colunas)}
+                FROM dashboard_baker
+                WHERE numero_cte = ANY(%(ctes)s)
+                """, {'ctes': alterados})
+                linhas = cursor.fetchall()
+            cursor.execute(QUERY_VERSAO_DADOS)
+            total, ultimo_updated_at, ultimo_id = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+
+        df_alterado = _tipar_dataframe_cte(pd.DataFrame(linhas, columns=colunas))
+        df = df_base[~df_base['numero_cte'].isin(alterados + excluidos)]
+        if not df_alterado.empty:
+            df = pd.concat([df, df_alterado[df_base.columns]], ignore_index=True)
+        df = compactar_dataframe_cte(df.sort_values('numero_cte', ascending=False, ignore_index=True))
+
+        # Só adota a versão do banco se o cache corrigido bate com ela;
+        # senão (escrita concorrente de outro processo) o próximo delta resolve
+        marca = df['updated_at'].max() if not df.empty else pd.NaT
+        consistente = (
+            total == len(df) and
+            (pd.isna(marca) if ultimo_updated_at is None else marca == pd.Timestamp(ultimo_updated_at))
+        )
+        versao = _formatar_versao_dados(total, ultimo_updated_at, ultimo_id) if consistente else None
+        armazem['dados'] = (versao, df)
+        if consistente:
+            armazem['marca_updated_at'] = None if pd.isna(marca) else marca
+            registrar_versao_dados(versao)
+        else:
+            invalidar_versao_dados()
+
+        _atualizar_sketch_armazem(armazem, df_base, df, versao, alterados + excluidos)
+
+        return True
+
+def estatisticas_atualizacao_dados() -> List[Dict]:
+    """Contadores de recarga completa/delta de cada armazém do processo (para o sidebar)"""
+    try:
+        config = carregar_configuracao_banco()
+    except Exception:
+        return []
+    if not config:
+        return []
+    return [dict(armazem['estatisticas'], colunas=len(armazem['colunas']))
+            for armazem in _armazens_config(config) if armazem['dados'][1] is not None]
+
+# ============================================================================
+# VERSÃO DOS DADOS (CHAVE DE CACHE)
+# ============================================================================
+
+QUERY_VERSAO_DADOS = """
+SELECT COUNT(*), MAX(updated_at), MAX(id)
+FROM dashboard_baker
+"""
+
+@st.cache_resource(show_spinner=False)
+def _cache_versao_dados() -> Dict:
+    """Última versão sondada no processo (evita várias sondas no mesmo rerun)"""
+    return {'versao': None, 'sondado_em': 0.0, 'lock': threading.Lock()}
+
+def sondar_versao_dados(config: Optional[Dict] = None) -> str:
+    """
+    Sonda barata da versão da tabela: total de linhas, último updated_at e último id.
+    Qualquer inserção, alteração (via updated_at) ou exclusão muda o resultado
+    """
+    config = config or carregar_configuracao_banco()
+    if config is None:
+        return 'simulado'
+
+    cache = _cache_versao_dados()
+    intervalo = _ler_parametro_banco('DB_VERSAO_INTERVALO_SEG', 1.0)
+
+    with cache['lock']:
+        if cache['versao'] is not None and time.monotonic() - cache['sondado_em'] < intervalo:
+            return cache['versao']
+
+        with conexao_banco(config) as conn:
+            cursor = conn.cursor()
+            cursor.execute(QUERY_VERSAO_DADOS)
+            total, ultimo_updated_at, ultimo_id = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+
+        cache['versao'] = _formatar_versao_dados(total, ultimo_updated_at, ultimo_id)
+        cache['sondado_em'] = time.monotonic()
+        return cache['versao']
+
+def _formatar_versao_dados(total: int, ultimo_updated_at, ultimo_id) -> str:
+    marca = ultimo_updated_at.isoformat() if ultimo_updated_at else '-'
+    return f"{total}|{marca}|{ultimo_id or 0}"
+
+def registrar_versao_dados(versao: str):
+    """Registra uma versão já conhecida (lida junto com uma escrita), dispensando nova sonda"""
+    cache = _cache_versao_dados()
+    with cache['lock']:
+        cache['versao'] = versao
+        cache['sondado_em'] = time.monotonic()
+
+def invalidar_versao_dados():
+    """Força nova sonda na próxima leitura (após escrita pelo próprio dashboard)"""
+    cache = _cache_versao_dados()
+    with cache['lock']:
+        cache['versao'] = None
+
+def versao_dados_atual() -> str:
+    """
+    Versão atual dos dados, usada como chave de cache do carregamento e dos
+    cálculos derivados. Se a sonda falhar, volta ao comportamento de TTL (300s)
+    """
+    try:
+        versao = sondar_versao_dados()
+    except Exception:
+        versao = f"ttl-{int(time.time() // 300)}"
+
+    st.session_state['versao_dados'] = versao
+    return versao
+
+# ============================================================================
+# NOTIFICAÇÕES DO BANCO (LISTEN/NOTIFY ENTRE PROCESSOS)
+# ============================================================================
+
+CANAL_ALTERACOES = 'dashboard_baker_alteracoes'
+
+SQL_TRIGGER_NOTIFICACAO = f"""
+CREATE OR REPLACE FUNCTION notificar_alteracao_dashboard_baker()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('{CANAL_ALTERACOES}', json_build_object(
+        'op', TG_OP,
+        'numero_cte', CASE WHEN TG_OP = 'DELETE' THEN OLD.numero_cte ELSE NEW.numero_cte END
+    )::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS notificar_dashboard_baker_alteracoes ON dashboard_baker;
+CREATE TRIGGER notificar_dashboard_baker_alteracoes
+    AFTER INSERT OR UPDATE OR DELETE ON dashboard_baker
+    FOR EACH ROW EXECUTE FUNCTION notificar_alteracao_dashboard_baker();
+"""
+
+class OuvinteAlteracoesBaker(threading.Thread):
+    """
+    Thread por processo que escuta o NOTIFY do trigger de dashboard_baker e aplica
+    as alterações de outros processos/réplicas no DataFrame em cache local
+    """
+
+    def __init__(self, config: Dict, intervalo_lote_seg: float = 0.5, limite_lote: int = 1000):
+        super().__init__(name='ouvinte-dashboard-baker', daemon=True)
+        self.config = dict(config)
+        self.intervalo_lote_seg = intervalo_lote_seg
+        self.limite_lote = limite_lote
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            'conectado': False,
+            'notificacoes': 0,
+            'lotes_aplicados': 0,
+            'invalidacoes': 0,
+            'reconexoes': 0,
+            'erros': 0,
+            'ultima_notificacao': None
+        }
+
+    def _atualizar_stats(self, **valores):
+        with self._lock:
+            for chave, valor in valores.items():
+                self._stats[chave] = valor
+
+    def _incrementar(self, chave: str, quantidade: int = 1):
+        with self._lock:
+            self._stats[chave] += quantidade
+
+    def _conectar(self):
+        conn = psycopg2.connect(**self.config)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        cursor.execute(f"LISTEN {CANAL_ALTERACOES}")
+        cursor.close()
+        return conn
+
+    def run(self):
+        espera = 1.0
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = self._conectar()
+                self._atualizar_stats(conectado=True)
+                espera = 1.0
+                # Eventos podem ter sido perdidos enquanto desconectado
+                invalidar_versao_dados()
+                self._escutar(conn)
+            except Exception:
+                self._incrementar('erros')
+            finally:
+                self._atualizar_stats(conectado=False)
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+            if self._parar.wait(espera):
+                break
+            espera = min(espera * 2, 60.0)
+            self._incrementar('reconexoes')
+
+    def _escutar(self, conn):
+        while not self._parar.is_set():
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+
+            conn.poll()
+            if not conn.notifies:
+                continue
+
+            # Agrupa rajadas (ex.: importação ou lote de baixas) num único lote
+            self._parar.wait(self.intervalo_lote_seg)
+            conn.poll()
+            eventos = list(conn.notifies)
+            conn.notifies.clear()
+            self._aplicar(eventos)
+
+    def _aplicar(self, eventos: List):
+        alterados, excluidos = set(), set()
+        for evento in eventos:
+            try:
+                dados = json.loads(evento.payload)
+                numero_cte = int(dados['numero_cte'])
+            except (ValueError, KeyError, TypeError):
+                continue
+
+            if dados.get('op') == 'DELETE':
+                excluidos.add(numero_cte)
+                alterados.discard(numero_cte)
+            else:
+                alterados.add(numero_cte)
+                excluidos.discard(numero_cte)
+
+        self._incrementar('notificacoes', len(eventos))
+        self._atualizar_stats(ultima_notificacao=datetime.now())
+
+        if len(alterados) + len(excluidos) > self.limite_lote:
+            # Lote grande: mais barato deixar o delta por updated_at resolver
+            invalidar_versao_dados()
+            self._incrementar('invalidacoes')
+        elif aplicar_alteracoes_cache(sorted(alterados), sorted(excluidos), self.config):
+            self._incrementar('lotes_aplicados')
+        else:
+            self._incrementar('invalidacoes')
+
+    def parar(self):
+        self._parar.set()
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            return dict(self._stats)
+
+def _escuta_alteracoes_ativa() -> bool:
+    return _ler_parametro_banco('DB_ESCUTAR_ALTERACOES', 'sim').lower() in ('sim', '1', 'true', 'on')
+
+@st.cache_resource(show_spinner=False)
+def iniciar_ouvinte_alteracoes(config: Dict) -> OuvinteAlteracoesBaker:
+    """Um ouvinte LISTEN por processo e por banco"""
+    ouvinte = OuvinteAlteracoesBaker(
+        config,
+        intervalo_lote_seg=_ler_parametro_banco('DB_NOTIFY_LOTE_SEG', 0.5),
+        limite_lote=_ler_parametro_banco('DB_NOTIFY_LIMITE_LOTE', 1000)
+    )
+    ouvinte.start()
+    return ouvinte
+
+# ============================================================================
+# FUNÇÃO DE CACHE OTIMIZADA
+# ============================================================================
+
+def carregar_dados_postgresql(colunas: Optional[List[str]] = None):
+    """
+    Carrega dados do PostgreSQL ou simula dados para desenvolvimento.
+    `colunas` restringe a leitura e o cache à projeção pedida (ex.: COLUNAS_PAINEL_CTE)
+    """
+    config = carregar_configuracao_banco()
+    if config is not None and _escuta_alteracoes_ativa():
+        try:
+            iniciar_ouvinte_alteracoes(config)
+        except Exception:
+            pass
+
+    # Recarrega só quando a versão dos dados muda (em vez de expirar a cada 300s).
+    # Falhas ficam fora do cache: os dados simulados não ficam presos à versão real
+    versao = versao_dados_atual()
+    try:
+        return _carregar_dados_versao(versao, tuple(colunas) if colunas else None)
     except psycopg2.OperationalError:
+        invalidar_configuracao_banco()
         st.error("❌ Erro de conexão PostgreSQL")
         st.info("💡 Verifique as credenciais do banco")
         return _gerar_dados_simulados()
@@ -777,51 +1895,123 @@ def carregar_dados_postgresql():
         st.error(f"❌ Erro: {str(e)}")
         return pd.DataFrame()
 
+@st.cache_data(max_entries=8, show_spinner=False)
+def _carregar_dados_versao(versao: str, colunas: Optional[Tuple[str, ...]] = None):
+    """Carga dos dados para uma versão da tabela e uma projeção (chaves do cache)"""
+    config = carregar_configuracao_banco()
+
+    # Se config é None (Codespaces), usar dados simulados
+    if config is None:
+        df = _gerar_dados_simulados()
+        return df[[col for col in df.columns if col in colunas]] if colunas else df
+
+    # Carga completa na primeira vez; depois apenas o delta por updated_at
+    df = atualizar_dados_incremental(config, versao, colunas)
+    return df[list(colunas)] if colunas and len(colunas) < len(df.columns) else df
+
+SQL_CRIAR_TABELA_DASHBOARD = """
+CREATE TABLE IF NOT EXISTS dashboard_baker (
+    id SERIAL PRIMARY KEY,
+    numero_cte INTEGER UNIQUE NOT NULL,
+    destinatario_nome VARCHAR(255),
+    veiculo_placa VARCHAR(20),
+    valor_total DECIMAL(15,2),
+    data_emissao DATE,
+    numero_fatura VARCHAR(100),
+    data_baixa DATE,
+    observacao TEXT,
+    data_inclusao_fatura DATE,
+    data_envio_processo DATE,
+    primeiro_envio DATE,
+    data_rq_tmc DATE,
+    data_atesto DATE,
+    envio_final DATE,
+    origem_dados VARCHAR(50) DEFAULT 'Sistema',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_dashboard_baker_updated_at ON dashboard_baker(updated_at);
+"""
+
 def _criar_tabela():
     """Cria tabela automaticamente"""
     try:
-        config = carregar_configuracao_banco()
-        conn = psycopg2.connect(**config)
-        cursor = conn.cursor()
+        with conexao_banco() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS dashboard_baker (
-            id SERIAL PRIMARY KEY,
-            numero_cte INTEGER UNIQUE NOT NULL,
-            destinatario_nome VARCHAR(255),
-            veiculo_placa VARCHAR(20),
-            valor_total DECIMAL(15,2),
-            data_emissao DATE,
-            numero_fatura VARCHAR(100),
-            data_baixa DATE,
-            observacao TEXT,
-            data_inclusao_fatura DATE,
-            data_envio_processo DATE,
-            primeiro_envio DATE,
-            data_rq_tmc DATE,
-            data_atesto DATE,
-            envio_final DATE,
-            origem_dados VARCHAR(50) DEFAULT 'Sistema',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        INSERT INTO dashboard_baker (numero_cte, destinatario_nome, valor_total, data_emissao, origem_dados)
-        VALUES (1001, 'Cliente Exemplo', 1500.00, CURRENT_DATE, 'Auto-Setup')
-        ON CONFLICT (numero_cte) DO NOTHING;
-        """)
+            cursor.execute(SQL_CRIAR_TABELA_DASHBOARD)
+            cursor.execute("""
+            INSERT INTO dashboard_baker (numero_cte, destinatario_nome, valor_total, data_emissao, origem_dados)
+            VALUES (1001, 'Cliente Exemplo', 1500.00, CURRENT_DATE, 'Auto-Setup')
+            ON CONFLICT (numero_cte) DO NOTHING;
+            """)
+            cursor.execute(SQL_INDICES_ALERTAS)
+            cursor.execute(SQL_TRIGGER_NOTIFICACAO)
+            # Trigger + limpeza única reescrevem o texto gravado: só no modo ingestao
+            if _modo_limpeza_nulos() == 'ingestao':
+                cursor.execute(SQL_TRIGGER_NULOS_TRADUZIDOS)
+                cursor.execute(SQL_LIMPAR_NULOS_TRADUZIDOS)
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+            conn.commit()
+            cursor.close()
 
         st.success("✅ Tabela criada!")
-        st.cache_data.clear()
+        invalidar_versao_dados()  # Nova versão => nova carga só para esta tabela
         st.rerun()
 
     except Exception as e:
         st.error(f"❌ Erro ao criar tabela: {e}")
 
+# ============================================================================
+# KERNEL DE FLAGS DE ESTADO (CONTAGENS/SOMAS EM UMA PASSADA)
+# ============================================================================
+
+FLAG_FATURA = 1
+FLAG_BAIXA = 2
+FLAG_ATESTO = 4
+FLAG_ENVIO_FINAL = 8
+FLAG_PRIMEIRO_ENVIO = 16
+FLAG_COMPLETO = 32  # emissão, 1º envio, atesto e envio final preenchidos
+TOTAL_COMBINACOES_FLAGS = 64
+
+def calcular_flags_estado(df: pd.DataFrame) -> np.ndarray:
+    """Codifica o estado de cada CTE num inteiro de bits (FLAG_*)"""
+    fatura = df['numero_fatura'].notna() & (df['numero_fatura'] != '')
+    atesto = df['data_atesto'].notna().to_numpy()
+    envio_final = df['envio_final'].notna().to_numpy()
+    primeiro_envio = df['primeiro_envio'].notna().to_numpy()
+    completo = df['data_emissao'].notna().to_numpy() & primeiro_envio & atesto & envio_final
+
+    flags = fatura.to_numpy().astype(np.uint8) * FLAG_FATURA
+    flags |= df['data_baixa'].notna().to_numpy().astype(np.uint8) * FLAG_BAIXA
+    flags |= atesto.astype(np.uint8) * FLAG_ATESTO
+    flags |= envio_final.astype(np.uint8) * FLAG_ENVIO_FINAL
+    flags |= primeiro_envio.astype(np.uint8) * FLAG_PRIMEIRO_ENVIO
+    flags |= completo.astype(np.uint8) * FLAG_COMPLETO
+    return flags
+
+def resumir_flags_estado(df: pd.DataFrame) -> Dict:
+    """Quantidade e valor de CTEs por combinação de flags (um np.bincount para cada)"""
+    if df.empty:
+        return {
+            'contagens': np.zeros(TOTAL_COMBINACOES_FLAGS, dtype=np.int64),
+            'valores': np.zeros(TOTAL_COMBINACOES_FLAGS)
+        }
+
+    flags = calcular_flags_estado(df)
+    valores = pd.to_numeric(df['valor_total'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    return {
+        'contagens': np.bincount(flags, minlength=TOTAL_COMBINACOES_FLAGS),
+        'valores': np.bincount(flags, weights=valores, minlength=TOTAL_COMBINACOES_FLAGS)
+    }
+
+def totalizar_flags(resumo: Dict, com: int = 0, sem: int = 0) -> Tuple[int, float]:
+    """Quantidade e valor dos CTEs com todos os bits de `com` e nenhum dos bits de `sem`"""
+    combinacoes = np.arange(TOTAL_COMBINACOES_FLAGS)
+    selecionadas = ((combinacoes & com) == com) & ((combinacoes & sem) == 0)
+    return int(resumo['contagens'][selecionadas].sum()), float(resumo['valores'][selecionadas].sum())
+
 # ============================================================================
 # SISTEMA DE ANÁLISE EXPANDIDO
 # ============================================================================
@@ -847,36 +2037,24 @@ def gerar_metricas_expandidas(df: pd.DataFrame) -> Dict:
     valor_total = df['valor_total'].sum()
     veiculos_ativos = df['veiculo_placa'].nunique() if 'veiculo_placa' in df.columns else 0
 
-    # Métricas de pagamento
-    faturas_pagas = len(df[df['data_baixa'].notna()])
-    faturas_pendentes = len(df[df['data_baixa'].isna()])
+    # Contagens/valores por estado numa única passada (kernel de flags)
+    resumo = resumir_flags_estado(df)
 
-    valor_pago = df[df['data_baixa'].notna()]['valor_total'].sum()
-    valor_pendente = df[df['data_baixa'].isna()]['valor_total'].sum()
+    # Métricas de pagamento
+    faturas_pagas, valor_pago = totalizar_flags(resumo, com=FLAG_BAIXA)
+    faturas_pendentes, valor_pendente = totalizar_flags(resumo, sem=FLAG_BAIXA)
 
     # Métricas de faturamento
-    ctes_com_fatura = len(df[df['numero_fatura'].notna() & (df['numero_fatura'] != '')])
-    ctes_sem_fatura = len(df[df['numero_fatura'].isna() | (df['numero_fatura'] == '')])
-
-    valor_com_fatura = df[df['numero_fatura'].notna() & (df['numero_fatura'] != '')]['valor_total'].sum()
-    valor_sem_fatura = df[df['numero_fatura'].isna() | (df['numero_fatura'] == '')]['valor_total'].sum()
+    ctes_com_fatura, valor_com_fatura = totalizar_flags(resumo, com=FLAG_FATURA)
+    ctes_sem_fatura, valor_sem_fatura = totalizar_flags(resumo, sem=FLAG_FATURA)
 
     # Métricas de envio final
-    ctes_com_envio_final = len(df[df['envio_final'].notna()])
-    ctes_sem_envio_final = len(df[df['envio_final'].isna()])
-
-    valor_com_envio_final = df[df['envio_final'].notna()]['valor_total'].sum()
-    valor_sem_envio_final = df[df['envio_final'].isna()]['valor_total'].sum()
+    ctes_com_envio_final, valor_com_envio_final = totalizar_flags(resumo, com=FLAG_ENVIO_FINAL)
+    ctes_sem_envio_final, valor_sem_envio_final = totalizar_flags(resumo, sem=FLAG_ENVIO_FINAL)
 
     # NOVAS MÉTRICAS AVANÇADAS
     # Processos Completos (tem todas as datas principais)
-    mask_completo = (
-        df['data_emissao'].notna() & 
-        df['primeiro_envio'].notna() & 
-        df['data_atesto'].notna() & 
-        df['envio_final'].notna()
-    )
-    processos_completos = mask_completo.sum()
+    processos_completos, _ = totalizar_flags(resumo, com=FLAG_COMPLETO)
     processos_incompletos = total_ctes - processos_completos
 
     # Métricas financeiras avançadas
@@ -933,6 +2111,160 @@ def gerar_metricas_expandidas(df: pd.DataFrame) -> Dict:
         'crescimento_mensal': crescimento_mensal
     }
 
+# ============================================================================
+# MÉTRICAS AGREGADAS NO BANCO (PUSHDOWN)
+# ============================================================================
+
+def _sql_texto_preenchido(coluna: str) -> str:
+    """Equivalente SQL de notna() após corrigir_dataframe_traduzido (sentinelas viram nulo)"""
+    return f"({coluna} IS NOT NULL AND btrim({coluna}, E' \\t\\r\\n') <> ALL(%(valores_nulos)s))"
+
+_VALOR = "COALESCE(valor_total, 0)"
+_COM_FATURA = _sql_texto_preenchido('numero_fatura')
+_PROCESSO_COMPLETO = (
+    "data_emissao IS NOT NULL AND primeiro_envio IS NOT NULL AND "
+    "data_atesto IS NOT NULL AND envio_final IS NOT NULL"
+)
+
+SQL_METRICAS_EXPANDIDAS = f"""
+WITH mensal AS (
+    SELECT date_trunc('month', data_emissao) AS mes, SUM({_VALOR}) AS receita
+    FROM dashboard_baker
+    WHERE data_emissao IS NOT NULL
+    GROUP BY 1
+), ultimos AS (
+    SELECT receita, ROW_NUMBER() OVER (ORDER BY mes DESC) AS posicao
+    FROM mensal
+)
+SELECT
+    COUNT(*) AS total_ctes,
+    COUNT(DISTINCT destinatario_nome) FILTER (WHERE {_sql_texto_preenchido('destinatario_nome')}) AS clientes_unicos,
+    COALESCE(SUM({_VALOR}), 0) AS valor_total,
+    COUNT(DISTINCT veiculo_placa) FILTER (WHERE {_sql_texto_preenchido('veiculo_placa')}) AS veiculos_ativos,
+    COUNT(*) FILTER (WHERE data_baixa IS NOT NULL) AS faturas_pagas,
+    COALESCE(SUM({_VALOR}) FILTER (WHERE data_baixa IS NOT NULL), 0) AS valor_pago,
+    COUNT(*) FILTER (WHERE {_COM_FATURA}) AS ctes_com_fatura,
+    COALESCE(SUM({_VALOR}) FILTER (WHERE {_COM_FATURA}), 0) AS valor_com_fatura,
+    COUNT(*) FILTER (WHERE envio_final IS NOT NULL) AS ctes_com_envio_final,
+    COALESCE(SUM({_VALOR}) FILTER (WHERE envio_final IS NOT NULL), 0) AS valor_com_envio_final,
+    COUNT(*) FILTER (WHERE {_PROCESSO_COMPLETO}) AS processos_completos,
+    AVG({_VALOR}) AS ticket_medio,
+    MAX({_VALOR}) AS maior_valor,
+    MIN({_VALOR}) AS menor_valor,
+    (SELECT AVG(receita) FROM mensal) AS receita_mensal_media,
+    (SELECT receita FROM ultimos WHERE posicao = 1) AS receita_ultimo_mes,
+    (SELECT receita FROM ultimos WHERE posicao = 2) AS receita_penultimo_mes
+FROM dashboard_baker
+"""
+
+def gerar_metricas_sql(config: Optional[Dict] = None) -> Dict:
+    """
+    Mesmo dicionário de gerar_metricas_expandidas, calculado numa única consulta
+    agregada (FILTER) sem trazer a tabela para o pandas
+    """
+    linha = consultar_dataframe(
+        SQL_METRICAS_EXPANDIDAS, params={'valores_nulos': VALORES_NULOS_TRADUZIDOS}, config=config
+    ).iloc[0]
+
+    total_ctes = int(linha['total_ctes'])
+    if total_ctes == 0:
+        return gerar_metricas_expandidas(pd.DataFrame())
+
+    def _valor(coluna):
+        return 0.0 if pd.isna(linha[coluna]) else float(linha[coluna])
+
+    valor_total = _valor('valor_total')
+    faturas_pagas = int(linha['faturas_pagas'])
+    ctes_com_fatura = int(linha['ctes_com_fatura'])
+    ctes_com_envio_final = int(linha['ctes_com_envio_final'])
+    processos_completos = int(linha['processos_completos'])
+
+    crescimento_mensal = 0.0
+    ultimo_mes, penultimo_mes = linha['receita_ultimo_mes'], linha['receita_penultimo_mes']
+    if not pd.isna(penultimo_mes) and float(penultimo_mes) > 0:
+        crescimento_mensal = ((float(ultimo_mes) - float(penultimo_mes)) / float(penultimo_mes)) * 100
+
+    return {
+        'total_ctes': total_ctes,
+        'clientes_unicos': int(linha['clientes_unicos']),
+        'valor_total': valor_total,
+        'faturas_pagas': faturas_pagas,
+        'faturas_pendentes': total_ctes - faturas_pagas,
+        'valor_pago': _valor('valor_pago'),
+        'valor_pendente': valor_total - _valor('valor_pago'),
+        'ctes_com_fatura': ctes_com_fatura,
+        'ctes_sem_fatura': total_ctes - ctes_com_fatura,
+        'valor_com_fatura': _valor('valor_com_fatura'),
+        'valor_sem_fatura': valor_total - _valor('valor_com_fatura'),
+        'veiculos_ativos': int(linha['veiculos_ativos']),
+        'ctes_com_envio_final': ctes_com_envio_final,
+        'ctes_sem_envio_final': total_ctes - ctes_com_envio_final,
+        'valor_com_envio_final': _valor('valor_com_envio_final'),
+        'valor_sem_envio_final': valor_total - _valor('valor_com_envio_final'),
+        'processos_completos': processos_completos,
+        'processos_incompletos': total_ctes - processos_completos,
+        'ticket_medio': _valor('ticket_medio'),
+        'maior_valor': _valor('maior_valor'),
+        'menor_valor': _valor('menor_valor'),
+        'receita_mensal_media': _valor('receita_mensal_media'),
+        'crescimento_mensal': crescimento_mensal
+    }
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _metricas_sql_versao(versao: str) -> Dict:
+    """Métricas agregadas no banco para uma versão da tabela"""
+    return gerar_metricas_sql()
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _registros_hoje_versao(versao: str, hoje) -> int:
+    return int(consultar_dataframe(
+        "SELECT COUNT(*) AS total FROM dashboard_baker WHERE created_at >= %(hoje)s",
+        params={'hoje': hoje}
+    )['total'].iloc[0])
+
+def contar_registros_hoje() -> Optional[int]:
+    """CTEs criados hoje (contagem no banco, sem carregar created_at no DataFrame)"""
+    if carregar_configuracao_banco() is None:
+        return None
+    try:
+        return _registros_hoje_versao(versao_dados_atual(), datetime.now().date())
+    except Exception:
+        return None
+
+def obter_metricas_expandidas(df: pd.DataFrame) -> Dict:
+    """
+    Métricas dos cards: agregadas no banco (DB_MODO_METRICAS=sql, padrão) quando há
+    conexão; calculadas em pandas para dados simulados ou se a consulta falhar.
+    `df` só é usado nesse cálculo em pandas
+    """
+    if _ler_parametro_banco('DB_MODO_METRICAS', 'sql').lower() == 'sql' and carregar_configuracao_banco():
+        try:
+            return _metricas_sql_versao(versao_dados_atual())
+        except psycopg2.Error as e:
+            # Aviso apenas uma vez por sessão; os cards seguem com o cálculo em pandas
+            if not st.session_state.get('_aviso_metricas_sql_exibido'):
+                st.session_state['_aviso_metricas_sql_exibido'] = True
+                st.warning(f"⚠️ Métricas calculadas localmente: falha na consulta agregada ({e})")
+
+    return gerar_metricas_expandidas(df)
+
+def _montar_lista_alerta(ctes_problema: pd.DataFrame, campo_data: str) -> List[Dict]:
+    """Itens da lista de um alerta montados por coluna (sem iterrows)"""
+    datas = ctes_problema[campo_data].astype(object)
+    datas = datas.where(ctes_problema[campo_data].notna(), None)
+    destinatarios = ctes_problema['destinatario_nome'].astype(object)
+    destinatarios = destinatarios.where(ctes_problema['destinatario_nome'].notna(), None)
+
+    return [
+        {'numero_cte': numero_cte, 'destinatario_nome': destinatario, 'valor_total': valor, campo_data: data}
+        for numero_cte, destinatario, valor, data in zip(
+            ctes_problema['numero_cte'].tolist(),
+            destinatarios.tolist(),
+            ctes_problema['valor_total'].astype(float).tolist(),
+            datas.tolist()
+        )
+    ]
+
 def calcular_alertas_inteligentes(df: pd.DataFrame) -> Dict:
     """Sistema de alertas inteligentes - CORRIGIDO para tratar valores NaT"""
     alertas = {
@@ -957,16 +2289,7 @@ def calcular_alertas_inteligentes(df: pd.DataFrame) -> Dict:
         )
         if mask_sem_aprovacao.any():
             ctes_problema = df[mask_sem_aprovacao]
-            # Converter datas para dict de forma segura
-            lista_segura = []
-            for _, row in ctes_problema.iterrows():
-                item = {
-                    'numero_cte': row['numero_cte'],
-                    'destinatario_nome': row['destinatario_nome'],
-                    'valor_total': float(row['valor_total']),
-                    'data_emissao': row['data_emissao'] if pd.notna(row['data_emissao']) else None
-                }
-                lista_segura.append(item)
+            lista_segura = _montar_lista_alerta(ctes_problema, 'data_emissao')
 
             alertas['ctes_sem_aprovacao'] = {
                 'qtd': len(ctes_problema),
@@ -982,15 +2305,7 @@ def calcular_alertas_inteligentes(df: pd.DataFrame) -> Dict:
         )
         if mask_sem_faturas.any():
             ctes_problema = df[mask_sem_faturas]
-            lista_segura = []
-            for _, row in ctes_problema.iterrows():
-                item = {
-                    'numero_cte': row['numero_cte'],
-                    'destinatario_nome': row['destinatario_nome'],
-                    'valor_total': float(row['valor_total']),
-                    'data_atesto': row['data_atesto'] if pd.notna(row['data_atesto']) else None
-                }
-                lista_segura.append(item)
+            lista_segura = _montar_lista_alerta(ctes_problema, 'data_atesto')
 
             alertas['ctes_sem_faturas'] = {
                 'qtd': len(ctes_problema),
@@ -1006,15 +2321,7 @@ def calcular_alertas_inteligentes(df: pd.DataFrame) -> Dict:
         )
         if mask_vencidas.any():
             ctes_problema = df[mask_vencidas]
-            lista_segura = []
-            for _, row in ctes_problema.iterrows():
-                item = {
-                    'numero_cte': row['numero_cte'],
-                    'destinatario_nome': row['destinatario_nome'],
-                    'valor_total': float(row['valor_total']),
-                    'data_atesto': row['data_atesto'] if pd.notna(row['data_atesto']) else None
-                }
-                lista_segura.append(item)
+            lista_segura = _montar_lista_alerta(ctes_problema, 'data_atesto')
 
             alertas['faturas_vencidas'] = {
                 'qtd': len(ctes_problema),
@@ -1030,15 +2337,7 @@ def calcular_alertas_inteligentes(df: pd.DataFrame) -> Dict:
         )
         if mask_primeiro_envio.any():
             ctes_problema = df[mask_primeiro_envio]
-            lista_segura = []
-            for _, row in ctes_problema.iterrows():
-                item = {
-                    'numero_cte': row['numero_cte'],
-                    'destinatario_nome': row['destinatario_nome'],
-                    'valor_total': float(row['valor_total']),
-                    'data_emissao': row['data_emissao'] if pd.notna(row['data_emissao']) else None
-                }
-                lista_segura.append(item)
+            lista_segura = _montar_lista_alerta(ctes_problema, 'data_emissao')
 
             alertas['primeiro_envio_pendente'] = {
                 'qtd': len(ctes_problema),
@@ -1054,15 +2353,7 @@ def calcular_alertas_inteligentes(df: pd.DataFrame) -> Dict:
         )
         if mask_envio_final.any():
             ctes_problema = df[mask_envio_final]
-            lista_segura = []
-            for _, row in ctes_problema.iterrows():
-                item = {
-                    'numero_cte': row['numero_cte'],
-                    'destinatario_nome': row['destinatario_nome'],
-                    'valor_total': float(row['valor_total']),
-                    'data_atesto': row['data_atesto'] if pd.notna(row['data_atesto']) else None
-                }
-                lista_segura.append(item)
+            lista_segura = _montar_lista_alerta(ctes_problema, 'data_atesto')
 
             alertas['envio_final_pendente'] = {
                 'qtd': len(ctes_problema),
@@ -1073,61 +2364,287 @@ def calcular_alertas_inteligentes(df: pd.DataFrame) -> Dict:
     except Exception as e:
         st.warning(f"⚠️ Aviso no cálculo de alertas: {str(e)}")
 
-    return alertas
+    return alertas
+
+# ============================================================================
+# ALERTAS CALCULADOS NO BANCO (ÍNDICES PARCIAIS)
+# ============================================================================
+
+# Código do alerta: (coluna de referência do prazo, condição de pendência).
+# As condições são literais para o planner casar com os índices parciais abaixo
+REGRAS_ALERTAS_SQL = {
+    'ctes_sem_aprovacao': ('data_emissao', "data_atesto IS NULL"),
+    'ctes_sem_faturas': ('data_atesto', f"(numero_fatura IS NULL OR btrim(numero_fatura, {_ESPACOS_SQL}) IN ({_NULOS_SQL}))"),
+    'faturas_vencidas': ('data_atesto', "data_baixa IS NULL"),
+    'primeiro_envio_pendente': ('data_emissao', "primeiro_envio IS NULL"),
+    'envio_final_pendente': ('data_atesto', "envio_final IS NULL")
+}
+
+SQL_INDICES_ALERTAS = "\n".join(
+    f"CREATE INDEX IF NOT EXISTS idx_dashboard_baker_alerta_{codigo} "
+    f"ON dashboard_baker({coluna}) WHERE {condicao};"
+    for codigo, (coluna, condicao) in REGRAS_ALERTAS_SQL.items()
+)
+
+def _limite_alerta(codigo: str, hoje) -> datetime.date:
+    """Data de referência abaixo da qual o CTE está atrasado (dias_limite do ALERTAS_CONFIG)"""
+    return hoje - timedelta(days=ALERTAS_CONFIG.get(codigo, {}).get('dias_limite', 5))
+
+def _filtro_alerta_sql(codigo: str) -> str:
+    coluna, condicao = REGRAS_ALERTAS_SQL[codigo]
+    return f"{condicao} AND {coluna} < %(limite)s"
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _buscar_lista_alerta(versao: str, codigo: str, hoje, limite: Optional[int] = None) -> List[Dict]:
+    """CTEs de um alerta, no mesmo formato da lista calculada em pandas"""
+    coluna, _ = REGRAS_ALERTAS_SQL[codigo]
+    query = f"""
+    SELECT numero_cte, destinatario_nome, COALESCE(valor_total, 0) AS valor_total, {coluna}
+    FROM dashboard_baker
+    WHERE {_filtro_alerta_sql(codigo)}
+    ORDER BY numero_cte DESC
+    {f'LIMIT {int(limite)}' if limite is not None else ''}
+    """
+    df = corrigir_dataframe_traduzido(
+        consultar_dataframe(query, params={'limite': _limite_alerta(codigo, hoje)})
+    )
+    if df.empty:
+        return []
+
+    df['valor_total'] = df['valor_total'].astype(float)
+    df[coluna] = pd.to_datetime(df[coluna])
+    return df.to_dict('records')
+
+class ListaAlertaSQL(Sequence):
+    """
+    Lista de CTEs de um alerta buscada no banco só quando acessada.
+    Fatias do início (lista[:10]) viram LIMIT; len() usa a contagem já conhecida
+    """
+
+    def __init__(self, codigo: str, hoje, qtd: int, versao: str):
+        self.codigo = codigo
+        self.hoje = hoje
+        self.qtd = qtd
+        self.versao = versao
+
+    def _buscar(self, limite: Optional[int] = None) -> List[Dict]:
+        if self.qtd == 0:
+            return []
+        return _buscar_lista_alerta(self.versao, self.codigo, self.hoje, limite)
+
+    def __len__(self):
+        return self.qtd
+
+    def __getitem__(self, indice):
+        if (isinstance(indice, slice) and indice.start in (None, 0) and indice.step in (None, 1)
+                and indice.stop is not None and indice.stop >= 0):
+            return self._buscar(indice.stop)
+        return self._buscar()[indice]
+
+    def __iter__(self):
+        return iter(self._buscar())
+
+def calcular_alertas_sql(config: Optional[Dict] = None, hoje=None, versao: str = '') -> Dict:
+    """
+    Mesmo dicionário de calcular_alertas_inteligentes: contagens e valores em uma
+    consulta (uma parte por regra, cada uma servida pelo seu índice parcial) e
+    listas buscadas sob demanda
+    """
+    hoje = hoje or datetime.now().date()
+    partes, params = [], {}
+    for codigo in REGRAS_ALERTAS_SQL:
+        params[f'limite_{codigo}'] = _limite_alerta(codigo, hoje)
+        filtro = _filtro_alerta_sql(codigo).replace('%(limite)s', f'%(limite_{codigo})s')
+        partes.append(f"""
+        SELECT '{codigo}' AS codigo, COUNT(*) AS qtd, COALESCE(SUM(COALESCE(valor_total, 0)), 0) AS valor
+        FROM dashboard_baker
+        WHERE {filtro}""")
+
+    resultado = consultar_dataframe("\nUNION ALL\n".join(partes), params=params, config=config)
+
+    alertas = {}
+    for codigo, qtd, valor in zip(resultado['codigo'], resultado['qtd'], resultado['valor']):
+        alertas[codigo] = {
+            'qtd': int(qtd),
+            'valor': float(valor),
+            'lista': ListaAlertaSQL(codigo, hoje, int(qtd), versao)
+        }
+    return alertas
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _alertas_sql_versao(versao: str, hoje) -> Dict:
+    """Alertas calculados no banco para uma versão da tabela e um dia"""
+    return calcular_alertas_sql(hoje=hoje, versao=versao)
+
+def obter_alertas_inteligentes(df: pd.DataFrame) -> Dict:
+    """
+    Alertas: calculados no banco (DB_MODO_ALERTAS=sql, padrão) quando há conexão;
+    em pandas para dados simulados ou se a consulta falhar
+    """
+    if _ler_parametro_banco('DB_MODO_ALERTAS', 'sql').lower() == 'sql' and carregar_configuracao_banco():
+        try:
+            return _alertas_sql_versao(versao_dados_atual(), datetime.now().date())
+        except Exception:
+            pass
+
+    return calcular_alertas_inteligentes(df)
 
-def calcular_variacoes_tempo_expandidas(df: pd.DataFrame) -> Dict:
-    """Sistema de análise de variações temporais expandido"""
+def calcular_variacoes_tempo_expandidas(df: pd.DataFrame, calculadas: Optional[Dict] = None) -> Dict:
+    """
+    Sistema de análise de variações temporais expandido (todos os pares em uma passada).
+    `calculadas` recebe estatísticas por par já prontas (ex.: do sketch do armazém)
+    """
     if df.empty:
         return {}
 
-    variacoes = {}
+    # Dias negativos (datas fora de ordem) não entram nas estatísticas
+    if calculadas is None:
+        calculadas = calcular_variacoes_matriz(df, VARIACOES_CONFIG, filtrar_negativos=True)
 
+    variacoes = {}
     for config in VARIACOES_CONFIG:
-        campo_inicio = config['campo_inicio']
-        campo_fim = config['campo_fim']
         codigo = config['codigo']
+        if codigo not in calculadas:
+            continue
+
+        estatisticas = calculadas[codigo]
         meta_dias = config['meta_dias']
+        media = estatisticas['media']
+
+        # Classificar performance
+        if media <= meta_dias:
+            performance = 'excelente'
+        elif media <= meta_dias * 1.5:
+            performance = 'bom'
+        elif media <= meta_dias * 2:
+            performance = 'atencao'
+        else:
+            performance = 'critico'
+
+        variacoes[codigo] = {
+            'nome': config['nome'],
+            'media': media,
+            'mediana': estatisticas['mediana'],
+            'percentil_90': estatisticas['percentil_90'],
+            'qtd': estatisticas['qtd'],
+            'meta_dias': meta_dias,
+            'performance': performance,
+            'categoria': config['categoria'],
+            'desvio_meta': ((media - meta_dias) / meta_dias * 100) if meta_dias > 0 else 0,
+            'min': estatisticas['min'],
+            'max': estatisticas['max']
+        }
 
-        if campo_inicio in df.columns and campo_fim in df.columns:
-            # Calcular diferença em dias
-            mask = df[campo_inicio].notna() & df[campo_fim].notna()
+    return variacoes
 
-            if mask.any():
-                dias = (df.loc[mask, campo_fim] - df.loc[mask, campo_inicio]).dt.days
+def _estatisticas_sketch_armazem(total_linhas: int) -> Optional[Dict]:
+    """Estatísticas do sketch do armazém, se ele corresponde à versão e ao tamanho dos dados em uso"""
+    config = carregar_configuracao_banco()
+    versao = st.session_state.get('versao_dados')
+    if config is None or versao is None:
+        return None
 
-                # Filtrar dias válidos (não negativos)
-                dias_validos = dias[dias >= 0]
+    # Qualquer projeção com as colunas do ciclo de vida mantém um sketch equivalente
+    for armazem in _armazens_config(config):
+        with armazem['lock']:
+            sketch = armazem['sketch']
+            if sketch is not None and sketch.versao == versao and sketch.linhas == total_linhas:
+                return sketch.estatisticas(filtrar_negativos=True)
+    return None
 
-                if len(dias_validos) > 0:
-                    media = dias_validos.mean()
-                    mediana = dias_validos.median()
-                    percentil_90 = dias_validos.quantile(0.9)
+def obter_variacoes_tempo(df: pd.DataFrame) -> Dict:
+    """Variações de tempo; modo definido por DB_MODO_VARIACOES (sketch | pandas)"""
+    if df.empty:
+        return {}
 
-                    # Classificar performance
-                    if media <= meta_dias:
-                        performance = 'excelente'
-                    elif media <= meta_dias * 1.5:
-                        performance = 'bom'
-                    elif media <= meta_dias * 2:
-                        performance = 'atencao'
-                    else:
-                        performance = 'critico'
-
-                    variacoes[codigo] = {
-                        'nome': config['nome'],
-                        'media': media,
-                        'mediana': mediana,
-                        'percentil_90': percentil_90,
-                        'qtd': len(dias_validos),
-                        'meta_dias': meta_dias,
-                        'performance': performance,
-                        'categoria': config['categoria'],
-                        'desvio_meta': ((media - meta_dias) / meta_dias * 100) if meta_dias > 0 else 0,
-                        'min': dias_validos.min(),
-                        'max': dias_validos.max()
-                    }
+    if _ler_parametro_banco('DB_MODO_VARIACOES', 'sketch').lower() == 'sketch':
+        try:
+            calculadas = _estatisticas_sketch_armazem(len(df))
+            if calculadas is not None:
+                return calcular_variacoes_tempo_expandidas(df, calculadas)
+        except Exception:
+            # Fallback para a matriz de dias
+            pass
 
-    return variacoes
+    return calcular_variacoes_tempo_expandidas(df)
+
+# ============================================================================
+# PACOTE ANALÍTICO POR VERSÃO DOS DADOS
+# ============================================================================
+
+@st.cache_resource(show_spinner=False)
+def _cache_pacote_analitico() -> Dict:
+    """Pacotes analíticos do processo, por versão dos dados (compartilhados entre sessões)"""
+    return {'pacotes': {}, 'hits': 0, 'misses': 0, 'lock': threading.Lock()}
+
+def _montar_pacote_analitico(df: pd.DataFrame) -> Dict:
+    return {
+        'metricas': obter_metricas_expandidas(df),
+        'alertas': obter_alertas_inteligentes(df),
+        'variacoes': obter_variacoes_tempo(df),
+        'resumo_flags': resumir_flags_estado(df)
+    }
+
+def obter_pacote_analitico(df: pd.DataFrame) -> Dict:
+    """
+    Métricas, alertas, variações e resumo de flags calculados uma vez por versão
+    dos dados (e por dia, pelos prazos dos alertas). Aba principal, sidebar,
+    pendências e downloads leem daqui
+    """
+    versao = st.session_state.get('versao_dados')
+    if versao is None:
+        return _montar_pacote_analitico(df)
+
+    chave = (versao, datetime.now().date(), len(df))
+    cache = _cache_pacote_analitico()
+
+    with cache['lock']:
+        pacote = cache['pacotes'].get(chave)
+        if pacote is not None:
+            cache['hits'] += 1
+            return pacote
+        cache['misses'] += 1
+
+    pacote = _montar_pacote_analitico(df)
+
+    with cache['lock']:
+        cache['pacotes'][chave] = pacote
+        # Mantém só as versões mais recentes
+        limite = _ler_parametro_banco('CACHE_PACOTES_MAX', 4)
+        while len(cache['pacotes']) > limite:
+            cache['pacotes'].pop(next(iter(cache['pacotes'])))
+
+    return pacote
+
+def estatisticas_pacote_analitico() -> Dict:
+    """Contadores de hit/miss do pacote analítico (para o sidebar)"""
+    cache = _cache_pacote_analitico()
+    with cache['lock']:
+        total = cache['hits'] + cache['misses']
+        return {
+            'hits': cache['hits'],
+            'misses': cache['misses'],
+            'versoes': len(cache['pacotes']),
+            'taxa_hit': (cache['hits'] / total * 100) if total else 0.0
+        }
+
+def estado_visao_versao(nome: str, montar: Callable, marca=None):
+    """
+    Resultado pesado de uma visão (gráficos, agregações) guardado na sessão por
+    versão dos dados: sair da visão e voltar não recalcula enquanto a tabela não muda.
+    `marca` é outro valor de que o resultado depende (ex.: a data de corte de um
+    alerta); quando ela muda a entrada da visão é substituída
+    """
+    versao = st.session_state.get('versao_dados')
+    estados = st.session_state.setdefault('estado_visoes', {})
+
+    salvo = estados.get(nome)
+    if versao is not None and salvo is not None and salvo[:2] == (versao, marca):
+        return salvo[2]
+
+    resultado = montar()
+    estados[nome] = (versao, marca, resultado)
+    return resultado
 
 # ============================================================================
 # SISTEMA DE RELATÓRIOS E DOWNLOADS PDF/EXCEL
@@ -1139,8 +2656,8 @@ def gerar_relatorio_excel(df: pd.DataFrame, metricas: Dict, alertas: Dict, varia
     # Criar buffer de memória
     output = BytesIO()
 
-    # Criar workbook
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    # Criar workbook (constant_memory: abas escritas em ordem de linha, sem guardar a planilha na RAM)
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
 
     # Definir formatos
     header_format = workbook.add_format({
@@ -1151,8 +2668,6 @@ def gerar_relatorio_excel(df: pd.DataFrame, metricas: Dict, alertas: Dict, varia
     })
 
     currency_format = workbook.add_format({'num_format': 'R$ #,##0.00'})
-    percent_format = workbook.add_format({'num_format': '0.0%'})
-    date_format = workbook.add_format({'num_format': 'dd/mm/yyyy'})
 
     # Aba 1: Resumo Executivo
     worksheet1 = workbook.add_worksheet('Resumo Executivo')
@@ -1221,49 +2736,13 @@ def gerar_relatorio_excel(df: pd.DataFrame, metricas: Dict, alertas: Dict, varia
             worksheet3.write(row, 4, dados['qtd'])
             row += 1
 
-    # Aba 4: Dados Completos
+    # Aba 4: Dados Completos (todas as colunas do esquema, gravadas linha a linha no disco)
     if not df.empty:
-        worksheet4 = workbook.add_worksheet('Dados Completos')
-
-        # Cabeçalhos
-        colunas = ['numero_cte', 'destinatario_nome', 'valor_total', 'data_emissao', 
-                  'primeiro_envio', 'data_atesto', 'envio_final', 'data_baixa']
-
-        col = 0
-        for coluna in colunas:
-            if coluna in df.columns:
-                nome_coluna = coluna.replace('_', ' ').title()
-                worksheet4.write(0, col, nome_coluna, header_format)
-                col += 1
-
-        # Dados - CORRIGIDO para tratar valores NaT
-        for idx, row_data in df.iterrows():
-            col = 0
-            for coluna in colunas:
-                if coluna in df.columns:
-                    valor = row_data[coluna]
-
-                    # Tratar valores NaT/None/NaN
-                    if pd.isna(valor) or valor is None:
-                        worksheet4.write(idx + 1, col, "")  # Escrever string vazia
-                    elif coluna == 'valor_total':
-                        worksheet4.write(idx + 1, col, float(valor), currency_format)
-                    elif 'data_' in coluna:
-                        # Verificar se é uma data válida antes de aplicar formato
-                        try:
-                            if pd.notna(valor) and hasattr(valor, 'date'):
-                                worksheet4.write(idx + 1, col, valor, date_format)
-                            else:
-                                worksheet4.write(idx + 1, col, "")
-                        except:
-                            worksheet4.write(idx + 1, col, "")
-                    else:
-                        # Para outros tipos de dados
-                        if isinstance(valor, (int, float)) and not pd.isna(valor):
-                            worksheet4.write(idx + 1, col, valor)
-                        else:
-                            worksheet4.write(idx + 1, col, str(valor) if not pd.isna(valor) else "")
-                    col += 1
+        colunas = [col for col in COLUNAS_DASHBOARD_CTE if col in df.columns]
+        colunas += [col for col in df.columns if col not in colunas]
+        formatos = formatos_exportacao(workbook)
+        formatos['cabecalho'] = header_format
+        escrever_aba_dados(workbook, 'Dados Completos', [df], colunas, formatos)
 
     workbook.close()
     output.seek(0)
@@ -1413,10 +2892,285 @@ def gerar_relatorio_pdf_html(df: pd.DataFrame, metricas: Dict, alertas: Dict, va
 
     return html
 
+# ============================================================================
+# EXPORTAÇÃO EM FLUXO (CSV GZIP / PARQUET COM FILTROS NO SQL)
+# ============================================================================
+
+# Status da exportação: mesmos rótulos do filtro da tabela detalhada
+STATUS_EXPORTACAO_SQL = {
+    'Todos': '',
+    'Com Baixa': 'data_baixa IS NOT NULL',
+    'Sem Baixa': 'data_baixa IS NULL',
+    'Processo Completo': _PROCESSO_COMPLETO,
+    'Processo Incompleto': f'NOT ({_PROCESSO_COMPLETO})'
+}
+
+# (emissão de, emissão até, clientes, status)
+FILTROS_EXPORTACAO_VAZIOS = (None, None, (), 'Todos')
+
+def filtros_exportacao_sql(data_inicio=None, data_fim=None, clientes=(),
+                           status: str = 'Todos') -> Tuple[str, Dict]:
+    """Condição do WHERE e parâmetros da exportação (período de emissão, clientes, status)"""
+    condicoes, params = [], {}
+
+    if data_inicio:
+        condicoes.append("data_emissao >= %(exportacao_inicio)s")
+        params['exportacao_inicio'] = data_inicio
+    if data_fim:
+        condicoes.append("data_emissao <= %(exportacao_fim)s")
+        params['exportacao_fim'] = data_fim
+    if clientes:
+        condicoes.append("destinatario_nome = ANY(%(exportacao_clientes)s)")
+        params['exportacao_clientes'] = list(clientes)
+    if STATUS_EXPORTACAO_SQL[status]:
+        condicoes.append(STATUS_EXPORTACAO_SQL[status])
+
+    return ' AND '.join(f"({condicao})" for condicao in condicoes), params
+
+def contar_ctes_exportacao(filtros: Tuple = FILTROS_EXPORTACAO_VAZIOS, config: Optional[Dict] = None) -> int:
+    """Total de CTEs que a exportação com esses filtros vai gravar"""
+    condicao, params = filtros_exportacao_sql(*filtros)
+    return int(consultar_dataframe(
+        f"SELECT COUNT(*) AS total FROM dashboard_baker {'WHERE ' + condicao if condicao else ''}",
+        params=params or None, config=config
+    )['total'].iloc[0])
+
+def exportar_dados_fluxo(formato: str, destino, filtros: Tuple = FILTROS_EXPORTACAO_VAZIOS,
+                         config: Optional[Dict] = None, progresso=None) -> int:
+    """
+    Todas as colunas dos CTEs filtrados, em CSV gzip ('csv_gz') ou Parquet ('parquet'),
+    gravadas em `destino` (caminho ou buffer). O banco é lido em blocos
+    (iterar_blocos_cte), então só um bloco fica em memória de cada vez
+    """
+    config = config or carregar_configuracao_banco()
+    if config is None:
+        # Modo demonstração: dados simulados sem filtro
+        blocos, colunas = [_gerar_dados_simulados()], None
+    else:
+        condicao, params = filtros_exportacao_sql(*filtros)
+        blocos, colunas = iterar_blocos_cte(COLUNAS_DASHBOARD_CTE, condicao, params, config=config), COLUNAS_DASHBOARD_CTE
+
+    if formato == 'parquet':
+        return exportar_parquet(blocos, destino, colunas, _tipos_arrow_cte(), progresso=progresso)
+    return exportar_csv_gzip(blocos, destino, colunas, _tipos_arrow_cte(), progresso=progresso)
+
+# ============================================================================
+# RELATÓRIOS SOB DEMANDA (WORKER EM SEGUNDO PLANO)
+# ============================================================================
+
+# Formato: rótulo do botão, prefixo do arquivo, extensão e MIME
+FORMATOS_RELATORIO = {
+    'excel': ("📊 Relatório Excel Completo", "dashboard_baker", "xlsx",
+              "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'html': ("📄 Relatório HTML/PDF", "dashboard_baker", "html", "text/html"),
+    'csv_gz': ("📋 Dados CSV (gzip)", "dados_baker", "csv.gz", "application/gzip"),
+    'parquet': ("🧱 Dados Parquet", "dados_baker", "parquet", "application/vnd.apache.parquet")
+}
+
+# Formatos lidos do banco em blocos e filtrados no SQL (exportar_dados_fluxo)
+FORMATOS_FLUXO = ('csv_gz', 'parquet')
+
+class TarefaRelatorio:
+    """Geração de um relatório (versão + formato + filtros) acompanhada pelo sidebar"""
+
+    def __init__(self, versao: str, formato: str, filtros: Tuple = FILTROS_EXPORTACAO_VAZIOS):
+        self.versao = versao
+        self.formato = formato
+        self.filtros = filtros
+        self.progresso = 0.0
+        self.etapa = "Na fila"
+        self.artefato: Optional[bytes] = None
+        self.erro: Optional[str] = None
+        self.concluida = threading.Event()
+
+    def avancar(self, progresso: float, etapa: str):
+        self.progresso = progresso
+        self.etapa = etapa
+
+@st.cache_resource(show_spinner=False)
+def _cache_relatorios() -> Dict:
+    """Artefatos prontos e em geração do processo, por (versão, formato, filtros)"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    return {
+        'tarefas': {},
+        'executor': ThreadPoolExecutor(max_workers=_ler_parametro_banco('RELATORIOS_WORKERS', 1),
+                                       thread_name_prefix='relatorios-baker'),
+        'lock': threading.Lock()
+    }
+
+def _dados_relatorio(versao: str) -> pd.DataFrame:
+    """Todas as colunas da versão pedida, sem depender da sessão (roda no worker)"""
+    config = carregar_configuracao_banco()
+    if config is None:
+        return _gerar_dados_simulados()
+    return atualizar_dados_incremental(config, versao)
+
+def _exportar_fluxo_tarefa(tarefa: TarefaRelatorio) -> bytes:
+    """CSV gzip / Parquet direto do banco, com o progresso por bloco gravado"""
+    config = carregar_configuracao_banco()
+    total = contar_ctes_exportacao(tarefa.filtros, config) if config else 0
+
+    def progresso(gravados: int):
+        fracao = min(gravados / total, 1.0) if total else 0.5
+        tarefa.avancar(0.1 + 0.85 * fracao, f"{gravados:,} de {total:,} CTEs gravados")
+
+    destino = BytesIO()
+    exportar_dados_fluxo(tarefa.formato, destino, tarefa.filtros, config, progresso)
+    return destino.getvalue()
+
+def _gerar_artefato_relatorio(tarefa: TarefaRelatorio, pacote: Dict):
+    try:
+        if tarefa.formato in FORMATOS_FLUXO:
+            tarefa.avancar(0.05, "Consultando o banco")
+            artefato = _exportar_fluxo_tarefa(tarefa)
+        else:
+            tarefa.avancar(0.1, "Carregando dados")
+            df = _dados_relatorio(tarefa.versao)
+
+            tarefa.avancar(0.4, "Montando arquivo")
+            if tarefa.formato == 'excel':
+                artefato = gerar_relatorio_excel(df, pacote['metricas'], pacote['alertas'], pacote['variacoes']).getvalue()
+            else:
+                artefato = gerar_relatorio_pdf_html(df, pacote['metricas'], pacote['alertas'], pacote['variacoes']).encode('utf-8')
+
+        tarefa.artefato = artefato
+        tarefa.avancar(1.0, "Pronto")
+    except Exception as e:
+        tarefa.erro = str(e)
+        tarefa.avancar(1.0, "Erro")
+    finally:
+        tarefa.concluida.set()
+
+def tarefa_relatorio(versao: str, formato: str,
+                     filtros: Tuple = FILTROS_EXPORTACAO_VAZIOS) -> Optional[TarefaRelatorio]:
+    """Tarefa já pedida para a versão, o formato e os filtros (pronta ou em andamento)"""
+    cache = _cache_relatorios()
+    with cache['lock']:
+        return cache['tarefas'].get((versao, formato, filtros))
+
+def solicitar_relatorio(versao: str, formato: str, pacote: Dict,
+                        filtros: Tuple = FILTROS_EXPORTACAO_VAZIOS) -> TarefaRelatorio:
+    """
+    Enfileira a geração do relatório no worker (uma vez por versão, formato e filtros;
+    pedidos repetidos ou de outras sessões reaproveitam a mesma tarefa)
+    """
+    cache = _cache_relatorios()
+    with cache['lock']:
+        tarefa = cache['tarefas'].get((versao, formato, filtros))
+        if tarefa is not None and tarefa.erro is None:
+            return tarefa
+
+        tarefa = TarefaRelatorio(versao, formato, filtros)
+        cache['tarefas'][(versao, formato, filtros)] = tarefa
+
+        # Mantém só os artefatos das versões mais recentes
+        versoes = list(dict.fromkeys(chave[0] for chave in cache['tarefas']))
+        limite = _ler_parametro_banco('RELATORIOS_VERSOES_MAX', 2)
+        for antiga in versoes[:-limite]:
+            for chave in [chave for chave in cache['tarefas'] if chave[0] == antiga]:
+                if cache['tarefas'][chave].concluida.is_set():
+                    del cache['tarefas'][chave]
+
+    cache['executor'].submit(_gerar_artefato_relatorio, tarefa, pacote)
+    return tarefa
+
+def _filtros_exportacao_sidebar(clientes: List[str]) -> Tuple:
+    """Filtros do CSV/Parquet (aplicados no SQL; só com banco configurado)"""
+    if carregar_configuracao_banco() is None:
+        return FILTROS_EXPORTACAO_VAZIOS
+
+    with st.expander("🔎 Filtros CSV/Parquet"):
+        inicio = st.date_input("Emissão de", value=None, format="DD/MM/YYYY", key='exportacao_inicio')
+        fim = st.date_input("Emissão até", value=None, format="DD/MM/YYYY", key='exportacao_fim')
+        selecionados = st.multiselect("Clientes", clientes, key='exportacao_clientes')
+        status = st.selectbox("Status", list(STATUS_EXPORTACAO_SQL), key='exportacao_status')
+
+    return (inicio, fim, tuple(sorted(selecionados)), status)
+
+def exibir_downloads_relatorios(versao: str, pacote: Dict, clientes: List[str] = ()):
+    """Botões do sidebar: gerar sob demanda, acompanhar o progresso e baixar"""
+    filtros_fluxo = _filtros_exportacao_sidebar(list(clientes))
+
+    for formato, (rotulo, prefixo, extensao, mime) in FORMATOS_RELATORIO.items():
+        filtros = filtros_fluxo if formato in FORMATOS_FLUXO else FILTROS_EXPORTACAO_VAZIOS
+        tarefa = tarefa_relatorio(versao, formato, filtros)
+
+        if tarefa is None or tarefa.erro is not None:
+            if tarefa is not None:
+                st.error(f"❌ Erro {extensao.upper()}: {tarefa.erro[:50]}...")
+            if st.button(f"⚙️ Gerar {rotulo.split(' ', 1)[1]}", key=f"gerar_relatorio_{formato}", use_container_width=True):
+                tarefa = solicitar_relatorio(versao, formato, pacote, filtros)
+            else:
+                continue
+
+        if not tarefa.concluida.is_set():
+            barra = st.progress(tarefa.progresso, text=f"{rotulo}: {tarefa.etapa}")
+            while not tarefa.concluida.wait(0.25):
+                barra.progress(tarefa.progresso, text=f"{rotulo}: {tarefa.etapa}")
+            barra.empty()
+            if tarefa.erro is not None:
+                st.error(f"❌ Erro {extensao.upper()}: {tarefa.erro[:50]}...")
+                continue
+
+        st.download_button(
+            label=rotulo,
+            data=tarefa.artefato,
+            file_name=f"{prefixo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extensao}",
+            mime=mime,
+            key=f"baixar_relatorio_{formato}",
+            use_container_width=True
+        )
+
 # ============================================================================
 # SISTEMA DE BAIXAS AUTOMÁTICAS
 # ============================================================================
 
+# Lote de baixas: o arquivo vai para uma tabela temporária (COPY) e um único comando
+# valida (CTE existe? já tem baixa? repetido no arquivo?) e aplica com UPDATE ... FROM
+SQL_CRIAR_LOTE_BAIXAS = """
+CREATE TEMP TABLE lote_baixas (
+    linha INTEGER,
+    numero_cte BIGINT,
+    data_baixa DATE,
+    observacao TEXT,
+    valor_baixa NUMERIC
+) ON COMMIT DROP
+"""
+
+SQL_APLICAR_LOTE_BAIXAS = """
+WITH validacao AS (
+    SELECT
+        l.linha, l.numero_cte, l.data_baixa, COALESCE(l.observacao, '') AS observacao, l.valor_baixa,
+        d.numero_cte IS NOT NULL AS existe,
+        d.data_baixa AS baixa_banco,
+        row_number() OVER (PARTITION BY l.numero_cte ORDER BY l.linha) AS ordem,
+        first_value(l.data_baixa) OVER (PARTITION BY l.numero_cte ORDER BY l.linha) AS primeira_baixa
+    FROM lote_baixas l
+    LEFT JOIN dashboard_baker d ON d.numero_cte = l.numero_cte
+),
+aplicadas AS (
+    UPDATE dashboard_baker d
+    SET data_baixa = v.data_baixa,
+        observacao = COALESCE(d.observacao, '') || ' | BAIXA: ' || v.observacao ||
+            CASE WHEN v.valor_baixa <> 0 AND abs(v.valor_baixa - d.valor_total) > 0.01
+                 THEN ' | Valor original: R$ ' || to_char(d.valor_total, 'FM999999999990.00') ||
+                      ', Valor baixa: R$ ' || to_char(v.valor_baixa, 'FM999999999990.00')
+                 ELSE '' END,
+        updated_at = CURRENT_TIMESTAMP
+    FROM validacao v
+    WHERE d.numero_cte = v.numero_cte AND v.ordem = 1 AND d.data_baixa IS NULL
+    RETURNING d.numero_cte
+)
+SELECT
+    v.linha, v.numero_cte, v.existe, a.numero_cte IS NOT NULL AS aplicada,
+    -- Repetido no arquivo: a primeira ocorrência já deu (ou já tinha) a baixa
+    CASE WHEN v.ordem = 1 THEN v.baixa_banco ELSE COALESCE(v.baixa_banco, v.primeira_baixa) END AS baixa_existente
+FROM validacao v
+LEFT JOIN aplicadas a ON a.numero_cte = v.numero_cte AND v.ordem = 1
+ORDER BY v.linha
+"""
+
 class SistemaBaixasAutomaticas:
     """Sistema avançado de gestão de baixas e conciliação"""
 
@@ -1427,46 +3181,43 @@ class SistemaBaixasAutomaticas:
                        observacao: str = "", valor_baixa: float = None) -> Tuple[bool, str]:
         """Registra baixa de uma fatura específica com validação"""
         try:
-            conn = psycopg2.connect(**self.config)
-            cursor = conn.cursor()
-
-            # Verificar se CTE existe
-            cursor.execute("SELECT numero_cte, valor_total, data_baixa FROM dashboard_baker WHERE numero_cte = %s", (numero_cte,))
-            resultado = cursor.fetchone()
-
-            if not resultado:
-                cursor.close()
-                conn.close()
-                return False, f"CTE {numero_cte} não encontrado"
-
-            cte_num, valor_original, baixa_existente = resultado
-
-            # CORREÇÃO: Converter Decimal para float
-            if isinstance(valor_original, Decimal):
-                valor_original = float(valor_original)
-
-            # Verificar se já tem baixa
-            if baixa_existente:
+            with conexao_banco(self.config) as conn:
+                cursor = conn.cursor()
+
+                # Verificar se CTE existe
+                cursor.execute("SELECT numero_cte, valor_total, data_baixa FROM dashboard_baker WHERE numero_cte = %s", (numero_cte,))
+                resultado = cursor.fetchone()
+
+                if not resultado:
+                    cursor.close()
+                    return False, f"CTE {numero_cte} não encontrado"
+
+                cte_num, valor_original, baixa_existente = resultado
+
+                # CORREÇÃO: Converter Decimal para float
+                if isinstance(valor_original, Decimal):
+                    valor_original = float(valor_original)
+
+                # Verificar se já tem baixa
+                if baixa_existente:
+                    cursor.close()
+                    return False, f"CTE {numero_cte} já possui baixa em {baixa_existente}"
+
+                # Validar valor da baixa - CORREÇÃO
+                if valor_baixa and abs(float(valor_baixa) - float(valor_original)) > 0.01:
+                    observacao += f" | Valor original: R$ {valor_original:.2f}, Valor baixa: R$ {valor_baixa:.2f}"
+
+                # Registrar baixa
+                cursor.execute("""
+                    UPDATE dashboard_baker 
+                    SET data_baixa = %s, 
+                        observacao = COALESCE(observacao, '') || %s,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE numero_cte = %s
+                """, (data_baixa, f" | BAIXA: {observacao}", numero_cte))
+
+                conn.commit()
                 cursor.close()
-                conn.close()
-                return False, f"CTE {numero_cte} já possui baixa em {baixa_existente}"
-
-            # Validar valor da baixa - CORREÇÃO
-            if valor_baixa and abs(float(valor_baixa) - float(valor_original)) > 0.01:
-                observacao += f" | Valor original: R$ {valor_original:.2f}, Valor baixa: R$ {valor_baixa:.2f}"
-
-            # Registrar baixa
-            cursor.execute("""
-                UPDATE dashboard_baker 
-                SET data_baixa = %s, 
-                    observacao = COALESCE(observacao, '') || %s,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE numero_cte = %s
-            """, (data_baixa, f" | BAIXA: {observacao}", numero_cte))
-
-            conn.commit()
-            cursor.close()
-            conn.close()
 
             return True, f"Baixa registrada com sucesso para CTE {numero_cte}"
 
@@ -1474,7 +3225,11 @@ class SistemaBaixasAutomaticas:
             return False, f"Erro ao registrar baixa: {str(e)}"
 
     def processar_baixas_em_lote(self, arquivo_csv: str) -> Dict:
-        """Processa baixas em lote a partir de arquivo CSV"""
+        """
+        Processa baixas em lote a partir de arquivo CSV
+        O lote inteiro é validado e aplicado numa única transação (COPY para tabela
+        temporária + UPDATE ... FROM), com o mesmo detalhe por CTE de registrar_baixa
+        """
         try:
             # Carregar arquivo
             df_baixas = pd.read_csv(arquivo_csv)
@@ -1485,33 +3240,54 @@ class SistemaBaixasAutomaticas:
                 if col not in df_baixas.columns:
                     return {'sucesso': False, 'erro': f'Coluna obrigatória ausente: {col}'}
 
-            # Processar cada baixa
-            resultados = {
-                'processadas': 0,
-                'sucessos': 0,
-                'erros': 0,
-                'detalhes': []
+            # Colunas opcionais: observação vazia e valor ausente (sem conferência de valor)
+            lote = pd.DataFrame({
+                'linha': np.arange(len(df_baixas)),
+                'numero_cte': df_baixas['numero_cte'].astype('int64'),
+                'data_baixa': pd.to_datetime(df_baixas['data_baixa'], format='mixed', errors='coerce'),
+                'observacao': df_baixas['observacao'].fillna('').astype(str) if 'observacao' in df_baixas.columns else '',
+                'valor_baixa': pd.to_numeric(df_baixas['valor_baixa'], errors='coerce') if 'valor_baixa' in df_baixas.columns else np.nan
+            })
+            datas_invalidas = lote['data_baixa'].isna()
+            lote['data_baixa'] = lote['data_baixa'].dt.strftime('%Y-%m-%d')
+
+            detalhes = {
+                int(linha): {'cte': int(numero_cte), 'sucesso': False,
+                             'mensagem': f"Erro ao registrar baixa: data_baixa inválida ({valor})"}
+                for linha, numero_cte, valor in zip(lote['linha'][datas_invalidas],
+                                                     lote['numero_cte'][datas_invalidas],
+                                                     df_baixas['data_baixa'][datas_invalidas])
             }
 
-            for _, row in df_baixas.iterrows():
-                numero_cte = int(row['numero_cte'])
-                data_baixa = pd.to_datetime(row['data_baixa']).date()
-                observacao = row.get('observacao', '')
-                valor_baixa = row.get('valor_baixa', None)
-
-                sucesso, mensagem = self.registrar_baixa(numero_cte, data_baixa, observacao, valor_baixa)
-
-                resultados['processadas'] += 1
-                if sucesso:
-                    resultados['sucessos'] += 1
-                else:
-                    resultados['erros'] += 1
+            if not lote.empty and not datas_invalidas.all():
+                with conexao_banco(self.config) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(SQL_CRIAR_LOTE_BAIXAS)
+                    cursor.copy_expert(
+                        "COPY lote_baixas FROM STDIN WITH (FORMAT csv)",
+                        StringIO(lote[~datas_invalidas].to_csv(index=False, header=False))
+                    )
+                    cursor.execute(SQL_APLICAR_LOTE_BAIXAS)
+                    validados = cursor.fetchall()
+                    conn.commit()
+                    cursor.close()
+
+                for linha, numero_cte, existe, aplicada, baixa_existente in validados:
+                    if aplicada:
+                        mensagem = f"Baixa registrada com sucesso para CTE {numero_cte}"
+                    elif not existe:
+                        mensagem = f"CTE {numero_cte} não encontrado"
+                    else:
+                        mensagem = f"CTE {numero_cte} já possui baixa em {baixa_existente}"
+                    detalhes[linha] = {'cte': numero_cte, 'sucesso': aplicada, 'mensagem': mensagem}
 
-                resultados['detalhes'].append({
-                    'cte': numero_cte,
-                    'sucesso': sucesso,
-                    'mensagem': mensagem
-                })
+            sucessos = sum(detalhe['sucesso'] for detalhe in detalhes.values())
+            resultados = {
+                'processadas': len(detalhes),
+                'sucessos': sucessos,
+                'erros': len(detalhes) - sucessos,
+                'detalhes': [detalhes[linha] for linha in sorted(detalhes)]
+            }
 
             return {'sucesso': True, 'resultados': resultados}
 
@@ -1731,14 +3507,13 @@ def buscar_cte_postgresql(numero_cte):
         if not config:
             return False, "Erro na configuração do banco"
 
-        conn = psycopg2.connect(**config)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        with conexao_banco(config) as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-        cursor.execute("SELECT * FROM dashboard_baker WHERE numero_cte = %s", (numero_cte,))
-        resultado = cursor.fetchone()
+            cursor.execute("SELECT * FROM dashboard_baker WHERE numero_cte = %s", (numero_cte,))
+            resultado = cursor.fetchone()
 
-        cursor.close()
-        conn.close()
+            cursor.close()
 
         if resultado:
             # Converter para dict e limpar valores traduzidos
@@ -1761,10 +3536,6 @@ def buscar_cte_postgresql(numero_cte):
 def atualizar_cte_postgresql(numero_cte, dados_atualizados):
     """Atualiza um CTE existente no PostgreSQL"""
     try:
-        config = carregar_configuracao_banco()
-        conn = psycopg2.connect(**config)
-        cursor = conn.cursor()
-
         # Query de atualização
         query = """
         UPDATE dashboard_baker SET
@@ -1785,17 +3556,17 @@ def atualizar_cte_postgresql(numero_cte, dados_atualizados):
         WHERE numero_cte = %s
         """
 
-        cursor.execute(query, dados_atualizados + (numero_cte,))
+        with conexao_banco() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, dados_atualizados + (numero_cte,))
 
-        if cursor.rowcount > 0:
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True, "CTE atualizado com sucesso!"
-        else:
-            cursor.close()
-            conn.close()
-            return False, "CTE não encontrado para atualização"
+            if cursor.rowcount > 0:
+                conn.commit()
+                cursor.close()
+                return True, "CTE atualizado com sucesso!"
+            else:
+                cursor.close()
+                return False, "CTE não encontrado para atualização"
 
     except Exception as e:
         return False, f"Erro ao atualizar CTE: {str(e)}"
@@ -1803,10 +3574,6 @@ def atualizar_cte_postgresql(numero_cte, dados_atualizados):
 def inserir_cte_postgresql(dados_cte):
     """Insere um novo CTE no PostgreSQL"""
     try:
-        config = carregar_configuracao_banco()
-        conn = psycopg2.connect(**config)
-        cursor = conn.cursor()
-
         # Query de inserção
         query = """
         INSERT INTO dashboard_baker (
@@ -1819,10 +3586,11 @@ def inserir_cte_postgresql(dados_cte):
         )
         """
 
-        cursor.execute(query, dados_cte)
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with conexao_banco() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, dados_cte)
+            conn.commit()
+            cursor.close()
 
         return True, "CTE inserido com sucesso!"
 
@@ -1834,28 +3602,112 @@ def inserir_cte_postgresql(dados_cte):
 def deletar_cte_postgresql(numero_cte):
     """Deleta um CTE do PostgreSQL"""
     try:
-        config = carregar_configuracao_banco()
-        conn = psycopg2.connect(**config)
-        cursor = conn.cursor()
+        with conexao_banco() as conn:
+            cursor = conn.cursor()
 
-        # Verificar se existe
-        cursor.execute("SELECT numero_cte FROM dashboard_baker WHERE numero_cte = %s", (numero_cte,))
-        if not cursor.fetchone():
-            cursor.close()
-            conn.close()
-            return False, "CTE não encontrado"
+            # Verificar se existe
+            cursor.execute("SELECT numero_cte FROM dashboard_baker WHERE numero_cte = %s", (numero_cte,))
+            if not cursor.fetchone():
+                cursor.close()
+                return False, "CTE não encontrado"
 
-        # Deletar
-        cursor.execute("DELETE FROM dashboard_baker WHERE numero_cte = %s", (numero_cte,))
-        conn.commit()
-        cursor.close()
-        conn.close()
+            # Deletar
+            cursor.execute("DELETE FROM dashboard_baker WHERE numero_cte = %s", (numero_cte,))
+            conn.commit()
+            cursor.close()
 
         return True, "CTE deletado com sucesso!"
 
     except Exception as e:
         return False, f"Erro ao deletar CTE: {str(e)}"
 
+# ============================================================================
+# TABELAS PAGINADAS (ÍNDICE ORDENADO POR VERSÃO)
+# ============================================================================
+
+TAMANHOS_PAGINA = [25, 50, 100, 250]
+
+# Rótulo: (coluna, crescente). "data" é a coluna de referência da tabela;
+# ordenar pela data crescente equivale a dias em aberto decrescentes
+ORDENACOES_PENDENCIAS = {
+    "Mais dias em aberto": ('data', True),
+    "Menos dias em aberto": ('data', False),
+    "Maior valor": ('valor_total', False),
+    "CTE mais recente": ('numero_cte', False),
+    "Cliente (A-Z)": ('destinatario_nome', True)
+}
+
+def _posicoes_ordenadas(df: pd.DataFrame, coluna: str, crescente: bool) -> np.ndarray:
+    """Posições do DataFrame na ordem pedida (nulos no fim)"""
+    return (df[coluna].reset_index(drop=True)
+            .sort_values(ascending=crescente, na_position='last', kind='stable')
+            .index.to_numpy())
+
+def _mascara_cliente(serie: pd.Series, trecho: str) -> np.ndarray:
+    """Clientes que contêm o trecho; em category testa cada cliente distinto uma vez"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        aceitos = np.flatnonzero(serie.cat.categories.str.contains(trecho, case=False, regex=False))
+        return np.isin(serie.cat.codes.to_numpy(), aceitos)
+    return serie.astype(str).str.contains(trecho, case=False, regex=False).to_numpy() & serie.notna().to_numpy()
+
+def _formatar_pagina_pendencias(pagina: pd.DataFrame, coluna_data: str, rotulo_data: str,
+                                rotulo_dias: str, texto_sem_data: str) -> pd.DataFrame:
+    """Colunas de exibição montadas por coluna, só para as linhas da página"""
+    hoje = pd.Timestamp(datetime.now().date())
+    datas = pagina[coluna_data]
+
+    return pd.DataFrame({
+        'CTE': pagina['numero_cte'].to_numpy(),
+        'Cliente': pagina['destinatario_nome'].astype(object).where(pagina['destinatario_nome'].notna(), '').to_numpy(),
+        'Valor': ('R$ ' + pd.Series(np.char.mod('%.2f', pagina['valor_total'].to_numpy(dtype=float)))
+                  .str.replace(r'\B(?=(\d{3})+\.)', ',', regex=True)).to_numpy(),
+        rotulo_data: datas.dt.strftime('%d/%m/%Y').fillna(texto_sem_data).to_numpy(),
+        rotulo_dias: (hoje - datas).dt.days.fillna(0).astype(int).to_numpy()
+    })
+
+def exibir_tabela_pendencias(chave: str, df: pd.DataFrame, coluna_data: str, rotulo_data: str,
+                             rotulo_dias: str, texto_sem_data: str = 'N/A', marca=None):
+    """
+    Tabela de pendências paginada: a ordem de cada critério é calculada uma vez por
+    versão dos dados (estado_visao_versao), o filtro por cliente atua sobre esse
+    índice e só a página visível é formatada e enviada ao navegador.
+    `marca` é a mesma do estado_visao_versao que montou `df`
+    """
+    col_filtro, col_ordem, col_tamanho = st.columns([2, 2, 1])
+    with col_filtro:
+        trecho = st.text_input("🔍 Cliente contém", key=f"{chave}_filtro").strip()
+    with col_ordem:
+        ordenacao = st.selectbox("Ordenar por", list(ORDENACOES_PENDENCIAS), key=f"{chave}_ordem")
+    with col_tamanho:
+        tamanho = st.selectbox("Linhas", TAMANHOS_PAGINA, key=f"{chave}_tamanho")
+
+    coluna, crescente = ORDENACOES_PENDENCIAS[ordenacao]
+    coluna = coluna_data if coluna == 'data' else coluna
+    posicoes = estado_visao_versao(
+        f"{chave}_ordem_{coluna}_{crescente}", lambda: _posicoes_ordenadas(df, coluna, crescente), marca
+    )
+    if trecho:
+        posicoes = posicoes[_mascara_cliente(df['destinatario_nome'], trecho)[posicoes]]
+
+    total = len(posicoes)
+    if total == 0:
+        st.info("Nenhum CTE encontrado para o filtro")
+        return
+
+    paginas = (total - 1) // tamanho + 1
+    chave_pagina = f"{chave}_pagina"
+    if st.session_state.get(chave_pagina, 1) > paginas:
+        st.session_state[chave_pagina] = paginas
+    pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key=chave_pagina)
+
+    inicio = (int(pagina) - 1) * tamanho
+    visiveis = df.iloc[posicoes[inicio:inicio + tamanho]]
+    st.dataframe(
+        _formatar_pagina_pendencias(visiveis, coluna_data, rotulo_data, rotulo_dias, texto_sem_data),
+        use_container_width=True, hide_index=True
+    )
+    st.caption(f"Mostrando {inicio + 1}–{inicio + len(visiveis)} de {total} CTEs")
+
 # ============================================================================
 # ABAS DO SISTEMA EXPANDIDO
 # ============================================================================
@@ -1873,7 +3725,7 @@ def aba_dashboard_principal_expandido():
 
     # Carregar dados
     with st.spinner('🔄 Carregando dados do PostgreSQL...'):
-        df = carregar_dados_postgresql()
+        df = carregar_dados_postgresql(COLUNAS_PAINEL_CTE)
 
     if df.empty:
         st.error("❌ Nenhum dado encontrado no PostgreSQL")
@@ -1881,9 +3733,10 @@ def aba_dashboard_principal_expandido():
         return
 
     # Calcular métricas expandidas
-    metricas = gerar_metricas_expandidas(df)
-    alertas = calcular_alertas_inteligentes(df)
-    variacoes = calcular_variacoes_tempo_expandidas(df)
+    pacote = obter_pacote_analitico(df)
+    metricas = pacote['metricas']
+    alertas = pacote['alertas']
+    variacoes = pacote['variacoes']
 
     # ===============================
     # SEÇÃO 1: CARDS PRINCIPAIS EXPANDIDOS
@@ -2143,7 +3996,7 @@ def aba_dashboard_principal_expandido():
 
         # Gráfico de variações vs metas
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        fig_variacoes = gerar_grafico_variacoes_tempo(variacoes)
+        fig_variacoes = estado_visao_versao('grafico_variacoes', lambda: gerar_grafico_variacoes_tempo(variacoes))
         st.plotly_chart(fig_variacoes, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     else:
@@ -2163,7 +4016,7 @@ def aba_dashboard_principal_expandido():
 
     with col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        fig_receita = gerar_grafico_receita_mensal(df)
+        fig_receita = estado_visao_versao('grafico_receita_mensal', lambda: gerar_grafico_receita_mensal(df))
         st.plotly_chart(fig_receita, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -2357,7 +4210,7 @@ def aba_sistema_baixas():
                     if sucesso:
                         st.success(f"✅ {mensagem}")
                         st.balloons()
-                        st.cache_data.clear()  # Limpar cache
+                        aplicar_alteracoes_cache(alterados=[numero_cte])
                     else:
                         st.error(f"❌ {mensagem}")
                 else:
@@ -2416,7 +4269,9 @@ def aba_sistema_baixas():
                                 status_icon = "✅" if detalhe['sucesso'] else "❌"
                                 st.write(f"{status_icon} CTE {detalhe['cte']}: {detalhe['mensagem']}")
 
-                        st.cache_data.clear()  # Limpar cache
+                        aplicar_alteracoes_cache(alterados=[
+                            detalhe['cte'] for detalhe in resultados['detalhes'] if detalhe['sucesso']
+                        ])
                     else:
                         st.error(f"❌ Erro: {resultado['erro']}")
 
@@ -2429,26 +4284,25 @@ def aba_sistema_baixas():
         """, unsafe_allow_html=True)
 
         # Carregar dados para relatórios
-        df = carregar_dados_postgresql()
+        df = carregar_dados_postgresql(COLUNAS_PAINEL_CTE)
 
         if not df.empty:
             # Estatísticas de baixas
+            resumo = obter_pacote_analitico(df)['resumo_flags']
+            baixas_total, valor_baixado = totalizar_flags(resumo, com=FLAG_BAIXA)
+            pendentes, valor_pendente = totalizar_flags(resumo, sem=FLAG_BAIXA)
             col1, col2, col3, col4 = st.columns(4)
 
             with col1:
-                baixas_total = len(df[df['data_baixa'].notna()])
                 st.metric("Total de Baixas", baixas_total)
 
             with col2:
-                valor_baixado = df[df['data_baixa'].notna()]['valor_total'].sum()
                 st.metric("Valor Baixado", f"R$ {valor_baixado:,.2f}")
 
             with col3:
-                pendentes = len(df[df['data_baixa'].isna()])
                 st.metric("Baixas Pendentes", pendentes)
 
             with col4:
-                valor_pendente = df[df['data_baixa'].isna()]['valor_total'].sum()
                 st.metric("Valor Pendente", f"R$ {valor_pendente:,.2f}")
 
             # Gráfico de evolução das baixas
@@ -2558,7 +4412,7 @@ def aba_insercao_banco():
 
                 if sucesso:
                     st.success(f"✅ {mensagem}")
-                    st.cache_data.clear()  # Limpar cache para atualizar dados
+                    aplicar_alteracoes_cache(alterados=[numero_cte])
                     st.balloons()
                 else:
                     st.error(f"❌ {mensagem}")
@@ -2687,7 +4541,7 @@ def aba_insercao_banco():
 
                 if sucesso:
                     st.success(f"✅ {mensagem}")
-                    st.cache_data.clear()  # Limpar cache
+                    aplicar_alteracoes_cache(alterados=[numero_edicao])
 
                     # Limpar session_state
                     if 'cte_encontrado' in st.session_state:
@@ -2731,7 +4585,7 @@ def aba_insercao_banco():
 
                 if sucesso:
                     st.success(f"✅ {mensagem}")
-                    st.cache_data.clear()  # Limpar cache para atualizar dados
+                    aplicar_alteracoes_cache(excluidos=[numero_cte_delete])
                 else:
                     st.error(f"❌ {mensagem}")
             else:
@@ -2748,21 +4602,22 @@ def aba_ctes_pendentes():
     """, unsafe_allow_html=True)
 
     # Carregar dados
-    df = carregar_dados_postgresql()
+    df = carregar_dados_postgresql(COLUNAS_PAINEL_CTE)
 
     if df.empty:
         st.error("❌ Nenhum dado encontrado")
         return
 
     # Calcular alertas
-    alertas = calcular_alertas_inteligentes(df)
+    pacote = obter_pacote_analitico(df)
+    alertas = pacote['alertas']
 
     # Estatísticas gerais de pendências - CORRIGIDO COM VALORES MONETÁRIOS
+    resumo = pacote['resumo_flags']
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        ctes_sem_primeiro_envio = len(df[df['primeiro_envio'].isna()])
-        valor_sem_primeiro_envio = df[df['primeiro_envio'].isna()]['valor_total'].sum()
+        ctes_sem_primeiro_envio, valor_sem_primeiro_envio = totalizar_flags(resumo, sem=FLAG_PRIMEIRO_ENVIO)
         st.markdown(f"""
         <div class="status-card-warning">
             <div class="status-number">{ctes_sem_primeiro_envio}</div>
@@ -2772,8 +4627,7 @@ def aba_ctes_pendentes():
         """, unsafe_allow_html=True)
 
     with col2:
-        ctes_sem_atesto = len(df[df['data_atesto'].isna()])
-        valor_sem_atesto = df[df['data_atesto'].isna()]['valor_total'].sum()
+        ctes_sem_atesto, valor_sem_atesto = totalizar_flags(resumo, sem=FLAG_ATESTO)
         st.markdown(f"""
         <div class="status-card-info">
             <div class="status-number">{ctes_sem_atesto}</div>
@@ -2783,8 +4637,7 @@ def aba_ctes_pendentes():
         """, unsafe_allow_html=True)
 
     with col3:
-        ctes_sem_fatura = len(df[df['numero_fatura'].isna() | (df['numero_fatura'] == '')])
-        valor_sem_fatura = df[df['numero_fatura'].isna() | (df['numero_fatura'] == '')]['valor_total'].sum()
+        ctes_sem_fatura, valor_sem_fatura = totalizar_flags(resumo, sem=FLAG_FATURA)
         st.markdown(f"""
         <div class="status-card-warning">
             <div class="status-number">{ctes_sem_fatura}</div>
@@ -2794,8 +4647,7 @@ def aba_ctes_pendentes():
         """, unsafe_allow_html=True)
 
     with col4:
-        ctes_sem_baixa = len(df[df['data_baixa'].isna()])
-        valor_sem_baixa = df[df['data_baixa'].isna()]['valor_total'].sum()
+        ctes_sem_baixa, valor_sem_baixa = totalizar_flags(resumo, sem=FLAG_BAIXA)
         st.markdown(f"""
         <div class="status-card-danger">
             <div class="status-number">{ctes_sem_baixa}</div>
@@ -2825,104 +4677,29 @@ def aba_ctes_pendentes():
             st.error(f"🚨 **{alerta['qtd']} CTEs** com primeiro envio pendente há mais de 10 dias")
             st.write(f"💰 **Valor em risco:** R$ {alerta['valor']:,.2f}")
 
-            # Tabela detalhada
-            df_pendente = pd.DataFrame(alerta['lista'])
-            if not df_pendente.empty:
-                # Calcular dias em atraso de forma segura
-                hoje = datetime.now().date()
-
-                def calcular_dias_atraso(data_emissao):
-                    if pd.isna(data_emissao) or data_emissao is None:
-                        return 0
-                    try:
-                        if hasattr(data_emissao, 'date'):
-                            return (hoje - data_emissao.date()).days
-                        else:
-                            return 0
-                    except:
-                        return 0
-
-                df_pendente['dias_atraso'] = df_pendente['data_emissao'].apply(calcular_dias_atraso)
-
-                # Formatar valores
-                df_pendente['valor_total'] = df_pendente['valor_total'].apply(lambda x: f"R$ {x:,.2f}")
-
-                def formatar_data(data_emissao):
-                    if pd.isna(data_emissao) or data_emissao is None:
-                        return 'N/A'
-                    try:
-                        if hasattr(data_emissao, 'strftime'):
-                            return data_emissao.strftime('%d/%m/%Y')
-                        else:
-                            return 'N/A'
-                    except:
-                        return 'N/A'
-
-                df_pendente['data_emissao'] = df_pendente['data_emissao'].apply(formatar_data)
-
-                # Renomear colunas
-                df_display = df_pendente.rename(columns={
-                    'numero_cte': 'CTE',
-                    'destinatario_nome': 'Cliente',
-                    'valor_total': 'Valor',
-                    'data_emissao': 'Data Emissão',
-                    'dias_atraso': 'Dias em Atraso'
-                })
-
-                st.dataframe(corrigir_dataframe_traduzido(df_display), use_container_width=True, hide_index=True)
+            # Tabela detalhada (mesma regra do alerta, sobre os dados em cache)
+            limite = pd.Timestamp(_limite_alerta('primeiro_envio_pendente', datetime.now().date()))
+            exibir_tabela_pendencias(
+                'pendentes_primeiro_envio',
+                estado_visao_versao(
+                    'pendentes_primeiro_envio',
+                    lambda: df[df['primeiro_envio'].isna() & (df['data_emissao'] < limite)],
+                    limite.date()
+                ),
+                'data_emissao', 'Data Emissão', 'Dias em Atraso', marca=limite.date()
+            )
         else:
             st.success("✅ Nenhum CTE com primeiro envio pendente")
 
     with tab2:
-        ctes_sem_atesto_detalhado = df[df['data_atesto'].isna()]
+        ctes_sem_atesto_detalhado = estado_visao_versao('pendentes_atesto', lambda: df[df['data_atesto'].isna()])
         if not ctes_sem_atesto_detalhado.empty:
             st.warning(f"⏳ **{len(ctes_sem_atesto_detalhado)} CTEs** aguardando atesto")
 
-            # Preparar dados para exibição
-            df_display = ctes_sem_atesto_detalhado[['numero_cte', 'destinatario_nome', 'valor_total', 'primeiro_envio']].copy()
-
-            # Calcular dias desde primeiro envio de forma segura
-            hoje = datetime.now().date()
-
-            def calcular_dias_desde_envio(primeiro_envio):
-                if pd.isna(primeiro_envio) or primeiro_envio is None:
-                    return 0
-                try:
-                    if hasattr(primeiro_envio, 'date'):
-                        return (hoje - primeiro_envio.date()).days
-                    else:
-                        return 0
-                except:
-                    return 0
-
-            df_display['dias_desde_envio'] = df_display['primeiro_envio'].apply(calcular_dias_desde_envio)
-
-            # Formatar dados
-            df_display['valor_total'] = df_display['valor_total'].apply(lambda x: f"R$ {x:,.2f}")
-
-            def formatar_primeiro_envio(primeiro_envio):
-                if pd.isna(primeiro_envio) or primeiro_envio is None:
-                    return 'Não enviado'
-                try:
-                    if hasattr(primeiro_envio, 'strftime'):
-                        return primeiro_envio.strftime('%d/%m/%Y')
-                    else:
-                        return 'Não enviado'
-                except:
-                    return 'Não enviado'
-
-            df_display['primeiro_envio'] = df_display['primeiro_envio'].apply(formatar_primeiro_envio)
-
-            # Renomear colunas
-            df_display = df_display.rename(columns={
-                'numero_cte': 'CTE',
-                'destinatario_nome': 'Cliente',
-                'valor_total': 'Valor',
-                'primeiro_envio': '1º Envio',
-                'dias_desde_envio': 'Dias desde Envio'
-            })
-
-            st.dataframe(corrigir_dataframe_traduzido(df_display), use_container_width=True, hide_index=True)
+            exibir_tabela_pendencias(
+                'pendentes_atesto', ctes_sem_atesto_detalhado,
+                'primeiro_envio', '1º Envio', 'Dias desde Envio', texto_sem_data='Não enviado'
+            )
         else:
             st.success("✅ Todos os CTEs possuem atesto")
 
@@ -2959,27 +4736,12 @@ def aba_ctes_pendentes():
                 valor_total_pendente = ctes_sem_baixa_todos['valor_total'].sum()
                 st.write(f"Valor total: R$ {valor_total_pendente:,.2f}")
 
-                # Distribuição por idade - Cálculo seguro
-                hoje = datetime.now().date()
-
-                def calcular_dias_sem_baixa(data_atesto):
-                    if pd.isna(data_atesto) or data_atesto is None:
-                        return 0
-                    try:
-                        if hasattr(data_atesto, 'date'):
-                            return (hoje - data_atesto.date()).days
-                        else:
-                            return 0
-                    except:
-                        return 0
-
-                ctes_sem_baixa_todos['dias_sem_baixa'] = ctes_sem_baixa_todos['data_atesto'].apply(calcular_dias_sem_baixa)
-
-                # Categorizar por idade
-                ate_30_dias = len(ctes_sem_baixa_todos[ctes_sem_baixa_todos['dias_sem_baixa'] <= 30])
-                ate_60_dias = len(ctes_sem_baixa_todos[(ctes_sem_baixa_todos['dias_sem_baixa'] > 30) & (ctes_sem_baixa_todos['dias_sem_baixa'] <= 60)])
-                ate_90_dias = len(ctes_sem_baixa_todos[(ctes_sem_baixa_todos['dias_sem_baixa'] > 60) & (ctes_sem_baixa_todos['dias_sem_baixa'] <= 90)])
-                mais_90_dias = len(ctes_sem_baixa_todos[ctes_sem_baixa_todos['dias_sem_baixa'] > 90])
+                # Distribuição por idade (dias desde o atesto; sem atesto conta como 0)
+                dias_sem_baixa = (pd.Timestamp(datetime.now().date()) - ctes_sem_baixa_todos['data_atesto']).dt.days.fillna(0)
+                ate_30_dias = int((dias_sem_baixa <= 30).sum())
+                ate_60_dias = int(((dias_sem_baixa > 30) & (dias_sem_baixa <= 60)).sum())
+                ate_90_dias = int(((dias_sem_baixa > 60) & (dias_sem_baixa <= 90)).sum())
+                mais_90_dias = int((dias_sem_baixa > 90).sum())
 
                 st.write("**Por idade:**")
                 st.write(f"• Até 30 dias: {ate_30_dias}")
@@ -2989,116 +4751,141 @@ def aba_ctes_pendentes():
             else:
                 st.success("✅ Todas as faturas foram baixadas")
 
-def main():
-    """Função principal - REMOVIDA aba de email"""
-
-    # Limpeza preventiva do DOM
-    if 'dom_cleaned' not in st.session_state:
-        st.session_state.dom_cleaned = True
-
-    # Sistema de navegação
-    tabs = st.tabs([
-        "📊 Dashboard Principal", 
-        "💳 Sistema de Baixas", 
-        "🗄️ Gestão de Dados",
-        "🚨 CTEs Pendentes",
-        "📈 Análises Avançadas"
-    ])
-
-    with tabs[0]:
-        aba_dashboard_principal_expandido()
-
-    with tabs[1]:
-        aba_sistema_baixas()
-
-    with tabs[2]:
-        aba_insercao_banco()
+# ============================================================================
+# NAVEGAÇÃO ENTRE VISÕES
+# ============================================================================
 
-    with tabs[3]:
-        aba_ctes_pendentes()
+# Rótulo da visão: função que a desenha
+VISOES_SISTEMA = {
+    "📊 Dashboard Principal": lambda: aba_dashboard_principal_expandido(),
+    "💳 Sistema de Baixas": lambda: aba_sistema_baixas(),
+    "🗄️ Gestão de Dados": lambda: aba_insercao_banco(),
+    "🚨 CTEs Pendentes": lambda: aba_ctes_pendentes(),
+    "📈 Análises Avançadas": lambda: aba_analises_avancadas()
+}
 
-    with tabs[4]:
-        st.markdown("""
-        <div class="main-header">
-            <h1>📈 Análises Avançadas</h1>
-            <div class="subtitle">Business Intelligence e Análise Preditiva</div>
-        </div>
-        """, unsafe_allow_html=True)
+# Widgets cujo valor deve sobreviver enquanto a visão deles não é desenhada
+CHAVES_WIDGETS_PERSISTENTES = ('insert_cte', 'busca_cte_num', 'delete_cte_num') + tuple(
+    f"{tabela}_{campo}" for tabela in ('pendentes_primeiro_envio', 'pendentes_atesto')
+    for campo in ('filtro', 'ordem', 'tamanho', 'pagina')
+)
 
-        st.info("🚧 Módulo em desenvolvimento - Próximas funcionalidades:")
-        st.markdown("""
-        - 🤖 **Análise Preditiva de Inadimplência**
-        - 📊 **Dashboard Executivo Interativo**  
-        - 🔔 **Sistema de Notificações Automáticas**
-        - 📱 **Integração com WhatsApp/SMS**
-        - 📈 **Análise de Tendências e Sazonalidade**
-        - 🎯 **KPIs Personalizados por Cliente**
-        - 🔍 **Análise de Padrões de Comportamento**
-        - 📋 **Relatórios Executivos Automatizados**
-        """)
+def _preservar_estado_widgets():
+    """
+    O Streamlit descarta o estado de widgets que não foram desenhados no rerun;
+    regravar a chave no session_state a mantém para quando a visão voltar
+    """
+    for chave in CHAVES_WIDGETS_PERSISTENTES:
+        if chave in st.session_state:
+            st.session_state[chave] = st.session_state[chave]
 
-        # Carregar dados para análises futuras
-        df = carregar_dados_postgresql()
+def aba_analises_avancadas():
+    """Aba de análises avançadas (pré-visualização)"""
 
-        if not df.empty:
-            st.subheader("📊 Pré-visualização de Análises")
+    st.markdown("""
+    <div class="main-header">
+        <h1>📈 Análises Avançadas</h1>
+        <div class="subtitle">Business Intelligence e Análise Preditiva</div>
+    </div>
+    """, unsafe_allow_html=True)
 
-            # Análise básica de tendências
-            col1, col2, col3 = st.columns(3)
+    st.info("🚧 Módulo em desenvolvimento - Próximas funcionalidades:")
+    st.markdown("""
+    - 🤖 **Análise Preditiva de Inadimplência**
+    - 📊 **Dashboard Executivo Interativo**  
+    - 🔔 **Sistema de Notificações Automáticas**
+    - 📱 **Integração com WhatsApp/SMS**
+    - 📈 **Análise de Tendências e Sazonalidade**
+    - 🎯 **KPIs Personalizados por Cliente**
+    - 🔍 **Análise de Padrões de Comportamento**
+    - 📋 **Relatórios Executivos Automatizados**
+    """)
+
+    # Carregar dados para análises futuras
+    df = carregar_dados_postgresql(COLUNAS_PAINEL_CTE)
 
-            with col1:
-                # Análise de sazonalidade simples
-                if 'data_emissao' in df.columns:
-                    df_temp = df[df['data_emissao'].notna()].copy()
-                    if not df_temp.empty:
-                        df_temp['mes'] = df_temp['data_emissao'].dt.month
-                        receita_por_mes = df_temp.groupby('mes')['valor_total'].sum()
-
-                        fig = go.Figure()
-                        fig.add_trace(go.Bar(
-                            x=[f"Mês {m}" for m in receita_por_mes.index],
-                            y=receita_por_mes.values,
-                            marker_color='#0f4c75'
-                        ))
-
-                        fig.update_layout(
-                            title='Receita por Mês (Análise Sazonal)',
-                            height=300
-                        )
-
-                        st.plotly_chart(fig, use_container_width=True)
+    if not df.empty:
+        st.subheader("📊 Pré-visualização de Análises")
 
-            with col2:
-                # Análise de performance por cliente
-                if 'destinatario_nome' in df.columns:
-                    top_clientes = df.groupby('destinatario_nome')['valor_total'].sum().sort_values(ascending=False).head(10)
+        # Análise básica de tendências
+        col1, col2, col3 = st.columns(3)
 
+        with col1:
+            # Análise de sazonalidade simples
+            if 'data_emissao' in df.columns:
+                def _receita_por_mes():
+                    df_temp = df[df['data_emissao'].notna()]
+                    return df_temp.groupby(df_temp['data_emissao'].dt.month)['valor_total'].sum()
+
+                receita_por_mes = estado_visao_versao('analises_receita_por_mes', _receita_por_mes)
+                if not receita_por_mes.empty:
                     fig = go.Figure()
                     fig.add_trace(go.Bar(
-                        x=top_clientes.values,
-                        y=top_clientes.index,
-                        orientation='h',
-                        marker_color='#28a745'
+                        x=[f"Mês {m}" for m in receita_por_mes.index],
+                        y=receita_por_mes.values,
+                        marker_color='#0f4c75'
                     ))
 
                     fig.update_layout(
-                        title='Top 10 Clientes por Receita',
+                        title='Receita por Mês (Análise Sazonal)',
                         height=300
                     )
 
                     st.plotly_chart(fig, use_container_width=True)
 
+        with col2:
+            # Análise de performance por cliente
+            if 'destinatario_nome' in df.columns:
+                top_clientes = estado_visao_versao('analises_top_clientes', lambda: (
+                    df.groupby('destinatario_nome', observed=True)['valor_total'].sum().sort_values(ascending=False).head(10)
+                ))
+
+                fig = go.Figure()
+                fig.add_trace(go.Bar(
+                    x=top_clientes.values,
+                    y=top_clientes.index,
+                    orientation='h',
+                    marker_color='#28a745'
+                ))
+
+                fig.update_layout(
+                    title='Top 10 Clientes por Receita',
+                    height=300
+                )
+
+                st.plotly_chart(fig, use_container_width=True)
+
+def main():
+    """Função principal - REMOVIDA aba de email"""
+
+    # Limpeza preventiva do DOM
+    if 'dom_cleaned' not in st.session_state:
+        st.session_state.dom_cleaned = True
+
+    # Sistema de navegação: no modo "seletor" só a visão ativa roda a cada interação;
+    # UI_NAVEGACAO=abas volta ao st.tabs (todas as abas rodam em todo rerun)
+    if _ler_parametro_banco('UI_NAVEGACAO', 'seletor').lower() == 'abas':
+        for aba, desenhar in zip(st.tabs(list(VISOES_SISTEMA)), VISOES_SISTEMA.values()):
+            with aba:
+                desenhar()
+    else:
+        _preservar_estado_widgets()
+        visao = st.radio("Navegação", list(VISOES_SISTEMA), horizontal=True,
+                         key='visao_ativa', label_visibility='collapsed')
+        VISOES_SISTEMA[visao]()
+
     # Sidebar expandida COM DOWNLOADS
     with st.sidebar:
         st.header("📊 Status do Sistema Avançado")
 
         # Teste de conexão
         with st.spinner('🔄 Verificando sistema...'):
-            df_test = carregar_dados_postgresql()
+            df_test = carregar_dados_postgresql(COLUNAS_PAINEL_CTE)
 
         if not df_test.empty:
-            metricas_sidebar = gerar_metricas_expandidas(df_test)
-            alertas_sidebar = calcular_alertas_inteligentes(df_test)
+            pacote_sidebar = obter_pacote_analitico(df_test)
+            metricas_sidebar = pacote_sidebar['metricas']
+            alertas_sidebar = pacote_sidebar['alertas']
 
             st.success("✅ Sistema Operacional")
 
@@ -3126,6 +4913,52 @@ def main():
         else:
             st.error("❌ Sistema Offline")
 
+        # Contadores do pool de conexões
+        pools = _registro_pools()
+        if pools:
+            with st.expander("🔌 Pool de Conexões"):
+                for destino, pool in pools.items():
+                    stats = pool.estatisticas()
+                    st.caption(destino)
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("Hits", stats['hits'])
+                        st.metric("Esperas", stats['esperas'])
+                    with col2:
+                        st.metric("Misses", stats['misses'])
+                        st.metric("Em uso", f"{stats['em_uso']}/{stats['max_conexoes']}")
+                    st.text(f"Reuso: {stats['taxa_reuso']:.1f}% | Ociosas: {stats['ociosas']}")
+                    st.text(f"Espera total: {stats['tempo_espera_total']:.2f}s | Timeouts: {stats['timeouts']}")
+                    st.text(f"Descartadas: {stats['descartadas']} | Expiradas: {stats['expiradas']}")
+
+        # Contadores do pacote analítico (métricas/alertas/variações por versão)
+        stats_pacote = estatisticas_pacote_analitico()
+        with st.expander("🧮 Cache Analítico"):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Hits", stats_pacote['hits'])
+            with col2:
+                st.metric("Misses", stats_pacote['misses'])
+            st.text(f"Taxa de hit: {stats_pacote['taxa_hit']:.1f}% | Versões: {stats_pacote['versoes']}")
+
+        # Contadores da atualização incremental
+        for stats in estatisticas_atualizacao_dados():
+            with st.expander(f"🔁 Atualização Incremental ({stats['colunas']} colunas)"):
+                st.text(f"Recargas completas: {stats['recargas_completas']}")
+                st.text(f"Deltas: {stats['atualizacoes_delta']} | Último delta: {stats['linhas_ultimo_delta']} linhas")
+                st.text(f"Exclusões detectadas: {stats['exclusoes_detectadas']} | "
+                        f"Reaproveitadas de outra projeção: {stats['projecoes_reaproveitadas']}")
+                if stats['memoria_antes']:
+                    st.text(f"Memória: {stats['memoria_depois'] / 1024**2:.1f} MB "
+                            f"(sem compactar: {stats['memoria_antes'] / 1024**2:.1f} MB)")
+
+                config_ouvinte = carregar_configuracao_banco()
+                if config_ouvinte and _escuta_alteracoes_ativa():
+                    ouvinte = iniciar_ouvinte_alteracoes(config_ouvinte).estatisticas()
+                    st.text(f"LISTEN: {'🟢 conectado' if ouvinte['conectado'] else '🔴 desconectado'}")
+                    st.text(f"Notificações: {ouvinte['notificacoes']} | Lotes: {ouvinte['lotes_aplicados']}")
+                    st.text(f"Invalidações: {ouvinte['invalidacoes']} | Reconexões: {ouvinte['reconexoes']}")
+
         st.markdown("---")
 
         # Ações rápidas expandidas COM SISTEMA DE DOWNLOADS
@@ -3133,6 +4966,8 @@ def main():
 
         if st.button("🔄 Atualizar Cache"):
             st.cache_data.clear()
+            invalidar_configuracao_banco()
+            invalidar_versao_dados()
             st.success("✅ Cache atualizado")
             st.rerun()
 
@@ -3170,55 +5005,12 @@ def main():
             </div>
             """, unsafe_allow_html=True)
 
-            # Gerar dados para relatórios
-            metricas_rel = gerar_metricas_expandidas(df_test)
-            alertas_rel = calcular_alertas_inteligentes(df_test)
-            variacoes_rel = calcular_variacoes_tempo_expandidas(df_test)
-
-            # Botão Excel
-            try:
-                excel_data = gerar_relatorio_excel(df_test, metricas_rel, alertas_rel, variacoes_rel)
-                timestamp_excel = datetime.now().strftime('%Y%m%d_%H%M%S')
-
-                st.download_button(
-                    label="📊 Relatório Excel Completo",
-                    data=excel_data,
-                    file_name=f"dashboard_baker_{timestamp_excel}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
-            except Exception as e:
-                st.error(f"❌ Erro Excel: {str(e)[:50]}...")
-
-            # Botão HTML
-            try:
-                html_data = gerar_relatorio_pdf_html(df_test, metricas_rel, alertas_rel, variacoes_rel)
-                timestamp_html = datetime.now().strftime('%Y%m%d_%H%M%S')
-
-                st.download_button(
-                    label="📄 Relatório HTML/PDF",
-                    data=html_data,
-                    file_name=f"dashboard_baker_{timestamp_html}.html",
-                    mime="text/html",
-                    use_container_width=True
-                )
-            except Exception as e:
-                st.error(f"❌ Erro HTML: {str(e)[:50]}...")
-
-            # Botão CSV
-            try:
-                csv_data = df_test.to_csv(index=False, encoding='utf-8-sig')
-                timestamp_csv = datetime.now().strftime('%Y%m%d_%H%M%S')
-
-                st.download_button(
-                    label="📋 Dados CSV Brutos",
-                    data=csv_data,
-                    file_name=f"dados_baker_{timestamp_csv}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
-            except Exception as e:
-                st.error(f"❌ Erro CSV: {str(e)[:50]}...")
+            # Relatórios só quando pedidos; prontos ficam em cache por versão e formato
+            exibir_downloads_relatorios(
+                st.session_state.get('versao_dados') or 'simulado',
+                obter_pacote_analitico(df_test),
+                estado_visao_versao('clientes_exportacao', lambda: sorted(df_test['destinatario_nome'].dropna().unique()))
+            )
 
             st.info("💡 **HTML → PDF:** Abra o arquivo HTML no navegador e pressione Ctrl+P")
         else:
@@ -3266,8 +5058,8 @@ def main():
             st.text(f"Última atualização: {ultimo_update}")
 
             # Estatísticas rápidas
-            if 'created_at' in df_test.columns:
-                registros_hoje = len(df_test[df_test['created_at'].dt.date == datetime.now().date()])
+            registros_hoje = contar_registros_hoje()
+            if registros_hoje is not None:
                 st.text(f"Registros hoje: {registros_hoje}")
 
         # Link para documentação (simulado)
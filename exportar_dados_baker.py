@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportação de Dados - Dashboard Baker
+Grava os CTEs em CSV gzip ou Parquet direto em arquivo, lendo o banco em blocos
+(memória constante qualquer que seja o tamanho da tabela). Os filtros vão para o SQL
+
+Uso:
+    python exportar_dados_baker.py dados.csv.gz
+    python exportar_dados_baker.py dados.parquet --inicio 2024-01-01 --fim 2024-06-30 \
+        --cliente "CLIENTE A" --cliente "CLIENTE B" --status "Sem Baixa"
+"""
+
+import argparse
+import time
+from datetime import date
+
+from dashboard_baker_web_corrigido import STATUS_EXPORTACAO_SQL, carregar_configuracao_banco, exportar_dados_fluxo
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta os CTEs do Dashboard Baker em CSV gzip ou Parquet")
+    parser.add_argument('destino', help="arquivo de saída (.csv.gz ou .parquet)")
+    parser.add_argument('--formato', choices=['csv_gz', 'parquet'],
+                        help="padrão: deduzido da extensão do destino")
+    parser.add_argument('--inicio', type=date.fromisoformat, help="emissão a partir de (AAAA-MM-DD)")
+    parser.add_argument('--fim', type=date.fromisoformat, help="emissão até (AAAA-MM-DD)")
+    parser.add_argument('--cliente', action='append', default=[], help="destinatário (pode repetir)")
+    parser.add_argument('--status', choices=list(STATUS_EXPORTACAO_SQL), default='Todos')
+    args = parser.parse_args()
+
+    formato = args.formato or ('parquet' if args.destino.endswith('.parquet') else 'csv_gz')
+    config = carregar_configuracao_banco()
+    if config is None:
+        print("❌ Banco não configurado")
+        return False
+
+    inicio = time.perf_counter()
+    total = exportar_dados_fluxo(formato, args.destino,
+                                 (args.inicio, args.fim, tuple(sorted(args.cliente)), args.status),
+                                 config, progresso=lambda gravados: print(f"   {gravados:,} CTEs gravados", end='\r'))
+
+    print(f"✅ {total:,} CTEs exportados em {args.destino} ({time.perf_counter() - inicio:.1f}s)")
+    return True
+
+if __name__ == "__main__":
+    if not main():
+        exit(1)
@@ -72,6 +72,7 @@ def criar_tabela_dashboard_baker(cursor):
     CREATE INDEX IF NOT EXISTS idx_dashboard_baker_destinatario ON dashboard_baker(destinatario_nome);
     CREATE INDEX IF NOT EXISTS idx_dashboard_baker_data_emissao ON dashboard_baker(data_emissao);
     CREATE INDEX IF NOT EXISTS idx_dashboard_baker_data_baixa ON dashboard_baker(data_baixa);
+    CREATE INDEX IF NOT EXISTS idx_dashboard_baker_updated_at ON dashboard_baker(updated_at);
     
     -- Trigger para updated_at
     CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -86,11 +87,43 @@ def criar_tabela_dashboard_baker(cursor):
     CREATE TRIGGER update_dashboard_baker_updated_at 
         BEFORE UPDATE ON dashboard_baker 
         FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+    
+    -- Trigger de notificação (invalidação de cache entre processos do dashboard)
+    CREATE OR REPLACE FUNCTION notificar_alteracao_dashboard_baker()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        PERFORM pg_notify('dashboard_baker_alteracoes', json_build_object(
+            'op', TG_OP,
+            'numero_cte', CASE WHEN TG_OP = 'DELETE' THEN OLD.numero_cte ELSE NEW.numero_cte END
+        )::text);
+        RETURN NULL;
+    END;
+    $$ language 'plpgsql';
+    
+    DROP TRIGGER IF EXISTS notificar_dashboard_baker_alteracoes ON dashboard_baker;
+    CREATE TRIGGER notificar_dashboard_baker_alteracoes
+        AFTER INSERT OR UPDATE OR DELETE ON dashboard_baker
+        FOR EACH ROW EXECUTE FUNCTION notificar_alteracao_dashboard_baker();
+
     """
     
     cursor.execute(sql_create_table)
     print("✅ Tabela dashboard_baker criada/verificada com sucesso")
 
+    from dashboard_baker_web_corrigido import (
+        SQL_INDICES_ALERTAS, SQL_LIMPAR_NULOS_TRADUZIDOS, SQL_TRIGGER_NULOS_TRADUZIDOS, _modo_limpeza_nulos
+    )
+
+    # Índices parciais dos alertas: gerados de REGRAS_ALERTAS_SQL, mesma expressão das consultas
+    cursor.execute(SQL_INDICES_ALERTAS)
+
+    # Limpeza das sentinelas na ingestão: só com DB_LIMPEZA_NULOS=ingestao, pois reescreve
+    # o texto gravado. Mesmo SQL do dashboard (gerado de VALORES_NULOS_TRADUZIDOS)
+    if _modo_limpeza_nulos() == 'ingestao':
+        cursor.execute(SQL_TRIGGER_NULOS_TRADUZIDOS)
+        cursor.execute(SQL_LIMPAR_NULOS_TRADUZIDOS)
+        print("✅ Trigger de limpeza de nulos criado e linhas antigas limpas")
+
 def inserir_dados_exemplo(cursor):
     """Insere alguns dados de exemplo se a tabela estiver vazia"""
     # Verificar se já tem dados
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de Exportação - Dashboard Baker
+Exportações que consomem os dados em blocos (DataFrames) e gravam direto no destino,
+então a memória fica limitada a um bloco qualquer que seja o tamanho da tabela:
+- Excel com o xlsxwriter em modo constant_memory: cada coluna de um bloco é
+  convertida uma vez (datas viram número serial do Excel, nulos viram None) e as
+  linhas vão para os arquivos temporários do xlsxwriter
+- CSV comprimido com gzip e Parquet (um row group por bloco)
+"""
+
+import codecs
+import gzip
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Limite de linhas de uma aba do Excel (a planilha continua em outra aba)
+LIMITE_LINHAS_EXCEL = 1_048_576
+
+# Dia 0 do Excel (sistema 1900) contado a partir da época Unix
+_EPOCA_EXCEL_EM_DIAS = 25569.0
+_NS_POR_DIA = 86_400 * 10**9
+
+# ============================================================================
+# CONVERSÃO POR COLUNA
+# ============================================================================
+
+def _tipo_coluna(serie: pd.Series) -> str:
+    """data | data_hora | numero | texto"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        normalizada = serie.dropna()
+        return 'data' if (normalizada == normalizada.dt.normalize()).all() else 'data_hora'
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return 'numero'
+    return 'texto'
+
+def converter_coluna(serie: pd.Series, tipo: str) -> List:
+    """Valores prontos para o xlsxwriter, com None nas células vazias"""
+    nulos = serie.isna().to_numpy()
+
+    if tipo in ('data', 'data_hora'):
+        ns = serie.to_numpy(dtype='datetime64[ns]').view('i8')
+        valores = (ns / _NS_POR_DIA + _EPOCA_EXCEL_EM_DIAS).astype(object)
+    elif tipo == 'numero':
+        valores = serie.to_numpy(dtype=float, na_value=np.nan).astype(object)
+    else:
+        valores = serie.astype(object).to_numpy(copy=True)
+        preenchidos = ~nulos
+        valores[preenchidos] = [str(valor) for valor in valores[preenchidos]]
+
+    valores[nulos] = None
+    return valores.tolist()
+
+# ============================================================================
+# ESCRITA EM MODO constant_memory
+# ============================================================================
+
+def formatos_exportacao(workbook) -> Dict:
+    """Formatos da aba de dados (mesmos do relatório Excel)"""
+    return {
+        'cabecalho': workbook.add_format({'bold': True, 'bg_color': '#0f4c75', 'font_color': 'white', 'align': 'center'}),
+        'moeda': workbook.add_format({'num_format': 'R$ #,##0.00'}),
+        'data': workbook.add_format({'num_format': 'dd/mm/yyyy'}),
+        'data_hora': workbook.add_format({'num_format': 'dd/mm/yyyy hh:mm:ss'}),
+        'numero': None,
+        'texto': None
+    }
+
+def _nova_aba(workbook, nome: str, parte: int, colunas: List[str], formatos: Dict):
+    aba = workbook.add_worksheet(nome if parte == 1 else f"{nome} ({parte})"[:31])
+    for indice, coluna in enumerate(colunas):
+        aba.write_string(0, indice, coluna.replace('_', ' ').title(), formatos['cabecalho'])
+        aba.set_column(indice, indice, 30 if coluna.endswith('_nome') or coluna == 'observacao' else 15)
+    aba.freeze_panes(1, 0)
+    return aba
+
+def escrever_aba_dados(workbook, nome: str, blocos: Iterable[pd.DataFrame],
+                       colunas: Optional[List[str]] = None, formatos: Optional[Dict] = None,
+                       progresso=None) -> int:
+    """
+    Escreve os blocos (DataFrames com as mesmas colunas) em uma aba com cabeçalho.
+    O workbook deve estar em constant_memory: as linhas são gravadas em ordem e
+    cada linha é descarregada no disco quando a próxima começa.
+    Retorna o total de linhas de dados escritas
+    """
+    formatos = formatos or formatos_exportacao(workbook)
+    aba, parte, linha, total = None, 1, 1, 0
+
+    for bloco in blocos:
+        if colunas is None:
+            colunas = list(bloco.columns)
+        if aba is None:
+            aba = _nova_aba(workbook, nome, parte, colunas, formatos)
+        if bloco.empty:
+            continue
+
+        # Uma conversão por coluna do bloco; o laço abaixo só escolhe o método de escrita
+        escritas: List[Tuple] = []
+        for coluna in colunas:
+            tipo = _tipo_coluna(bloco[coluna])
+            formato = formatos['moeda'] if coluna == 'valor_total' else formatos[tipo]
+            escritas.append((tipo == 'texto', formato, converter_coluna(bloco[coluna], tipo)))
+
+        for valores_linha in zip(*(valores for _, _, valores in escritas)):
+            if linha >= LIMITE_LINHAS_EXCEL:
+                parte, linha = parte + 1, 1
+                aba = _nova_aba(workbook, nome, parte, colunas, formatos)
+
+            for indice, valor in enumerate(valores_linha):
+                if valor is None:
+                    continue
+                texto, formato = escritas[indice][0], escritas[indice][1]
+                if texto:
+                    aba.write_string(linha, indice, valor, formato)
+                else:
+                    aba.write_number(linha, indice, valor, formato)
+            linha += 1
+
+        total += len(bloco)
+        if progresso is not None:
+            progresso(total)
+
+    if aba is None and colunas:
+        _nova_aba(workbook, nome, parte, colunas, formatos)
+    return total
+
+def exportar_excel(blocos: Iterable[pd.DataFrame], destino, nome_aba: str = 'Dados',
+                   colunas: Optional[List[str]] = None, tmpdir: Optional[str] = None) -> int:
+    """
+    Planilha só com os dados, gravada em `destino` (caminho ou buffer binário).
+    As linhas ficam em arquivos temporários (tmpdir) até o close
+    """
+    import xlsxwriter
+
+    opcoes = {'constant_memory': True}
+    if tmpdir:
+        opcoes['tmpdir'] = tmpdir
+    workbook = xlsxwriter.Workbook(destino, opcoes)
+    try:
+        return escrever_aba_dados(workbook, nome_aba, blocos, colunas)
+    finally:
+        workbook.close()
+
+# ============================================================================
+# CSV GZIP E PARQUET
+# ============================================================================
+
+def _esquema_arrow(bloco: Optional[pd.DataFrame], colunas: List[str], tipos: Optional[Dict]):
+    """Esquema fixo do arquivo: tipos informados ou inferidos do primeiro bloco"""
+    import pyarrow as pa
+
+    tipos = tipos or {}
+    inferido = pa.Schema.from_pandas(bloco[colunas], preserve_index=False) if bloco is not None else None
+    campos = []
+    for coluna in colunas:
+        tipo = tipos.get(coluna) or (inferido.field(coluna).type if inferido is not None else pa.string())
+        if pa.types.is_dictionary(tipo):
+            tipo = tipo.value_type
+        elif pa.types.is_null(tipo):  # coluna toda vazia no primeiro bloco
+            tipo = pa.string()
+        campos.append(pa.field(coluna, tipo))
+    return pa.schema(campos)
+
+def _tabelas_arrow(blocos: Iterable[pd.DataFrame], colunas: Optional[List[str]],
+                   tipos: Optional[Dict], progresso=None):
+    """Blocos convertidos em tabelas Arrow, todas com o esquema do primeiro bloco"""
+    import pyarrow as pa
+
+    esquema, total = None, 0
+    for bloco in blocos:
+        if esquema is None:
+            colunas = colunas or list(bloco.columns)
+            esquema = _esquema_arrow(bloco, colunas, tipos)
+        if bloco.empty:
+            continue
+        yield pa.Table.from_pandas(bloco[colunas], schema=esquema, preserve_index=False)
+        total += len(bloco)
+        if progresso is not None:
+            progresso(total)
+
+    if esquema is None and colunas:
+        yield _esquema_arrow(None, colunas, tipos).empty_table()
+
+def exportar_csv_gzip(blocos: Iterable[pd.DataFrame], destino, colunas: Optional[List[str]] = None,
+                      tipos: Optional[Dict] = None, nivel: int = 6, progresso=None) -> int:
+    """
+    CSV (UTF-8 com BOM, como o download antigo) comprimido com gzip em `destino`
+    (caminho ou buffer binário). O texto sai do escritor CSV do Arrow, bloco a bloco.
+    Nível 6: mesmo tamanho do 9 nos dados de CTE, em uma fração do tempo
+    """
+    import pyarrow.csv as pa_csv
+
+    escritor, total = None, 0
+    with gzip.open(destino, 'wb', compresslevel=nivel) as arquivo:
+        arquivo.write(codecs.BOM_UTF8)
+        for tabela in _tabelas_arrow(blocos, colunas, tipos, progresso):
+            if escritor is None:
+                escritor = pa_csv.CSVWriter(arquivo, tabela.schema)
+            escritor.write_table(tabela)
+            total += tabela.num_rows
+        if escritor is not None:
+            escritor.close()
+    return total
+
+def exportar_parquet(blocos: Iterable[pd.DataFrame], destino, colunas: Optional[List[str]] = None,
+                     tipos: Optional[Dict] = None, compressao: str = 'zstd', progresso=None) -> int:
+    """Parquet em `destino` (caminho ou buffer binário), um row group por bloco"""
+    import pyarrow.parquet as pq
+
+    escritor, total = None, 0
+    try:
+        for tabela in _tabelas_arrow(blocos, colunas, tipos, progresso):
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabela.schema, compression=compressao)
+            escritor.write_table(tabela)
+            total += tabela.num_rows
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
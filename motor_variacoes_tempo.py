@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de Variações Temporais - Dashboard Baker
+Converte as datas do ciclo de vida do CTE em uma matriz int32 de dias
+uma única vez e calcula todos os pares (início, fim) de uma só vez.
+SketchVariacoes mantém as mesmas estatísticas em histogramas mescláveis,
+atualizados a cada escrita
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# MATRIZ DE DIAS
+# ============================================================================
+
+# Datas do ciclo de vida do CTE (nomes do banco)
+COLUNAS_CICLO_VIDA = [
+    'data_emissao',
+    'data_inclusao_fatura',
+    'data_envio_processo',
+    'primeiro_envio',
+    'data_rq_tmc',
+    'data_atesto',
+    'envio_final',
+    'data_baixa'
+]
+
+# Marca de data ausente na matriz (NaT)
+DIA_NULO = np.iinfo(np.int32).min
+
+# Marca de posição inválida na ordenação (vai para o fim de cada coluna)
+_DIA_ORDENACAO_NULO = np.iinfo(np.int32).max
+
+_NS_POR_DIA = 86_400 * 10**9
+
+def matriz_dias(df: pd.DataFrame, colunas: Sequence[str]) -> np.ndarray:
+    """Matriz (linhas x colunas) int32 com dias desde 1970-01-01; DIA_NULO onde não há data"""
+    # Ordem por colunas: cada data e cada par é um bloco contíguo de memória
+    matriz = np.empty((len(df), len(colunas)), dtype=np.int32, order='F')
+
+    for indice, coluna in enumerate(colunas):
+        serie = df[coluna]
+        if not pd.api.types.is_datetime64_any_dtype(serie):
+            serie = pd.to_datetime(serie, errors='coerce')
+        if getattr(serie.dt, 'tz', None) is not None:
+            serie = serie.dt.tz_localize(None)
+
+        nanosegundos = serie.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        np.copyto(matriz[:, indice], nanosegundos // _NS_POR_DIA, casting='unsafe')
+        matriz[nanosegundos == np.iinfo(np.int64).min, indice] = DIA_NULO
+
+    return matriz
+
+# ============================================================================
+# CÁLCULO DOS PARES
+# ============================================================================
+
+def _quantil_ordenado(ordenados: np.ndarray, qtd: np.ndarray, q: float) -> np.ndarray:
+    """Quantil (interpolação linear, como pandas) de cada coluna já ordenada com qtd valores válidos"""
+    posicao = q * np.maximum(qtd - 1, 0)
+    abaixo = np.floor(posicao).astype(np.int64)
+    acima = np.ceil(posicao).astype(np.int64)
+    colunas = np.arange(ordenados.shape[1])
+    inferior = ordenados[abaixo, colunas]
+    return inferior + (ordenados[acima, colunas] - inferior) * (posicao - abaixo)
+
+def _estatisticas_colunas(dias: np.ndarray, validos: np.ndarray) -> Dict[str, np.ndarray]:
+    """Estatísticas por coluna de uma matriz de diferenças, ignorando as posições inválidas
+
+    Uma única ordenação por coluna (inválidos vão para o fim) serve mediana, p90, mínimo e máximo.
+    Colunas sem nenhum valor válido ficam com qtd 0 (e são descartadas por quem chama).
+    """
+    qtd = validos.sum(axis=0)
+    ordenados = np.sort(np.where(validos, dias, _DIA_ORDENACAO_NULO), axis=0)
+    colunas = np.arange(dias.shape[1])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(validos, dias, 0).sum(axis=0, dtype=np.int64) / qtd
+
+    return {
+        'qtd': qtd,
+        'media': media,
+        'mediana': _quantil_ordenado(ordenados, qtd, 0.5),
+        'percentil_90': _quantil_ordenado(ordenados, qtd, 0.9),
+        'min': ordenados[0, colunas],
+        'max': ordenados[np.maximum(qtd - 1, 0), colunas]
+    }
+
+def calcular_variacoes_matriz(df: pd.DataFrame, pares: List[Dict],
+                              filtrar_negativos: bool = True,
+                              incluir_dias: bool = False) -> Dict[str, Dict]:
+    """Calcula todos os pares de uma vez a partir da matriz de dias
+
+    Cada par é um dict com 'codigo', 'campo_inicio', 'campo_fim' e, opcionalmente,
+    'meta_dias'. Pares com colunas ausentes ou sem nenhum valor válido ficam de fora
+    do resultado. Com incluir_dias=True cada resultado traz também 'dias' (int32,
+    só as linhas válidas) e 'linhas' (máscara booleana sobre as linhas do df).
+    """
+    pares = [par for par in pares if par['campo_inicio'] in df.columns and par['campo_fim'] in df.columns]
+    if df.empty or not pares:
+        return {}
+
+    colunas = list(dict.fromkeys(c for par in pares for c in (par['campo_inicio'], par['campo_fim'])))
+    posicao = {coluna: indice for indice, coluna in enumerate(colunas)}
+    matriz = matriz_dias(df, colunas)
+
+    inicio = matriz[:, [posicao[par['campo_inicio']] for par in pares]]
+    fim = matriz[:, [posicao[par['campo_fim']] for par in pares]]
+
+    validos = (inicio != DIA_NULO) & (fim != DIA_NULO)
+    dias = np.subtract(fim, inicio, where=validos, out=np.zeros_like(fim))
+    if filtrar_negativos:
+        validos &= dias >= 0
+
+    estatisticas = _estatisticas_colunas(dias, validos)
+
+    metas = np.array([par.get('meta_dias', np.nan) for par in pares], dtype=float)
+    dentro_meta = (validos & (dias <= metas)).sum(axis=0)
+
+    resultado = {}
+    for indice, par in enumerate(pares):
+        qtd = int(estatisticas['qtd'][indice])
+        if qtd == 0:
+            continue
+
+        item = {
+            'qtd': qtd,
+            'media': float(estatisticas['media'][indice]),
+            'mediana': float(estatisticas['mediana'][indice]),
+            'percentil_90': float(estatisticas['percentil_90'][indice]),
+            'min': int(estatisticas['min'][indice]),
+            'max': int(estatisticas['max'][indice])
+        }
+        if 'meta_dias' in par:
+            item['dentro_meta'] = int(dentro_meta[indice])
+            item['conformidade'] = item['dentro_meta'] / qtd
+
+        if incluir_dias:
+            linhas = validos[:, indice]
+            item['linhas'] = linhas
+            item['dias'] = dias[linhas, indice]
+
+        resultado[par['codigo']] = item
+
+    return resultado
+
+# ============================================================================
+# SKETCH DE QUANTIS (HISTOGRAMA DE DIAS, MESCLÁVEL)
+# ============================================================================
+
+class HistogramaDias:
+    """
+    Contagem de ocorrências por valor inteiro de dias (origem + posição).
+    Durações em dias são inteiros num intervalo curto, então o histograma é um
+    sketch exato: mesclável por soma, atualizável com +1/-1 (inclusive exclusões)
+    e com quantis idênticos aos do pandas (interpolação linear)
+    """
+
+    __slots__ = ('origem', 'contagens')
+
+    def __init__(self, origem: int = 0, contagens=None):
+        self.origem = int(origem)
+        self.contagens = np.zeros(0, dtype=np.int64) if contagens is None else np.asarray(contagens, dtype=np.int64)
+
+    def _expandir(self, minimo: int, maximo: int):
+        if not len(self.contagens):
+            self.origem = int(minimo)
+            self.contagens = np.zeros(int(maximo) - int(minimo) + 1, dtype=np.int64)
+            return
+
+        novo_inicio = min(self.origem, int(minimo))
+        novo_fim = max(self.origem + len(self.contagens) - 1, int(maximo))
+        if novo_inicio == self.origem and novo_fim == self.origem + len(self.contagens) - 1:
+            return
+
+        contagens = np.zeros(novo_fim - novo_inicio + 1, dtype=np.int64)
+        deslocamento = self.origem - novo_inicio
+        contagens[deslocamento:deslocamento + len(self.contagens)] = self.contagens
+        self.origem, self.contagens = novo_inicio, contagens
+
+    def adicionar(self, dias, quantidades=1):
+        """Soma ocorrências (quantidades negativas removem)"""
+        dias = np.asarray(dias, dtype=np.int64)
+        if not dias.size:
+            return
+        minimo, maximo = int(dias.min()), int(dias.max())
+        self._expandir(minimo, maximo)
+
+        if np.isscalar(quantidades):
+            contagem = np.bincount(dias - minimo, minlength=maximo - minimo + 1) * quantidades
+        else:
+            contagem = np.bincount(dias - minimo, weights=quantidades, minlength=maximo - minimo + 1)
+        inicio = minimo - self.origem
+        self.contagens[inicio:inicio + len(contagem)] += contagem.astype(np.int64)
+
+    def mesclar(self, outro: 'HistogramaDias'):
+        if not len(outro.contagens):
+            return
+        self._expandir(outro.origem, outro.origem + len(outro.contagens) - 1)
+        inicio = outro.origem - self.origem
+        self.contagens[inicio:inicio + len(outro.contagens)] += outro.contagens
+
+    def a_partir_de(self, minimo: int) -> 'HistogramaDias':
+        """Recorte com os valores >= minimo (ex.: 0 para descartar dias negativos)"""
+        corte = max(int(minimo) - self.origem, 0)
+        return HistogramaDias(self.origem + corte, self.contagens[corte:])
+
+    @property
+    def qtd(self) -> int:
+        return int(self.contagens.sum())
+
+    def _valores(self) -> np.ndarray:
+        return np.arange(self.origem, self.origem + len(self.contagens), dtype=np.int64)
+
+    def media(self) -> float:
+        return float((self._valores() * self.contagens).sum() / self.qtd)
+
+    def desvio_padrao(self) -> float:
+        """Desvio padrão amostral (ddof=1, como pandas)"""
+        qtd = self.qtd
+        if qtd < 2:
+            return float('nan')
+        desvios = self._valores() - self.media()
+        return float(np.sqrt((desvios ** 2 * self.contagens).sum() / (qtd - 1)))
+
+    def quantil(self, q: float) -> float:
+        acumulado = np.cumsum(self.contagens)
+        posicao = q * (acumulado[-1] - 1)
+        abaixo, acima = np.searchsorted(acumulado, [np.floor(posicao), np.ceil(posicao)], side='right')
+        inferior = self.origem + abaixo
+        return float(inferior + (self.origem + acima - inferior) * (posicao - np.floor(posicao)))
+
+    def minimo(self) -> int:
+        return self.origem + int(np.flatnonzero(self.contagens)[0])
+
+    def maximo(self) -> int:
+        return self.origem + int(np.flatnonzero(self.contagens)[-1])
+
+    def ate(self, limite: float) -> int:
+        """Quantidade de ocorrências <= limite"""
+        corte = int(np.floor(limite)) - self.origem + 1
+        return int(self.contagens[:max(corte, 0)].sum())
+
+    def para_dict(self) -> Dict:
+        """Formato esparso: só os valores de dias com ocorrências"""
+        ocupados = np.flatnonzero(self.contagens)
+        return {
+            'dias': (self.origem + ocupados).tolist(),
+            'contagens': self.contagens[ocupados].tolist()
+        }
+
+    @classmethod
+    def de_dict(cls, dados: Dict) -> 'HistogramaDias':
+        histograma = cls()
+        histograma.adicionar(dados['dias'], np.asarray(dados['contagens'], dtype=np.int64))
+        return histograma
+
+class SketchVariacoes:
+    """
+    Histogramas de dias por par do ciclo de vida e por balde (cliente, mês do início),
+    mais o total de cada par. Montado uma vez a partir do DataFrame e depois
+    atualizado só com as linhas escritas (remove a versão antiga, soma a nova)
+    """
+
+    def __init__(self, pares: List[Dict], campo_cliente: str = 'destinatario_nome'):
+        self.pares = [
+            {chave: par[chave] for chave in ('codigo', 'campo_inicio', 'campo_fim', 'meta_dias') if chave in par}
+            for par in pares
+        ]
+        self.campo_cliente = campo_cliente
+        self.baldes: Dict[Tuple[str, str, str], HistogramaDias] = {}
+        self.totais: Dict[str, HistogramaDias] = {par['codigo']: HistogramaDias() for par in self.pares}
+        self.linhas = 0
+        self.versao = None
+
+    @classmethod
+    def de_dataframe(cls, df: pd.DataFrame, pares: List[Dict],
+                     campo_cliente: str = 'destinatario_nome') -> 'SketchVariacoes':
+        sketch = cls(pares, campo_cliente)
+        sketch.adicionar(df)
+        return sketch
+
+    def adicionar(self, df: pd.DataFrame, sinal: int = 1):
+        """Soma (sinal=1) ou retira (sinal=-1) as durações das linhas do df"""
+        if df.empty:
+            return
+        self.linhas += sinal * len(df)
+
+        calculadas = calcular_variacoes_matriz(df, self.pares, filtrar_negativos=False, incluir_dias=True)
+        if self.campo_cliente in df.columns:
+            clientes, nomes_clientes = pd.factorize(df[self.campo_cliente].astype(object).fillna('').astype(str))
+        else:
+            clientes, nomes_clientes = np.zeros(len(df), dtype=np.int64), np.array([''])
+
+        for par in self.pares:
+            if par['codigo'] not in calculadas:
+                continue
+            linhas, dias = calculadas[par['codigo']]['linhas'], calculadas[par['codigo']]['dias']
+            self.totais[par['codigo']].adicionar(dias, sinal)
+
+            # Baldes (cliente, mês do início): ordena por chave e percorre os trechos contíguos
+            inicio = pd.to_datetime(df[par['campo_inicio']], errors='coerce').to_numpy('datetime64[ns]')[linhas]
+            cliente_linha = clientes[linhas]
+            mes_linha = inicio.astype('datetime64[M]').astype(np.int64)
+            ordem = np.lexsort((mes_linha, cliente_linha))
+            cliente_linha, mes_linha, dias = cliente_linha[ordem], mes_linha[ordem], dias[ordem]
+
+            quebras = np.flatnonzero((np.diff(cliente_linha) != 0) | (np.diff(mes_linha) != 0)) + 1
+            for inicio_trecho, fim_trecho in zip(np.r_[0, quebras], np.r_[quebras, len(dias)]):
+                chave = (
+                    par['codigo'],
+                    nomes_clientes[cliente_linha[inicio_trecho]],
+                    str(np.datetime64(int(mes_linha[inicio_trecho]), 'M'))
+                )
+                self.baldes.setdefault(chave, HistogramaDias()).adicionar(dias[inicio_trecho:fim_trecho], sinal)
+
+    def remover(self, df: pd.DataFrame):
+        self.adicionar(df, sinal=-1)
+
+    def histograma(self, codigo: str, clientes: Optional[Sequence[str]] = None,
+                   meses: Optional[Sequence[str]] = None) -> HistogramaDias:
+        """Histograma de um par, opcionalmente só de alguns clientes e/ou meses ('AAAA-MM')"""
+        if clientes is None and meses is None:
+            return self.totais[codigo]
+
+        resultado = HistogramaDias()
+        for (codigo_balde, cliente, mes), balde in self.baldes.items():
+            if (codigo_balde == codigo and
+                    (clientes is None or cliente in clientes) and
+                    (meses is None or mes in meses)):
+                resultado.mesclar(balde)
+        return resultado
+
+    def estatisticas(self, filtrar_negativos: bool = True, clientes: Optional[Sequence[str]] = None,
+                     meses: Optional[Sequence[str]] = None) -> Dict[str, Dict]:
+        """Mesmas estatísticas de calcular_variacoes_matriz (sem 'dias'/'linhas'), a partir dos histogramas"""
+        resultado = {}
+        for par in self.pares:
+            histograma = self.histograma(par['codigo'], clientes, meses)
+            if filtrar_negativos:
+                histograma = histograma.a_partir_de(0)
+            qtd = histograma.qtd
+            if qtd == 0:
+                continue
+
+            item = {
+                'qtd': qtd,
+                'media': histograma.media(),
+                'mediana': histograma.quantil(0.5),
+                'percentil_90': histograma.quantil(0.9),
+                'min': histograma.minimo(),
+                'max': histograma.maximo(),
+                'desvio_padrao': histograma.desvio_padrao()
+            }
+            if 'meta_dias' in par:
+                item['dentro_meta'] = histograma.ate(par['meta_dias'])
+                item['conformidade'] = item['dentro_meta'] / qtd
+            resultado[par['codigo']] = item
+
+        return resultado
+
+    # ------------------------------------------------------------------------
+    # Persistência (JSON)
+    # ------------------------------------------------------------------------
+
+    def para_dict(self) -> Dict:
+        return {
+            'pares': self.pares,
+            'campo_cliente': self.campo_cliente,
+            'linhas': self.linhas,
+            'versao': self.versao,
+            'totais': {codigo: histograma.para_dict() for codigo, histograma in self.totais.items()},
+            'baldes': [
+                [codigo, cliente, mes, histograma.para_dict()]
+                for (codigo, cliente, mes), histograma in self.baldes.items()
+                if histograma.contagens.any()
+            ]
+        }
+
+    @classmethod
+    def de_dict(cls, dados: Dict) -> 'SketchVariacoes':
+        sketch = cls(dados['pares'], dados['campo_cliente'])
+        sketch.linhas = dados['linhas']
+        sketch.versao = dados.get('versao')
+        sketch.totais.update({codigo: HistogramaDias.de_dict(h) for codigo, h in dados['totais'].items()})
+        for codigo, cliente, mes, histograma in dados['baldes']:
+            sketch.baldes[(codigo, cliente, mes)] = HistogramaDias.de_dict(histograma)
+        return sketch
+
+    def salvar(self, caminho: str):
+        """Grava o sketch em JSON (escrita atômica: arquivo temporário + replace)"""
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.para_dict(), arquivo)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> 'SketchVariacoes':
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            return cls.de_dict(json.load(arquivo))
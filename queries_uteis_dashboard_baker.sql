@@ -35,6 +35,14 @@ CREATE INDEX IF NOT EXISTS idx_data_emissao ON dashboard_baker(data_emissao);
 CREATE INDEX IF NOT EXISTS idx_destinatario ON dashboard_baker(destinatario_nome);
 CREATE INDEX IF NOT EXISTS idx_data_baixa ON dashboard_baker(data_baixa);
 CREATE INDEX IF NOT EXISTS idx_valor_total ON dashboard_baker(valor_total);
+CREATE INDEX IF NOT EXISTS idx_updated_at ON dashboard_baker(updated_at);
+
+-- Índices parciais dos alertas (mesmas condições de REGRAS_ALERTAS_SQL no dashboard)
+CREATE INDEX IF NOT EXISTS idx_dashboard_baker_alerta_ctes_sem_aprovacao ON dashboard_baker(data_emissao) WHERE data_atesto IS NULL;
+CREATE INDEX IF NOT EXISTS idx_dashboard_baker_alerta_ctes_sem_faturas ON dashboard_baker(data_atesto) WHERE (numero_fatura IS NULL OR btrim(numero_fatura, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none'));
+CREATE INDEX IF NOT EXISTS idx_dashboard_baker_alerta_faturas_vencidas ON dashboard_baker(data_atesto) WHERE data_baixa IS NULL;
+CREATE INDEX IF NOT EXISTS idx_dashboard_baker_alerta_primeiro_envio_pendente ON dashboard_baker(data_emissao) WHERE primeiro_envio IS NULL;
+CREATE INDEX IF NOT EXISTS idx_dashboard_baker_alerta_envio_final_pendente ON dashboard_baker(data_atesto) WHERE envio_final IS NULL;
 
 -- Trigger para atualizar updated_at automaticamente
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -49,6 +57,55 @@ CREATE TRIGGER update_dashboard_baker_updated_at
 BEFORE UPDATE ON dashboard_baker 
 FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Trigger de notificação (LISTEN dashboard_baker_alteracoes no dashboard)
+CREATE OR REPLACE FUNCTION notificar_alteracao_dashboard_baker()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('dashboard_baker_alteracoes', json_build_object(
+        'op', TG_OP,
+        'numero_cte', CASE WHEN TG_OP = 'DELETE' THEN OLD.numero_cte ELSE NEW.numero_cte END
+    )::text);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS notificar_dashboard_baker_alteracoes ON dashboard_baker;
+CREATE TRIGGER notificar_dashboard_baker_alteracoes
+AFTER INSERT OR UPDATE OR DELETE ON dashboard_baker
+FOR EACH ROW EXECUTE FUNCTION notificar_alteracao_dashboard_baker();
+
+-- Trigger de limpeza na ingestão (sentinelas 'Nenhum'/'null'/'nan' viram NULL)
+-- Apenas para DB_LIMPEZA_NULOS=ingestao: o trigger e o UPDATE abaixo reescrevem o texto gravado
+CREATE OR REPLACE FUNCTION normalizar_nulos_dashboard_baker()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.destinatario_nome := CASE WHEN btrim(NEW.destinatario_nome, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE NEW.destinatario_nome END;
+    NEW.veiculo_placa := CASE WHEN btrim(NEW.veiculo_placa, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE NEW.veiculo_placa END;
+    NEW.numero_fatura := CASE WHEN btrim(NEW.numero_fatura, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE NEW.numero_fatura END;
+    NEW.observacao := CASE WHEN btrim(NEW.observacao, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE NEW.observacao END;
+    NEW.origem_dados := CASE WHEN btrim(NEW.origem_dados, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE NEW.origem_dados END;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS normalizar_nulos_dashboard_baker ON dashboard_baker;
+CREATE TRIGGER normalizar_nulos_dashboard_baker
+BEFORE INSERT OR UPDATE ON dashboard_baker
+FOR EACH ROW EXECUTE FUNCTION normalizar_nulos_dashboard_baker();
+
+-- Limpeza única das linhas já gravadas
+UPDATE dashboard_baker SET
+    destinatario_nome = CASE WHEN btrim(destinatario_nome, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE destinatario_nome END,
+    veiculo_placa = CASE WHEN btrim(veiculo_placa, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE veiculo_placa END,
+    numero_fatura = CASE WHEN btrim(numero_fatura, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE numero_fatura END,
+    observacao = CASE WHEN btrim(observacao, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE observacao END,
+    origem_dados = CASE WHEN btrim(origem_dados, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none') THEN NULL ELSE origem_dados END
+WHERE btrim(destinatario_nome, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none')
+   OR btrim(veiculo_placa, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none')
+   OR btrim(numero_fatura, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none')
+   OR btrim(observacao, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none')
+   OR btrim(origem_dados, E' \t\r\n') IN ('Nenhum', 'Nenhuma', 'nenhum', 'nenhuma', 'null', 'NULL', 'Null', 'nan', 'NaN', 'NAN', '', 'None', 'none');
+
 -- ----------------------------------------------------------------------------
 -- 2. CONSULTAS DE STATUS E MÉTRICAS
 -- ----------------------------------------------------------------------------
@@ -13,6 +13,8 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
 
+from motor_variacoes_tempo import calcular_variacoes_matriz
+
 class AnaliseVariacoesTempo:
     """
     Sistema completo de análise de variações temporais
@@ -169,29 +171,28 @@ class AnaliseVariacoesTempo:
         }
     
     def calcular_todas_variacoes(self) -> pd.DataFrame:
-        """Calcula todas as variações e atualiza o DataFrame"""
+        """Calcula todas as variações (matriz de dias, uma passada) e atualiza o DataFrame"""
         
         print("🔄 Iniciando cálculo de variações temporais...")
         
+        # Negativos também vão para as colunas de resultado; só a contagem os ignora
+        calculadas = calcular_variacoes_matriz(
+            self.df, self.variacoes_config, filtrar_negativos=False, incluir_dias=True
+        )
+        
         for config in self.variacoes_config:
             campo_inicio = config['campo_inicio']
             campo_fim = config['campo_fim']
             coluna_resultado = config['coluna_resultado']
             
             if campo_inicio in self.df.columns and campo_fim in self.df.columns:
-                # Calcular diferença em dias
-                mask = self.df[campo_inicio].notna() & self.df[campo_fim].notna()
-                
-                if mask.any():
-                    dias = (self.df.loc[mask, campo_fim] - self.df.loc[mask, campo_inicio]).dt.days
-                    
-                    # Filtrar dias válidos (não negativos)
-                    dias_validos = dias[dias >= 0]
+                if config['codigo'] in calculadas:
+                    dias = calculadas[config['codigo']]['dias']
                     
                     # Atualizar coluna no DataFrame
-                    self.df.loc[mask, coluna_resultado] = dias
+                    self.df.loc[calculadas[config['codigo']]['linhas'], coluna_resultado] = dias
                     
-                    print(f"✅ {config['nome']}: {len(dias_validos)} registros calculados")
+                    print(f"✅ {config['nome']}: {int((dias >= 0).sum())} registros calculados")
                 else:
                     print(f"⚠️ {config['nome']}: Sem dados válidos")
             else:
@@ -221,95 +222,110 @@ class AnaliseVariacoesTempo:
             categoria = config['categoria']
             codigo = config['codigo']
             
+            estatisticas = None
             if coluna_resultado in self.df.columns:
                 # Dados válidos
                 dados_validos = self.df[self.df[coluna_resultado].notna()][coluna_resultado]
-                
                 if len(dados_validos) > 0:
-                    # Estatísticas básicas
-                    media = dados_validos.mean()
-                    mediana = dados_validos.median()
-                    desvio_padrao = dados_validos.std()
-                    percentil_90 = dados_validos.quantile(0.9)
-                    minimo = dados_validos.min()
-                    maximo = dados_validos.max()
-                    
-                    # Performance vs meta
-                    dentro_meta = len(dados_validos[dados_validos <= meta_dias])
-                    taxa_conformidade = dentro_meta / len(dados_validos)
-                    
-                    # Classificar performance
-                    meta_categoria = self.metas_produtividade.get(categoria, self.metas_produtividade['processo_interno'])
-                    
-                    if taxa_conformidade >= meta_categoria['excelente']:
-                        performance = 'excelente'
-                        cor = '#28a745'
-                    elif taxa_conformidade >= meta_categoria['bom']:
-                        performance = 'bom'
-                        cor = '#17a2b8'
-                    elif taxa_conformidade >= meta_categoria['atencao']:
-                        performance = 'atencao'
-                        cor = '#ffc107'
-                    else:
-                        performance = 'critico'
-                        cor = '#dc3545'
-                    
-                    # Detalhamento
-                    detalhes = {
-                        'nome': config['nome'],
-                        'categoria': categoria,
-                        'quantidade': len(dados_validos),
-                        'media': round(media, 1),
-                        'mediana': round(mediana, 1),
-                        'desvio_padrao': round(desvio_padrao, 1),
-                        'percentil_90': round(percentil_90, 1),
-                        'minimo': int(minimo),
-                        'maximo': int(maximo),
-                        'meta_dias': meta_dias,
-                        'dentro_meta': dentro_meta,
-                        'taxa_conformidade': round(taxa_conformidade * 100, 1),
-                        'performance': performance,
-                        'cor': cor,
-                        'desvio_meta': round(((media - meta_dias) / meta_dias * 100), 1) if meta_dias > 0 else 0,
-                        'descricao': config['descricao'],
-                        'impacto': config['impacto']
+                    estatisticas = {
+                        'qtd': len(dados_validos),
+                        'media': dados_validos.mean(),
+                        'mediana': dados_validos.median(),
+                        'desvio_padrao': dados_validos.std(),
+                        'percentil_90': dados_validos.quantile(0.9),
+                        'min': dados_validos.min(),
+                        'max': dados_validos.max(),
+                        'dentro_meta': len(dados_validos[dados_validos <= meta_dias])
                     }
-                    
-                    relatorio['detalhamento'][codigo] = detalhes
-                    
-                    # Acumular para resumo geral
-                    total_processos += len(dados_validos)
-                    processos_dentro_meta += dentro_meta
-                    
-                    # Acumular por categoria
-                    if categoria not in relatorio['por_categoria']:
-                        relatorio['por_categoria'][categoria] = {
-                            'processos': 0,
-                            'dentro_meta': 0,
-                            'variacoes': []
-                        }
-                    
-                    relatorio['por_categoria'][categoria]['processos'] += len(dados_validos)
-                    relatorio['por_categoria'][categoria]['dentro_meta'] += dentro_meta
-                    relatorio['por_categoria'][categoria]['variacoes'].append(detalhes)
-                    
-                    # Gerar alertas se performance crítica
-                    if performance == 'critico':
-                        relatorio['alertas'].append({
-                            'tipo': 'performance_critica',
-                            'processo': config['nome'],
-                            'taxa_conformidade': taxa_conformidade,
-                            'media_dias': media,
-                            'meta_dias': meta_dias
-                        })
-                    
-                    # Gerar recomendações
-                    if media > meta_dias * 1.5:
-                        relatorio['recomendacoes'].append({
-                            'processo': config['nome'],
-                            'recomendacao': f"Processo com média de {media:.1f} dias (meta: {meta_dias}). Revisar fluxo de trabalho.",
-                            'prioridade': 'alta' if performance == 'critico' else 'media'
-                        })
+            
+            if estatisticas is None:
+                continue
+            
+            # Estatísticas básicas
+            quantidade = estatisticas['qtd']
+            media = estatisticas['media']
+            mediana = estatisticas['mediana']
+            desvio_padrao = estatisticas['desvio_padrao']
+            percentil_90 = estatisticas['percentil_90']
+            minimo = estatisticas['min']
+            maximo = estatisticas['max']
+            
+            # Performance vs meta
+            dentro_meta = estatisticas['dentro_meta']
+            taxa_conformidade = dentro_meta / quantidade
+            
+            # Classificar performance
+            meta_categoria = self.metas_produtividade.get(categoria, self.metas_produtividade['processo_interno'])
+            
+            if taxa_conformidade >= meta_categoria['excelente']:
+                performance = 'excelente'
+                cor = '#28a745'
+            elif taxa_conformidade >= meta_categoria['bom']:
+                performance = 'bom'
+                cor = '#17a2b8'
+            elif taxa_conformidade >= meta_categoria['atencao']:
+                performance = 'atencao'
+                cor = '#ffc107'
+            else:
+                performance = 'critico'
+                cor = '#dc3545'
+            
+            # Detalhamento
+            detalhes = {
+                'nome': config['nome'],
+                'categoria': categoria,
+                'quantidade': quantidade,
+                'media': round(media, 1),
+                'mediana': round(mediana, 1),
+                'desvio_padrao': round(desvio_padrao, 1),
+                'percentil_90': round(percentil_90, 1),
+                'minimo': int(minimo),
+                'maximo': int(maximo),
+                'meta_dias': meta_dias,
+                'dentro_meta': dentro_meta,
+                'taxa_conformidade': round(taxa_conformidade * 100, 1),
+                'performance': performance,
+                'cor': cor,
+                'desvio_meta': round(((media - meta_dias) / meta_dias * 100), 1) if meta_dias > 0 else 0,
+                'descricao': config['descricao'],
+                'impacto': config['impacto']
+            }
+            
+            relatorio['detalhamento'][codigo] = detalhes
+            
+            # Acumular para resumo geral
+            total_processos += quantidade
+            processos_dentro_meta += dentro_meta
+            
+            # Acumular por categoria
+            if categoria not in relatorio['por_categoria']:
+                relatorio['por_categoria'][categoria] = {
+                    'processos': 0,
+                    'dentro_meta': 0,
+                    'variacoes': []
+                }
+            
+            relatorio['por_categoria'][categoria]['processos'] += quantidade
+            relatorio['por_categoria'][categoria]['dentro_meta'] += dentro_meta
+            relatorio['por_categoria'][categoria]['variacoes'].append(detalhes)
+            
+            # Gerar alertas se performance crítica
+            if performance == 'critico':
+                relatorio['alertas'].append({
+                    'tipo': 'performance_critica',
+                    'processo': config['nome'],
+                    'taxa_conformidade': taxa_conformidade,
+                    'media_dias': media,
+                    'meta_dias': meta_dias
+                })
+            
+            # Gerar recomendações
+            if media > meta_dias * 1.5:
+                relatorio['recomendacoes'].append({
+                    'processo': config['nome'],
+                    'recomendacao': f"Processo com média de {media:.1f} dias (meta: {meta_dias}). Revisar fluxo de trabalho.",
+                    'prioridade': 'alta' if performance == 'critico' else 'media'
+                })
         
         # Resumo geral
         relatorio['resumo_geral'] = {
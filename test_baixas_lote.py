@@ -0,0 +1,89 @@
+"""
+Baixas em lote (COPY + UPDATE ... FROM): mesmo detalhe por CTE e mesmo estado
+final da tabela que o caminho linha a linha com registrar_baixa
+
+Uso:
+    BAKER_TEST_DSN="host=127.0.0.1 dbname=postgres user=postgres" python -m pytest -q test_baixas_lote.py
+"""
+
+import pandas as pd
+import pytest
+
+import dashboard_baker_web_corrigido as dashboard
+
+SCHEMAS = ('teste_baker_baixas_linha', 'teste_baker_baixas_lote')
+
+CSV_BAIXAS = """numero_cte,data_baixa,valor_baixa,observacao
+1,2024-06-01,100.00,pix
+2,2024-06-02,150.50,ted "urgente"
+3,2024-06-03,,boleto
+999,2024-06-04,10,inexistente
+4,2024-06-05,0,primeira
+4,2024-06-06,0,repetida
+5,06/07/2024,99.995,"com, vírgula"
+"""
+
+@pytest.fixture
+def sistemas(schema_baker):
+    """Um SistemaBaixasAutomaticas por schema, com a mesma tabela inicial"""
+    resultado = []
+    for schema in SCHEMAS:
+        sistema = dashboard.SistemaBaixasAutomaticas.__new__(dashboard.SistemaBaixasAutomaticas)
+        sistema.config = schema_baker(schema, """
+        INSERT INTO dashboard_baker (numero_cte, valor_total, data_baixa, observacao)
+        VALUES (1, 100, NULL, 'antiga'), (2, 100, NULL, NULL), (3, 100, DATE '2024-05-01', NULL),
+               (4, 100, NULL, NULL), (5, 100, NULL, NULL)
+        """)
+        resultado.append(sistema)
+    return resultado
+
+def _processar_linha_a_linha(sistema, arquivo_csv):
+    """Caminho anterior: uma chamada de registrar_baixa por linha do arquivo"""
+    detalhes = []
+    for _, row in pd.read_csv(arquivo_csv).iterrows():
+        numero_cte = int(row['numero_cte'])
+        sucesso, mensagem = sistema.registrar_baixa(
+            numero_cte, pd.to_datetime(row['data_baixa']).date(), row.get('observacao', ''), row.get('valor_baixa', None)
+        )
+        detalhes.append({'cte': numero_cte, 'sucesso': sucesso, 'mensagem': mensagem})
+    return detalhes
+
+def _tabela(sistema):
+    return dashboard.consultar_dataframe(
+        "SELECT numero_cte, data_baixa, observacao FROM dashboard_baker ORDER BY numero_cte", config=sistema.config
+    )
+
+def test_lote_igual_ao_caminho_linha_a_linha(sistemas, tmp_path):
+    arquivo = tmp_path / 'baixas.csv'
+    arquivo.write_text(CSV_BAIXAS, encoding='utf-8')
+    por_linha, em_lote = sistemas
+
+    esperado = _processar_linha_a_linha(por_linha, arquivo)
+    resultado = em_lote.processar_baixas_em_lote(str(arquivo))
+
+    assert resultado['sucesso']
+    assert resultado['resultados']['detalhes'] == esperado
+    assert (resultado['resultados']['processadas'], resultado['resultados']['sucessos'],
+            resultado['resultados']['erros']) == (7, 4, 3)
+    assert [detalhe['mensagem'] for detalhe in esperado][2:6] == [
+        "CTE 3 já possui baixa em 2024-05-01", "CTE 999 não encontrado",
+        "Baixa registrada com sucesso para CTE 4", "CTE 4 já possui baixa em 2024-06-05"
+    ]
+    pd.testing.assert_frame_equal(_tabela(em_lote), _tabela(por_linha))
+
+    # Reprocessar o mesmo arquivo: nada muda e a tabela temporária não ficou na conexão
+    novamente = em_lote.processar_baixas_em_lote(str(arquivo))
+    assert novamente['sucesso'] and novamente['resultados']['sucessos'] == 0
+    pd.testing.assert_frame_equal(_tabela(em_lote), _tabela(por_linha))
+
+def test_data_invalida_nao_interrompe_o_lote(sistemas, tmp_path):
+    arquivo = tmp_path / 'baixas.csv'
+    arquivo.write_text("numero_cte,data_baixa\n1,2024-06-01\n2,\n4,não é data\n", encoding='utf-8')
+    _, em_lote = sistemas
+
+    resultado = em_lote.processar_baixas_em_lote(str(arquivo))
+
+    detalhes = resultado['resultados']['detalhes']
+    assert [(detalhe['cte'], detalhe['sucesso']) for detalhe in detalhes] == [(1, True), (2, False), (4, False)]
+    assert detalhes[2]['mensagem'] == "Erro ao registrar baixa: data_baixa inválida (não é data)"
+    assert _tabela(em_lote).set_index('numero_cte').loc[1, 'observacao'] == 'antiga | BAIXA: '
@@ -0,0 +1,48 @@
+"""
+Carga dos dados por versão: uma falha transitória cai nos dados simulados sem
+deixá-los em cache na versão real; a próxima carga da mesma versão vai ao banco
+
+Uso:
+    python -m pytest -q test_carga_dados.py
+"""
+
+import uuid
+
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+import dashboard_baker_web_corrigido as dashboard
+
+# Fora de uma execução do Streamlit o cache_data não guarda nada: a página roda no AppTest
+PAGINA = """
+import streamlit as st
+import dashboard_baker_web_corrigido as dashboard
+
+df = dashboard.carregar_dados_postgresql()
+st.text(','.join(map(str, df['numero_cte'].head(3))))
+"""
+
+def test_falha_na_carga_nao_fica_em_cache(monkeypatch):
+    chamadas = []
+
+    def atualizar(config, versao, colunas):
+        chamadas.append(versao)
+        if len(chamadas) == 1:
+            raise dashboard.psycopg2.pool.PoolError("Pool de conexões esgotado - tente novamente")
+        return pd.DataFrame({'numero_cte': [2, 1], 'valor_total': [20.0, 10.0]})
+
+    versao = f"teste-{uuid.uuid4()}"  # chave nova no cache_data do processo
+    monkeypatch.setenv('DB_ESCUTAR_ALTERACOES', 'nao')
+    monkeypatch.setattr(dashboard, 'carregar_configuracao_banco', lambda: {'host': 'teste'})
+    monkeypatch.setattr(dashboard, 'versao_dados_atual', lambda: versao)
+    monkeypatch.setattr(dashboard, 'atualizar_dados_incremental', atualizar)
+
+    pagina = AppTest.from_string(PAGINA).run()
+    assert pagina.warning[0].value.startswith("⚠️ Usando dados simulados")
+    assert pagina.text[0].value != '2,1'
+
+    # Mesma versão: a falha não foi memorizada, a carga real sim
+    for _ in range(2):
+        pagina.run()
+        assert not pagina.warning and pagina.text[0].value == '2,1'
+    assert chamadas == [versao, versao]
@@ -0,0 +1,82 @@
+"""
+Paridade entre os cálculos no banco (gerar_metricas_sql, calcular_alertas_sql)
+e os cálculos em pandas (gerar_metricas_expandidas, calcular_alertas_inteligentes)
+
+Uso:
+    BAKER_TEST_DSN="host=127.0.0.1 dbname=postgres user=postgres" python -m pytest -q test_metricas_sql.py
+"""
+
+import pandas as pd
+import pytest
+
+import dashboard_baker_web_corrigido as dashboard
+
+SCHEMA = 'teste_baker_metricas'
+
+@pytest.fixture
+def config_teste(schema_baker, cursor_admin, monkeypatch):
+    config = schema_baker(SCHEMA, dashboard.SQL_INDICES_ALERTAS)
+
+    # Inclui nulos, textos "traduzidos" ('Nenhum', 'nan', ' ') e valores ausentes;
+    # datas relativas a hoje para cair dos dois lados dos prazos dos alertas
+    cursor_admin.execute("""
+    INSERT INTO dashboard_baker (
+        numero_cte, destinatario_nome, veiculo_placa, valor_total, data_emissao,
+        numero_fatura, data_baixa, primeiro_envio, data_atesto, envio_final
+    )
+    SELECT
+        g,
+        (ARRAY['CLIENTE A', 'CLIENTE B', 'Nenhum', NULL, 'CLIENTE C'])[mod(g, 5) + 1],
+        (ARRAY['ABC1234', 'nan', 'DEF5678', NULL])[mod(g, 4) + 1],
+        CASE WHEN mod(g, 11) = 0 THEN NULL ELSE round((g * 37.5)::numeric, 2) END,
+        CASE WHEN mod(g, 13) = 0 THEN NULL ELSE CURRENT_DATE - mod(g * 7, 400) END,
+        (ARRAY['FAT' || g, '', ' ', 'None', NULL, 'FAT' || g])[mod(g, 6) + 1],
+        CASE WHEN mod(g, 3) = 0 THEN DATE '2024-06-01' + mod(g, 30) END,
+        CASE WHEN mod(g, 2) = 0 THEN DATE '2024-02-01' + mod(g, 20) END,
+        CASE WHEN mod(g, 4) < 3 THEN CURRENT_DATE - mod(g * 3, 120) END,
+        CASE WHEN mod(g, 5) < 3 THEN DATE '2024-04-01' + mod(g, 20) END
+    FROM generate_series(1, 500) g
+    """)
+
+    monkeypatch.setattr(dashboard, 'carregar_configuracao_banco', lambda: config)
+    return config
+
+def test_metricas_sql_iguais_ao_pandas(config_teste):
+    df = dashboard._carregar_tabela_completa(config_teste)
+    esperado = dashboard.gerar_metricas_expandidas(df)
+    obtido = dashboard.gerar_metricas_sql(config_teste)
+
+    assert obtido.keys() == esperado.keys()
+    for chave, valor in esperado.items():
+        assert obtido[chave] == pytest.approx(float(valor), rel=1e-9, abs=1e-6), chave
+
+def test_alertas_sql_iguais_ao_pandas(config_teste):
+    df = dashboard._carregar_tabela_completa(config_teste)
+    esperado = dashboard.calcular_alertas_inteligentes(df)
+    obtido = dashboard.calcular_alertas_sql(config_teste, versao='teste')
+
+    assert obtido.keys() == esperado.keys()
+    for codigo, alerta in esperado.items():
+        assert alerta['qtd'] > 0, codigo
+        assert obtido[codigo]['qtd'] == alerta['qtd'], codigo
+        assert obtido[codigo]['valor'] == pytest.approx(alerta['valor']), codigo
+
+        # Lista sob demanda: completa e fatiada (LIMIT)
+        pd.testing.assert_frame_equal(
+            pd.DataFrame(list(obtido[codigo]['lista'])), pd.DataFrame(alerta['lista']), check_dtype=False
+        )
+        assert obtido[codigo]['lista'][:10] == alerta['lista'][:10]
+
+def test_consulta_agregada_com_erro_volta_ao_pandas(config_teste, monkeypatch):
+    df = dashboard._carregar_tabela_completa(config_teste)
+    monkeypatch.setattr(dashboard, 'SQL_METRICAS_EXPANDIDAS', "SELECT coluna_inexistente FROM dashboard_baker")
+    monkeypatch.setattr(dashboard, 'versao_dados_atual', lambda: 'teste-erro-metricas')
+
+    # A falha chega como psycopg2.Error pelos dois caminhos (engine e pool)
+    with pytest.raises(dashboard.psycopg2.Error):
+        dashboard.gerar_metricas_sql(config_teste)
+    monkeypatch.setattr(dashboard, 'obter_engine_sqlalchemy', lambda _config: 1 / 0)
+    with pytest.raises(dashboard.psycopg2.Error):
+        dashboard.gerar_metricas_sql(config_teste)
+
+    assert dashboard.obter_metricas_expandidas(df) == dashboard.gerar_metricas_expandidas(df)
@@ -0,0 +1,164 @@
+"""
+Motor de exportação: Excel em constant_memory (conteúdo das células, nulos, datas
+seriais, continuação em nova aba, relatório com todas as colunas) e CSV gzip /
+Parquet em blocos, com os filtros da exportação aplicados no SQL
+
+Uso:
+    python -m pytest -q test_motor_exportacao.py
+    BAKER_TEST_DSN="host=127.0.0.1 dbname=postgres user=postgres" python -m pytest -q test_motor_exportacao.py
+"""
+
+import gzip
+import re
+import zipfile
+from datetime import date
+from io import BytesIO
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import motor_exportacao
+from motor_exportacao import exportar_csv_gzip, exportar_excel, exportar_parquet
+
+SCHEMA = 'teste_baker_exportacao'
+
+NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+def _abas(conteudo: bytes):
+    """{nome da aba: {referência: valor}} lido direto do XML do arquivo"""
+    with zipfile.ZipFile(BytesIO(conteudo)) as arquivo:
+        livro = ElementTree.fromstring(arquivo.read('xl/workbook.xml'))
+        nomes = [aba.get('name') for aba in livro.find('x:sheets', NS)]
+        abas = {}
+        for indice, nome in enumerate(nomes, start=1):
+            planilha = ElementTree.fromstring(arquivo.read(f'xl/worksheets/sheet{indice}.xml'))
+            celulas = {}
+            for celula in planilha.iter(f"{{{NS['x']}}}c"):
+                texto = celula.find('x:is/x:t', NS)
+                valor = celula.find('x:v', NS)
+                if texto is not None:
+                    celulas[celula.get('r')] = texto.text
+                elif valor is not None:
+                    celulas[celula.get('r')] = float(valor.text)
+            abas[nome] = celulas
+    return abas
+
+def _df():
+    return pd.DataFrame({
+        'numero_cte': [10, 11, 12],
+        'destinatario_nome': pd.Series(['CLIENTE A', None, 'CLIENTE <B> & C']).astype('category'),
+        'valor_total': [1500.5, np.nan, 20.0],
+        'data_emissao': pd.to_datetime(['2024-01-01', None, '2024-03-15']),
+        'updated_at': pd.to_datetime(['2024-01-01 12:00:00', '2024-01-02 06:00:00', None])
+    })
+
+def test_celulas_tipadas_e_nulos_vazios():
+    destino = BytesIO()
+    assert exportar_excel([_df()], destino, 'Dados') == 3
+
+    celulas = _abas(destino.getvalue())['Dados']
+
+    assert [celulas[ref] for ref in ('A1', 'B1', 'C1', 'D1', 'E1')] == \
+        ['Numero Cte', 'Destinatario Nome', 'Valor Total', 'Data Emissao', 'Updated At']
+    assert celulas['A2'] == 10 and celulas['B4'] == 'CLIENTE <B> & C'
+    assert celulas['C2'] == 1500.5
+    assert celulas['D2'] == 45292.0                 # 01/01/2024 no sistema 1900
+    assert celulas['E2'] == 45292.5                 # meio-dia
+    for vazia in ('B3', 'C3', 'D3', 'E4'):           # nulos não geram célula
+        assert vazia not in celulas
+
+def test_blocos_continuam_em_nova_aba_no_limite(monkeypatch):
+    monkeypatch.setattr(motor_exportacao, 'LIMITE_LINHAS_EXCEL', 3)
+    destino = BytesIO()
+
+    total = exportar_excel([_df(), _df()], destino, 'Dados', colunas=['numero_cte'])
+
+    abas = _abas(destino.getvalue())
+    assert total == 6
+    assert list(abas) == ['Dados', 'Dados (2)', 'Dados (3)']
+    assert [abas['Dados'][ref] for ref in ('A1', 'A2', 'A3')] == ['Numero Cte', 10, 11]
+    assert [abas['Dados (3)'][ref] for ref in ('A2', 'A3')] == [11, 12]
+
+def test_relatorio_exporta_todas_as_colunas():
+    import dashboard_baker_web_corrigido as dashboard
+
+    df = _df().assign(observacao=['obs', None, None])
+    metricas = dict.fromkeys(['total_ctes', 'valor_total', 'clientes_unicos', 'processos_completos',
+                              'faturas_pagas', 'valor_pago', 'valor_pendente', 'ticket_medio'], 0)
+
+    conteudo = dashboard.gerar_relatorio_excel(df, metricas, {}, {}).getvalue()
+
+    dados = _abas(conteudo)['Dados Completos']
+    cabecalho = [valor for ref, valor in dados.items() if re.fullmatch(r'[A-Z]+1', ref)]
+    assert cabecalho == ['Numero Cte', 'Destinatario Nome', 'Valor Total', 'Data Emissao',
+                         'Observacao', 'Updated At']
+
+def _blocos():
+    # Segundo bloco com observacao preenchida: o esquema não pode sair nulo do primeiro
+    primeiro = _df().assign(observacao=None)
+    segundo = _df().assign(numero_cte=[20, 21, 22], observacao=['a', 'b', None])
+    return [primeiro, segundo]
+
+def test_csv_gzip_em_blocos():
+    destino = BytesIO()
+
+    assert exportar_csv_gzip(_blocos(), destino) == 6
+
+    texto = gzip.decompress(destino.getvalue())
+    assert texto.startswith(b'\xef\xbb\xbf"numero_cte"')
+    lido = pd.read_csv(BytesIO(texto), encoding='utf-8-sig')
+    assert lido['numero_cte'].tolist() == [10, 11, 12, 20, 21, 22]
+    assert lido['observacao'].isna().tolist() == [True, True, True, False, False, True]
+    assert lido['destinatario_nome'].iloc[2] == 'CLIENTE <B> & C'
+
+def test_parquet_um_row_group_por_bloco():
+    import pyarrow.parquet as pq
+
+    destino = BytesIO()
+    assert exportar_parquet(_blocos(), destino) == 6
+
+    arquivo = pq.ParquetFile(BytesIO(destino.getvalue()))
+    assert arquivo.num_row_groups == 2
+    assert str(arquivo.schema_arrow.field('observacao').type) == 'string'
+    assert str(arquivo.schema_arrow.field('destinatario_nome').type) == 'string'
+
+    lido = arquivo.read().to_pandas()
+    assert lido['numero_cte'].tolist() == [10, 11, 12, 20, 21, 22]
+    assert lido['data_emissao'].isna().tolist() == [False, True, False, False, True, False]
+
+def test_exportacoes_sem_linhas_mantem_cabecalho():
+    import pyarrow.parquet as pq
+
+    csv, parquet = BytesIO(), BytesIO()
+    assert exportar_csv_gzip([], csv, colunas=['numero_cte', 'valor_total']) == 0
+    assert exportar_parquet([], parquet, colunas=['numero_cte', 'valor_total']) == 0
+
+    assert gzip.decompress(csv.getvalue()) == b'\xef\xbb\xbf"numero_cte","valor_total"\n'
+    assert pq.read_table(BytesIO(parquet.getvalue())).column_names == ['numero_cte', 'valor_total']
+
+def test_exportacao_em_fluxo_filtra_no_banco(schema_baker, monkeypatch):
+    import dashboard_baker_web_corrigido as dashboard
+
+    config = schema_baker(SCHEMA, """
+    INSERT INTO dashboard_baker (numero_cte, destinatario_nome, valor_total, data_emissao, data_baixa)
+    SELECT g, 'CLIENTE ' || (g % 3), g, DATE '2024-01-01' + g, CASE WHEN g % 2 = 0 THEN DATE '2024-06-01' END
+    FROM generate_series(1, 50) AS g
+    """)
+    monkeypatch.setenv('DB_TAMANHO_BLOCO', '7')
+
+    filtros = (date(2024, 1, 10), date(2024, 2, 10), ('CLIENTE 1', 'CLIENTE 2'), 'Sem Baixa')
+    esperados = sorted(
+        (g for g in range(1, 51) if 9 <= g <= 40 and g % 3 in (1, 2) and g % 2 == 1), reverse=True
+    )
+    assert dashboard.contar_ctes_exportacao(filtros, config) == len(esperados)
+
+    destino = BytesIO()
+    assert dashboard.exportar_dados_fluxo('parquet', destino, filtros, config) == len(esperados)
+    lido = pd.read_parquet(BytesIO(destino.getvalue()))
+    assert lido['numero_cte'].tolist() == esperados
+    assert list(lido.columns) == dashboard.COLUNAS_DASHBOARD_CTE
+
+    destino = BytesIO()
+    assert dashboard.exportar_dados_fluxo('csv_gz', destino, config=config) == 50
@@ -0,0 +1,88 @@
+"""
+Paridade do motor de variações (matriz de dias e sketch de histogramas)
+com o cálculo par a par em pandas
+
+Uso:
+    python -m pytest -q test_motor_variacoes_tempo.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from motor_variacoes_tempo import COLUNAS_CICLO_VIDA, SketchVariacoes, calcular_variacoes_matriz
+
+PARES = [
+    {'codigo': 'emissao_inclusao', 'campo_inicio': 'data_emissao', 'campo_fim': 'data_inclusao_fatura', 'meta_dias': 2},
+    {'codigo': 'envio_atesto', 'campo_inicio': 'primeiro_envio', 'campo_fim': 'data_atesto', 'meta_dias': 7},
+    {'codigo': 'emissao_baixa', 'campo_inicio': 'data_emissao', 'campo_fim': 'data_baixa', 'meta_dias': 30},
+    {'codigo': 'sem_coluna', 'campo_inicio': 'data_emissao', 'campo_fim': 'coluna_inexistente', 'meta_dias': 1}
+]
+
+@pytest.fixture
+def df_ciclo():
+    rng = np.random.default_rng(7)
+    total = 2000
+    df = pd.DataFrame({'numero_cte': np.arange(total), 'destinatario_nome': [f'CLIENTE {i % 7}' for i in range(total)]})
+    for coluna in COLUNAS_CICLO_VIDA:
+        datas = pd.Series(pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 120, total), unit='D'))
+        datas[rng.random(total) < 0.3] = pd.NaT
+        df[coluna] = datas
+    return df
+
+@pytest.mark.parametrize('filtrar_negativos', [True, False])
+def test_matriz_igual_ao_calculo_par_a_par(df_ciclo, filtrar_negativos):
+    obtido = calcular_variacoes_matriz(df_ciclo, PARES, filtrar_negativos=filtrar_negativos, incluir_dias=True)
+
+    assert set(obtido) == {'emissao_inclusao', 'envio_atesto', 'emissao_baixa'}
+    for par in PARES[:3]:
+        mask = df_ciclo[par['campo_inicio']].notna() & df_ciclo[par['campo_fim']].notna()
+        dias = (df_ciclo.loc[mask, par['campo_fim']] - df_ciclo.loc[mask, par['campo_inicio']]).dt.days
+        if filtrar_negativos:
+            dias = dias[dias >= 0]
+
+        resultado = obtido[par['codigo']]
+        assert resultado['qtd'] == len(dias)
+        assert resultado['media'] == pytest.approx(dias.mean())
+        assert resultado['mediana'] == pytest.approx(dias.median())
+        assert resultado['percentil_90'] == pytest.approx(dias.quantile(0.9))
+        assert (resultado['min'], resultado['max']) == (dias.min(), dias.max())
+        assert resultado['dentro_meta'] == (dias <= par['meta_dias']).sum()
+        assert resultado['conformidade'] == pytest.approx((dias <= par['meta_dias']).mean())
+        assert list(df_ciclo.index[resultado['linhas']]) == list(dias.index)
+        assert list(resultado['dias']) == list(dias)
+
+def test_pares_sem_dados_ficam_de_fora(df_ciclo):
+    df_ciclo['data_baixa'] = pd.NaT
+    assert 'emissao_baixa' not in calcular_variacoes_matriz(df_ciclo, PARES)
+    assert calcular_variacoes_matriz(df_ciclo.iloc[0:0], PARES) == {}
+
+def _conferir(obtido, esperado):
+    assert obtido.keys() == esperado.keys()
+    for codigo, estatisticas in esperado.items():
+        for chave, valor in estatisticas.items():
+            assert obtido[codigo][chave] == pytest.approx(valor), (codigo, chave)
+
+def test_sketch_acompanha_escritas_e_persistencia(df_ciclo, tmp_path):
+    sketch = SketchVariacoes.de_dataframe(df_ciclo, PARES)
+    _conferir(sketch.estatisticas(), calcular_variacoes_matriz(df_ciclo, PARES))
+
+    # "Atesto" registrado em alguns CTEs e um CTE excluído
+    alterados = df_ciclo.loc[df_ciclo['numero_cte'] < 50].copy()
+    alterados['data_atesto'] = alterados['data_emissao'] + pd.Timedelta(days=3)
+    sketch.remover(df_ciclo.loc[df_ciclo['numero_cte'] <= 50])
+    sketch.adicionar(alterados)
+
+    df_novo = pd.concat([alterados, df_ciclo.loc[df_ciclo['numero_cte'] > 50]])
+    _conferir(sketch.estatisticas(filtrar_negativos=False), calcular_variacoes_matriz(df_novo, PARES, filtrar_negativos=False))
+
+    # Balde cliente/mês
+    filtro = (df_novo['destinatario_nome'] == 'CLIENTE 3') & (df_novo['primeiro_envio'].dt.strftime('%Y-%m') == '2024-02')
+    _conferir(
+        {'envio_atesto': sketch.estatisticas(clientes=['CLIENTE 3'], meses=['2024-02'])['envio_atesto']},
+        calcular_variacoes_matriz(df_novo[filtro], PARES[1:2])
+    )
+
+    arquivo = tmp_path / 'sketch.json'
+    sketch.salvar(str(arquivo))
+    assert SketchVariacoes.carregar(str(arquivo)).estatisticas() == sketch.estatisticas()
@@ -0,0 +1,76 @@
+"""
+Teste do ouvinte LISTEN/NOTIFY contra um PostgreSQL local
+
+Uso:
+    BAKER_TEST_DSN="host=127.0.0.1 dbname=postgres user=postgres" python -m pytest -q test_notificacoes_cache.py
+
+Cria um schema descartável com sua própria dashboard_baker e o trigger de notificação,
+altera a tabela por outra conexão e confere se o cache local acompanha.
+"""
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import dashboard_baker_web_corrigido as dashboard
+
+SCHEMA = 'teste_baker_notify'
+
+def _esperar(condicao, timeout=10.0):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if condicao():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_ouvinte_aplica_alteracoes_de_outro_processo(schema_baker, cursor_admin, monkeypatch):
+    config = schema_baker(SCHEMA, dashboard.SQL_TRIGGER_NOTIFICACAO, """
+    INSERT INTO dashboard_baker (numero_cte, destinatario_nome, valor_total, data_emissao)
+    SELECT g, 'CLIENTE ' || mod(g, 5), g * 10, DATE '2024-01-01' + g FROM generate_series(1, 50) g
+    """)
+
+    # Fora do `streamlit run` o cache_resource não persiste: fixa os recursos do processo
+    armazens, registro, novo_armazem = {}, {}, dashboard._armazem_dados_cte.__wrapped__
+    versao = {'versao': None, 'sondado_em': 0.0, 'lock': threading.Lock()}
+    monkeypatch.setattr(dashboard, 'carregar_configuracao_banco', lambda: config)
+    monkeypatch.setattr(dashboard, '_registro_armazens', lambda: registro)
+    monkeypatch.setattr(dashboard, '_armazem_dados_cte', lambda chave, colunas=tuple(dashboard.COLUNAS_DASHBOARD_CTE): (
+        armazens.setdefault(colunas, novo_armazem(chave, colunas))
+    ))
+    monkeypatch.setattr(dashboard, '_cache_versao_dados', lambda: versao)
+
+    ouvinte = dashboard.OuvinteAlteracoesBaker(config, intervalo_lote_seg=0.1)
+    ouvinte.start()
+    try:
+        assert _esperar(lambda: ouvinte.estatisticas()['conectado'])
+        versao_inicial = dashboard.sondar_versao_dados(config)
+        dashboard.atualizar_dados_incremental(config, versao_inicial)
+        # Projeção do painel recortada do armazém completo, sem nova leitura
+        df_painel = dashboard.atualizar_dados_incremental(config, versao_inicial, dashboard.COLUNAS_PAINEL_CTE)
+        assert 'observacao' not in df_painel.columns and 'updated_at' in df_painel.columns
+        armazem = armazens[tuple(dashboard.COLUNAS_DASHBOARD_CTE)]
+        painel = armazens[tuple(df_painel.columns)]
+        assert painel['estatisticas']['projecoes_reaproveitadas'] == 1
+
+        # "Outro processo" escreve direto no banco
+        cursor_admin.execute("UPDATE dashboard_baker SET observacao = 'alterada', updated_at = now() WHERE numero_cte = 5")
+        cursor_admin.execute("DELETE FROM dashboard_baker WHERE numero_cte = 6")
+        cursor_admin.execute("INSERT INTO dashboard_baker (numero_cte, destinatario_nome, valor_total) VALUES (1000, 'NOVO', 1)")
+
+        assert _esperar(lambda: ouvinte.estatisticas()['notificacoes'] >= 3)
+        assert _esperar(lambda: 1000 in set(armazem['dados'][1]['numero_cte']) and 1000 in set(painel['dados'][1]['numero_cte']))
+
+        df_cache = armazem['dados'][1]
+        assert 6 not in set(df_cache['numero_cte'])
+        assert df_cache.loc[df_cache['numero_cte'] == 5, 'observacao'].iloc[0] == 'alterada'
+        pd.testing.assert_frame_equal(
+            df_cache, dashboard.compactar_dataframe_cte(dashboard._carregar_tabela_completa(config)),
+            check_dtype=False
+        )
+        pd.testing.assert_frame_equal(painel['dados'][1], df_cache[list(painel['colunas'])], check_dtype=False)
+    finally:
+        ouvinte.parar()
+        ouvinte.join(timeout=10)
@@ -0,0 +1,73 @@
+"""
+Limpeza das sentinelas de nulo ('Nenhum', 'null', 'nan'...): normalizador vetorizado,
+projeção SQL e trigger de ingestão
+
+Uso:
+    python -m pytest -q test_nulos_traduzidos.py
+    BAKER_TEST_DSN="host=127.0.0.1 dbname=postgres user=postgres" python -m pytest -q test_nulos_traduzidos.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dashboard_baker_web_corrigido as dashboard
+
+SCHEMA = 'teste_baker_nulos'
+
+def _df_sujo():
+    return pd.DataFrame({
+        'numero_cte': [1, 2, 3, 4, 5, 6],
+        'destinatario_nome': ['CLIENTE A', 'Nenhum', ' null ', None, 'nan', 'CLIENTE B'],
+        'numero_fatura': ['FAT-1', 'NaN', '', 'None', np.nan, 'Nenhuma fatura'],
+        'misto': ['x', 10, 'NULL', 2.5, None, 'none'],
+        'valor_total': [1.0, 2.0, np.nan, 4.0, 5.0, 6.0]
+    })
+
+def test_normalizador_igual_ao_caminho_celula_a_celula():
+    df = _df_sujo()
+    esperado = df.copy()
+    for coluna in esperado.select_dtypes(include=['object']).columns:
+        esperado[coluna] = esperado[coluna].apply(dashboard.corrigir_valor_traduzido)
+
+    retorno = dashboard.normalizar_nulos_traduzidos(df)
+
+    assert retorno is df  # no lugar, sem cópia
+    pd.testing.assert_frame_equal(df, esperado)
+    assert df['numero_fatura'].tolist()[-1] == 'Nenhuma fatura'
+
+def test_normalizador_em_colunas_categoricas():
+    df = _df_sujo()
+    df['destinatario_nome'] = df['destinatario_nome'].astype('category')
+
+    dashboard.normalizar_nulos_traduzidos(df, ['destinatario_nome'])
+
+    assert list(df['destinatario_nome'].cat.categories) == ['CLIENTE A', 'CLIENTE B']
+    assert df['destinatario_nome'].isna().tolist() == [False, True, True, True, True, False]
+
+def test_corrigir_dataframe_nao_altera_original():
+    df = _df_sujo()
+    corrigido = dashboard.corrigir_dataframe_traduzido(df)
+
+    assert df['destinatario_nome'].iloc[1] == 'Nenhum'
+    assert corrigido['destinatario_nome'].iloc[1] is None
+
+def test_projecao_sql_e_trigger_de_ingestao(schema_baker, cursor_admin, monkeypatch):
+    config = schema_baker(SCHEMA, """
+    INSERT INTO dashboard_baker (numero_cte, destinatario_nome, numero_fatura, valor_total, data_emissao)
+    VALUES (1, 'Nenhum', ' null ', 10, DATE '2024-01-01'), (2, 'CLIENTE A', 'FAT-1', 20, DATE '2024-01-02')
+    """)
+
+    # Projeção: o SELECT já devolve NULL e a leitura não limpa de novo
+    monkeypatch.setenv('DB_LIMPEZA_NULOS', 'sql')
+    df = dashboard._carregar_tabela_completa(config).set_index('numero_cte')
+    assert df.loc[1, ['destinatario_nome', 'numero_fatura']].isna().all()
+    assert df.loc[2, 'destinatario_nome'] == 'CLIENTE A'
+
+    # Ingestão: trigger + limpeza única deixam a tabela limpa
+    cursor_admin.execute(dashboard.SQL_TRIGGER_NULOS_TRADUZIDOS)
+    cursor_admin.execute(dashboard.SQL_LIMPAR_NULOS_TRADUZIDOS)
+    cursor_admin.execute("INSERT INTO dashboard_baker (numero_cte, destinatario_nome, valor_total) VALUES (3, 'nan', 30)")
+    cursor_admin.execute("UPDATE dashboard_baker SET numero_fatura = 'None' WHERE numero_cte = 2")
+    cursor_admin.execute("SELECT numero_cte, destinatario_nome, numero_fatura FROM dashboard_baker ORDER BY 1")
+    assert cursor_admin.fetchall() == [(1, None, None), (2, 'CLIENTE A', None), (3, None, None)]